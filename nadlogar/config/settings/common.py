@@ -43,6 +43,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "utils.memory.SympyCacheMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -116,3 +117,125 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# We use a file-based cache so that it is shared by all server processes and can be
+# filled in advance, for example with the warm_problem_gallery management command.
+# All caches are kept in the following directory, which can be changed with the
+# NADLOGAR_CACHE_DIR environment variable. Since worker processes read the settings
+# afresh, this also changes the directory used by them.
+
+CACHE_DIR = Path(os.environ.get("NADLOGAR_CACHE_DIR", BASE_DIR / "cache"))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_DIR / "django",
+    },
+    # Generated problem data, see PROBLEM_CACHE. Once there are more than MAX_ENTRIES
+    # problems in the cache, a part of them is removed.
+    "problems": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_DIR / "problems",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+
+# LaTeX compilation
+
+# Number of pdflatex processes that may run concurrently while exporting a single
+# document. By default, we use all available cores.
+LATEX_WORKERS = os.cpu_count()
+
+# Compiled PDF files are cached in the following directory, keyed by their source.
+# Set the directory to None to disable the cache.
+LATEX_CACHE_DIR = CACHE_DIR / "latex"
+
+# Once the cache exceeds the following size (in bytes), least recently used files
+# are removed.
+LATEX_CACHE_SIZE = 500 * 1024 * 1024
+
+# Precompiled preambles of LaTeX templates are kept in the following directory.
+# Set the directory to None to compile each file from scratch.
+LATEX_BUILD_DIR = CACHE_DIR / "latex-build"
+
+# Once the precompiled preambles exceed the following size (in bytes), least recently
+# used ones are removed.
+LATEX_BUILD_SIZE = 200 * 1024 * 1024
+
+
+# Problem generation
+
+# Number of worker processes that generate problem texts for exported documents. By
+# default, texts are generated in the request thread. Worker processes are started on
+# the first export and are then kept running.
+PROBLEM_WORKERS = None
+
+# Parameters of problem kinds are stored in a separate table for each kind, and
+# copied to a JSON column of the table of all problems. With "tables", problems are
+# loaded from the kind tables, with one query for each kind in a document. With
+# "json", problems are loaded from the JSON column, with a single query.
+PROBLEM_PARAMETER_STORAGE = "tables"
+
+# Generated problem data is cached in the cache with the following alias, with a
+# single entry for all students of a problem, keyed by the problem parameters and the
+# generator code. Set the alias to None to disable the cache.
+PROBLEM_CACHE = "problems"
+
+# Data of generators with few possible outcomes is precomputed by the
+# build_sample_banks command and stored in sample banks in the following directory.
+# Until a bank is built, data is generated from scratch. Set the directory to None
+# to always generate data from scratch.
+PROBLEM_BANK_DIR = CACHE_DIR / "banks"
+
+# Tests are run with all caches in a temporary directory.
+TEST_RUNNER = "config.test_runner.TemporaryCacheTestRunner"
+
+# When problem parameters are saved, we make attempts of generating the problem to
+# estimate how long generating the problem takes. We stop once the given number of
+# attempts succeed or the attempts have taken the given time (in seconds). Parameters
+# are refused only if none of the max_attempts attempts of the problem kind succeeds.
+PROBLEM_PROBE_SUCCESSES = 20
+PROBLEM_PROBE_TIME = 0.2
+
+# Parameters with which generating a problem for one student would take more than
+# the following time (in seconds) are refused.
+PROBLEM_COST_BUDGET = 1.0
+
+# Generating a problem for one student that takes more than the following time (in
+# seconds) is aborted after the current attempt, and generating the document fails.
+# Set it to None to disable the limit. Problem kinds may override it with their
+# generation_timeout.
+PROBLEM_GENERATION_TIMEOUT = 10.0
+
+# A single attempt of generating a subproblem that takes more than the following time
+# (in seconds) is logged together with its seed and parameters, so that it can be
+# reproduced. Set it to None to disable logging.
+PROBLEM_SLOW_ATTEMPT_TIME = 1.0
+
+# A dotted path to a function that is called with the name of the problem kind and
+# a dictionary of metrics (attempts, attempt_time, total_time) after each
+# generated subproblem, for example to forward them to a monitoring system.
+PROBLEM_METRICS_HOOK = None
+
+# Some generators compute in floating point or with fractions instead of sympy. Every
+# so many calls, they cross-check their result against the symbolic computation and
+# log an error if the results differ. Set it to None to disable the checks.
+PROBLEM_FAST_PATH_CHECK_INTERVAL = 1000
+
+# The number of results of each memoized sympy operation kept by a worker process.
+PROBLEM_MEMO_SIZE = 10000
+
+# The number of results that sympy keeps in the cache of each of its cached functions.
+# Sympy reads it from the environment when it is first imported, which happens after
+# the settings are loaded, both in the server and in problem worker processes.
+SYMPY_CACHE_SIZE = 1000
+os.environ.setdefault("SYMPY_CACHE_SIZE", str(SYMPY_CACHE_SIZE))
+
+# The sympy cache is cleared after every so many requests (or problem worker tasks),
+# so that the memory of long-running processes stays bounded.
+SYMPY_CACHE_CLEAR_INTERVAL = 100
@@ -0,0 +1,51 @@
+import os
+import tempfile
+from pathlib import Path
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TemporaryCacheTestRunner(DiscoverRunner):
+    """A test runner that keeps all caches in a temporary directory.
+
+    This way, tests neither read stale entries of the development server nor leave
+    their own entries behind. We also set NADLOGAR_CACHE_DIR, so that worker processes
+    started by the tests use the same directory.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = tempfile.TemporaryDirectory()
+        cache_dir = Path(self._cache_dir.name)
+        self._previous_cache_dir = os.environ.get("NADLOGAR_CACHE_DIR")
+        os.environ["NADLOGAR_CACHE_DIR"] = str(cache_dir)
+        self._cache_settings = override_settings(
+            CACHE_DIR=cache_dir,
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": cache_dir / "django",
+                },
+                "problems": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": cache_dir / "problems",
+                    "TIMEOUT": None,
+                },
+            },
+            LATEX_CACHE_DIR=cache_dir / "latex",
+            LATEX_BUILD_DIR=cache_dir / "latex-build",
+            PROBLEM_BANK_DIR=cache_dir / "banks",
+            # Slow attempts are expected on loaded test machines, so we do not log them.
+            PROBLEM_SLOW_ATTEMPT_TIME=None,
+        )
+        self._cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_settings.disable()
+        if self._previous_cache_dir is None:
+            del os.environ["NADLOGAR_CACHE_DIR"]
+        else:
+            os.environ["NADLOGAR_CACHE_DIR"] = self._previous_cache_dir
+        self._cache_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
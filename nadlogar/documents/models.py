@@ -1,20 +1,137 @@
+import collections
+import contextlib
+import functools
+import json
 import os
 import subprocess
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
+from django.conf import settings
 from django.db import models
 from django.template import Context
 from django.template import Template as DjangoTemplate
 from django.utils.text import slugify
+from problems.workers import discard_problem_pool, get_problem_pool, student_data
+from utils.cache import FileCache
 
 from . import izpit
 
+try:
+    import fcntl
+except ImportError:
+    # File locks are not available on Windows.
+    fcntl = None
+
 
 class LaTeXError(Exception):
     pass
 
 
-def _pdf_latex(source):
+def _split_preamble(source):
+    """Splits a LaTeX source into its preamble and body.
+
+    If the source has no document environment, the preamble is None."""
+    index = source.find(r"\begin{document}")
+    if index == -1:
+        return None, source
+    return source[:index], source[index:]
+
+
+@functools.cache
+def _pdf_latex_version():
+    """Returns the version of pdflatex, as format files work only with the same one."""
+    try:
+        r = subprocess.run(["pdflatex", "--version"], capture_output=True)
+    except OSError:
+        return ""
+    return r.stdout.decode(errors="replace")
+
+
+@contextlib.contextmanager
+def _build_lock(build_dir):
+    """Tries to get an exclusive lock of the build directory, shared by all processes.
+
+    Yields whether the lock is held. We do not wait for the lock, so that
+    compilations never wait for formats built by others. On systems without fcntl,
+    the lock is always held."""
+    if fcntl is None:
+        yield True
+        return
+    with open(os.path.join(build_dir, ".lock"), "w") as lock_file:
+        # The lock is released when the file is closed.
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+        else:
+            yield True
+
+
+def _latex_format(preamble):
+    """Returns the name of a format file with a precompiled preamble.
+
+    Loading the document class and packages takes most of the compilation time, so we
+    dump the state of pdflatex after the preamble into a format file, which we keep in
+    a persistent build directory. Format files are named by the hash of the preamble,
+    the document class and the version of pdflatex, so any change to either results
+    in a new format file. If the format cannot be built or another format is being
+    built at the moment, None is returned.
+    """
+    build_dir = settings.LATEX_BUILD_DIR
+    format_name = FileCache.key(preamble, izpit.cls, _pdf_latex_version())
+    format_path = os.path.join(build_dir, format_name + ".fmt")
+    failure_path = os.path.join(build_dir, format_name + ".failed")
+    try:
+        # We mark the format as recently used, so that it is not pruned.
+        os.utime(format_path)
+        return format_name
+    except FileNotFoundError:
+        pass
+    # Preambles that fail to build are marked, so that we do not try again.
+    if os.path.exists(failure_path):
+        return None
+    os.makedirs(build_dir, exist_ok=True)
+    # Building a format takes a while, so we make sure that concurrent compilations
+    # of the same new template do not all build it. They compile the whole source
+    # instead of waiting.
+    with _build_lock(build_dir) as locked:
+        if not locked:
+            return None
+        if os.path.exists(format_path):
+            return format_name
+        # We build the format in a temporary directory and move it into place only
+        # once it is complete, so compilations never see an incomplete format.
+        with tempfile.TemporaryDirectory(dir=build_dir, prefix=".") as temp_dir:
+            with open(os.path.join(temp_dir, "izpit.cls"), "w") as izpit_cls_file:
+                izpit_cls_file.write(izpit.cls)
+            with open(os.path.join(temp_dir, "preamble.tex"), "w") as preamble_file:
+                preamble_file.write(preamble + "\n\\dump\n")
+            r = subprocess.run(
+                [
+                    "pdflatex",
+                    "-ini",
+                    "-interaction",
+                    "nonstopmode",
+                    f"-jobname={format_name}",
+                    "&pdflatex",
+                    "preamble.tex",
+                ],
+                capture_output=True,
+                cwd=temp_dir,
+            )
+            if r.returncode:
+                open(failure_path, "w").close()
+                return None
+            os.replace(os.path.join(temp_dir, format_name + ".fmt"), format_path)
+        # Formats of edited templates are never used again, so we remove the least
+        # recently used ones once there are too many.
+        FileCache(build_dir, settings.LATEX_BUILD_SIZE).evict()
+    return format_name
+
+
+def _run_pdf_latex(source, options=(), env=None):
     with tempfile.TemporaryDirectory() as temp_dir:
         with open(os.path.join(temp_dir, "izpit.cls"), "w") as izpit_cls_file:
             izpit_cls_file.write(izpit.cls)
@@ -22,9 +139,10 @@ def _pdf_latex(source):
             temp_file.write(source.encode())
             temp_file.flush()
             r = subprocess.run(
-                ["pdflatex", "-interaction", "nonstopmode", temp_file.name],
+                ["pdflatex", "-interaction", "nonstopmode", *options, temp_file.name],
                 capture_output=True,
                 cwd=temp_dir,
+                env=env,
             )
             if r.returncode:
                 raise LaTeXError(r.stdout, r.stderr)
@@ -34,6 +152,50 @@ def _pdf_latex(source):
                     return temp_pdf.read()
 
 
+def _compile_pdf_latex(source):
+    if settings.LATEX_BUILD_DIR is not None:
+        preamble, body = _split_preamble(source)
+        format_name = None if preamble is None else _latex_format(preamble)
+        if format_name is not None:
+            # The preamble is already contained in the format, so we compile just
+            # the body. An empty entry in TEXFORMATS stands for the default formats.
+            env = dict(os.environ, TEXFORMATS=f"{settings.LATEX_BUILD_DIR}{os.pathsep}")
+            try:
+                return _run_pdf_latex(body, [f"-fmt={format_name}"], env)
+            except LaTeXError:
+                # The format may have been pruned in the meantime or it may not work
+                # with the body, so we compile the whole source as usual. If the
+                # source is broken, this reports the error without the format.
+                pass
+    return _run_pdf_latex(source)
+
+
+def _pdf_latex(source):
+    if settings.LATEX_CACHE_DIR is None:
+        return _compile_pdf_latex(source)
+    cache = FileCache(settings.LATEX_CACHE_DIR, settings.LATEX_CACHE_SIZE)
+    # The resulting PDF is determined by the source and the document class.
+    key = cache.key(source, izpit.cls)
+    pdf_contents = cache.get(key, ".pdf")
+    if pdf_contents is not None:
+        return pdf_contents
+    # We also remember sources that fail to compile, so that we can report the
+    # same error without running pdflatex again.
+    error_output = cache.get(key, ".log")
+    if error_output is not None:
+        raise LaTeXError(
+            *(output.encode("latin-1") for output in json.loads(error_output))
+        )
+    try:
+        pdf_contents = _compile_pdf_latex(source)
+    except LaTeXError as error:
+        error_output = json.dumps([output.decode("latin-1") for output in error.args])
+        cache.set(key, ".log", error_output.encode())
+        raise
+    cache.set(key, ".pdf", pdf_contents)
+    return pdf_contents
+
+
 class Template(models.Model):
     INDIVIDUAL = "I"
     GROUPED_BY_STUDENTS = "S"
@@ -151,17 +313,63 @@ class Document(models.Model):
 
     def generate_student_problem_texts(self):
         students = self.student_group.students
-        student_problem_texts = {student: [] for student in students}
-        for problem in self.problems.all():
-            problem = problem.downcast()
-            for student in students:
-                rendered_text = problem.student_text(student)
-                student_problem_texts[student].append(rendered_text)
-        return student_problem_texts
+        problems = self.problems.downcast()
+        # The data of each problem is cached in a single entry for all students, so
+        # we read and update the entries here instead of in the worker processes.
+        problem_data = {problem.id: problem._cached_data() for problem in problems}
+        tasks = [
+            (problem, student)
+            for problem in problems
+            for student in students
+            if problem._student_seed(student) not in problem_data[problem.id]
+        ]
+        if settings.PROBLEM_WORKERS:
+            generated_data = self._generate_student_data_in_parallel(tasks)
+        else:
+            generated_data = (
+                problem._student_data(student) for problem, student in tasks
+            )
+        for (problem, student), data in zip(tasks, generated_data):
+            problem_data[problem.id][problem._student_seed(student)] = data
+        for problem in {problem.id: problem for problem, _ in tasks}.values():
+            problem._cache_data(problem_data[problem.id])
+        return {
+            student: [
+                problem.render(problem_data[problem.id][problem._student_seed(student)])
+                for problem in problems
+            ]
+            for student in students
+        }
+
+    def _generate_student_data_in_parallel(self, tasks):
+        # Each (problem, student) pair is generated in a separate task. Since the
+        # generated data depends only on the problem and the student, the data is
+        # the same as the one generated in the request thread.
+        pool = get_problem_pool(settings.PROBLEM_WORKERS)
+        # We submit the most expensive problems first, so that the slowest tasks do not
+        # end up running alone after all the others have finished.
+        by_cost = sorted(
+            tasks,
+            key=lambda task: task[0].expected_generation_cost(),
+            reverse=True,
+        )
+        generated_data = {
+            (problem.id, student.id): pool.submit(student_data, problem, student)
+            for problem, student in by_cost
+        }
+        try:
+            return [
+                generated_data[problem.id, student.id].result()
+                for problem, student in tasks
+            ]
+        except BrokenProcessPool:
+            # A worker that dies (for example, when it runs out of memory) breaks the
+            # pool, so the next request has to start a new one.
+            discard_problem_pool(pool)
+            raise
 
     def problem_examples(self):
-        for problem in self.problems.all():
-            problem = problem.downcast()
+        for problem in self.problems.downcast():
             rendered_text = problem.example_text()
             yield (problem, rendered_text)
 
@@ -170,13 +378,32 @@ class Document(models.Model):
         yield from self.sort.tex_files(self, student_problem_texts)
 
     def pdf_files(self):
-        for tex_file_name, tex_contents in self.tex_files():
-            pdf_file_name = tex_file_name.replace(".tex", ".pdf")
-            pdf_contents = _pdf_latex(tex_contents)
-            yield pdf_file_name, pdf_contents
+        # Since most of the time is spent waiting for pdflatex subprocesses, we compile
+        # the files in a pool of threads. The results are still yielded in the order of
+        # the files and the first LaTeXError is raised as soon as we reach it.
+        workers = settings.LATEX_WORKERS or os.cpu_count() or 1
+        executor = ThreadPoolExecutor(max_workers=workers)
+        # To keep the memory bounded when the consumer is slower than the workers,
+        # we only compile a limited number of files ahead of the one yielded next.
+        pending = collections.deque()
+        try:
+            for tex_file_name, tex_contents in self.tex_files():
+                pdf_file_name = tex_file_name.replace(".tex", ".pdf")
+                pending.append(
+                    (pdf_file_name, executor.submit(_pdf_latex, tex_contents))
+                )
+                if len(pending) > 2 * workers:
+                    pdf_file_name, pdf_contents = pending.popleft()
+                    yield pdf_file_name, pdf_contents.result()
+            while pending:
+                pdf_file_name, pdf_contents = pending.popleft()
+                yield pdf_file_name, pdf_contents.result()
+        finally:
+            # If compilation failed, there is no point in compiling the remaining files.
+            executor.shutdown(cancel_futures=True)
 
     def copy(self, group):
-        old_problems = list(self.problems.all())
+        old_problems = self.problems.downcast()
         self.student_group = group
         self.pk = None
         self.name += " (kopija)"
@@ -1,5 +1,28 @@
-from django.test import TestCase
+import io
+import os
+import subprocess
+import tempfile
+import zipfile
+from unittest import mock
+
+import sympy
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
 from model_bakery import baker
+from problems.models import GenerationTimeout, Problem
+from problems.workers import discard_problem_pool, get_problem_pool
+from utils.cache import FileCache
+from utils.memory import SympyCacheMiddleware, reports_memory_usage, sympy_cache_size
+
+from .models import (
+    LaTeXError,
+    _build_lock,
+    _compile_pdf_latex,
+    _latex_format,
+    _pdf_latex,
+)
+from .views import _zip_archive
 
 
 class DocumentTest(TestCase):
@@ -27,3 +50,323 @@ class DocumentTest(TestCase):
             self.assertEqual(self.stevilo_studentov, len(nadloge))
             for nadloge_studenta in nadloge.values():
                 self.assertEqual(stevilo_nalog, len(nadloge_studenta))
+
+    def test_vzporedno_generiranje(self):
+        """Texts generated in worker processes are the same as serially generated."""
+        document = baker.make("Document", student_group=self.student_group)
+        for vrsta in ["KrajsanjeUlomkov", "OdvodSestavljene", "KrajsanjeUlomkov"]:
+            baker.make(vrsta, document=document, number_of_subproblems=2)
+        with override_settings(PROBLEM_CACHE=None):
+            nadloge = document.generate_student_problem_texts()
+        with override_settings(PROBLEM_WORKERS=2):
+            vzporedne_nadloge = document.generate_student_problem_texts()
+            discard_problem_pool(get_problem_pool(2))
+        self.assertEqual(
+            list(nadloge.values()),
+            list(vzporedne_nadloge.values()),
+        )
+        # The data generated by the workers is cached for the next request.
+        with mock.patch.object(Problem, "_student_data") as student_data:
+            predpomnjene_nadloge = document.generate_student_problem_texts()
+            student_data.assert_not_called()
+        self.assertEqual(
+            list(nadloge.values()),
+            list(predpomnjene_nadloge.values()),
+        )
+
+    @override_settings(PROBLEM_GENERATION_TIMEOUT=0)
+    def test_casovna_omejitev(self):
+        """Generating fails with the problem that took too long to generate."""
+        document = baker.make("Document", student_group=self.student_group)
+        problem = baker.make("OdvodSestavljene", document=document)
+        with self.assertRaises(GenerationTimeout) as context:
+            document.generate_student_problem_texts()
+        self.assertEqual(context.exception.problem.id, problem.id)
+        with override_settings(PROBLEM_GENERATION_TIMEOUT=None):
+            nadloge = document.generate_student_problem_texts()
+        self.assertEqual(self.stevilo_studentov, len(nadloge))
+
+
+class DowncastTest(TestCase):
+    def test_downcast(self):
+        """Problems are downcast with one query for each problem kind."""
+        document = baker.make("Document")
+        vrste = [
+            "KrajsanjeUlomkov",
+            "OdvodSestavljene",
+            "KrajsanjeUlomkov",
+            "DeliteljVeckratnik",
+        ]
+        naloge = [baker.make(vrsta, document=document) for vrsta in vrste]
+        # Content types of the problems are cached already when saving them.
+        with self.assertNumQueries(4):
+            nadloge = document.problems.downcast()
+        self.assertEqual(
+            [type(naloga) for naloga in naloge], [type(naloga) for naloga in nadloge]
+        )
+        self.assertEqual(
+            [naloga.id for naloga in naloge], [naloga.id for naloga in nadloge]
+        )
+
+    @override_settings(PROBLEM_PARAMETER_STORAGE="json")
+    def test_downcast_json(self):
+        """With parameters stored in JSON, problems are loaded with one query."""
+        document = baker.make("Document")
+        naloge = [
+            baker.make("KrajsanjeUlomkov", document=document, najvecji_stevec=30),
+            baker.make("TemeGorisceEnacba", document=document, premaknjena=True),
+            baker.make("DeliteljVeckratnik", document=document),
+        ]
+        with self.assertNumQueries(1):
+            nadloge = document.problems.downcast()
+        self.assertEqual(
+            [(type(naloga), naloga.id, naloga._parameters()) for naloga in naloge],
+            [(type(naloga), naloga.id, naloga._parameters()) for naloga in nadloge],
+        )
+        # Loaded problems can be saved and copied as usual.
+        nadloge[0].najvecji_stevec = 40
+        nadloge[0].save()
+        kopija = nadloge[0].copy(document)
+        self.assertEqual(kopija.downcast().najvecji_stevec, 40)
+        self.assertEqual(
+            document.problems.get(id=kopija.id).downcast().najvecji_stevec, 40
+        )
+
+    @override_settings(PROBLEM_PARAMETER_STORAGE="json")
+    def test_downcast_json_neveljavni(self):
+        """Stored parameters are validated and missing ones take default values."""
+        naloga = baker.make("TemeGorisceEnacba")
+        Problem.objects.filter(id=naloga.id).update(parameters={})
+        self.assertFalse(Problem.objects.get(id=naloga.id).downcast().premaknjena)
+        Problem.objects.filter(id=naloga.id).update(
+            parameters={"premaknjena": "mogoče"}
+        )
+        with self.assertRaises(ValidationError):
+            Problem.objects.get(id=naloga.id).downcast()
+
+    def test_manjkajoca_vrstica(self):
+        """Problems missing from their child table are not returned as bare problems."""
+        document = baker.make("Document")
+        naloga = baker.make("KrajsanjeUlomkov", document=document)
+        baker.make("OdvodSestavljene", document=document)
+        naloga.delete(keep_parents=True)
+        with self.assertRaises(Problem.DoesNotExist) as context:
+            document.problems.downcast()
+        self.assertIn(str(naloga.id), str(context.exception))
+
+
+class PDFFilesTest(TestCase):
+    def setUp(self):
+        student_group = baker.make(
+            "StudentGroup",
+            _students="\n".join(f"Student{i}" for i in range(8)),
+        )
+        self.document = baker.make("Document", student_group=student_group)
+        baker.make(
+            "Template",
+            document_sort=self.document.sort,
+            type="I",
+            template="{{ student.name }}",
+        )
+
+    def test_vrstni_red(self):
+        """PDF files are yielded in the order of the TeX files."""
+        with mock.patch("documents.models._pdf_latex", side_effect=str.encode):
+            pdf_files = list(self.document.pdf_files())
+        tex_files = list(self.document.tex_files())
+        self.assertEqual(len(tex_files), len(pdf_files))
+        for (tex_name, tex_contents), (pdf_name, pdf_contents) in zip(
+            tex_files, pdf_files
+        ):
+            self.assertEqual(tex_name.replace(".tex", ".pdf"), pdf_name)
+            self.assertEqual(tex_contents.encode(), pdf_contents)
+
+    def test_napaka(self):
+        """A failed compilation raises LaTeXError."""
+
+        def _pdf_latex(source):
+            if source == "Student3":
+                raise LaTeXError(b"", b"")
+            return source.encode()
+
+        with mock.patch("documents.models._pdf_latex", side_effect=_pdf_latex):
+            with self.assertRaises(LaTeXError):
+                list(self.document.pdf_files())
+
+
+def _entry_size(directory):
+    """Returns the disk space taken by a small file in the given directory."""
+    path = os.path.join(directory, "velikost")
+    with open(path, "wb") as file:
+        file.write(10 * b"x")
+    try:
+        return 512 * os.stat(path).st_blocks
+    finally:
+        os.remove(path)
+
+
+class PDFCacheTest(TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.cache_dir = temp_dir.name
+
+    def test_predpomnilnik(self):
+        """Each source is compiled only once, even if it fails to compile."""
+
+        def _compile_pdf_latex(source):
+            if source == "napaka":
+                raise LaTeXError(b"izpis", b"\xff")
+            return source.encode()
+
+        with override_settings(LATEX_CACHE_DIR=self.cache_dir), mock.patch(
+            "documents.models._compile_pdf_latex", side_effect=_compile_pdf_latex
+        ) as compile_pdf_latex:
+            for _ in range(3):
+                self.assertEqual(b"vir", _pdf_latex("vir"))
+                with self.assertRaises(LaTeXError) as error:
+                    _pdf_latex("napaka")
+                self.assertEqual((b"izpis", b"\xff"), error.exception.args)
+        self.assertEqual(2, compile_pdf_latex.call_count)
+
+    def test_odstranjevanje(self):
+        """Least recently used entries are evicted once the cache is too large."""
+        # Entries take whole blocks, so the cache fits two but not three of them.
+        cache = FileCache(self.cache_dir, max_size=2.5 * _entry_size(self.cache_dir))
+        with mock.patch("utils.cache.os.scandir", wraps=os.scandir) as scandir:
+            cache.set("a", ".pdf", 10 * b"a")
+            cache.set("b", ".pdf", 10 * b"b")
+            # File timestamps may be too coarse to distinguish the two writes.
+            os.utime(os.path.join(self.cache_dir, "a.pdf"), (1, 1))
+            os.utime(os.path.join(self.cache_dir, "b.pdf"), (2, 2))
+            cache.get("a", ".pdf")
+            # The directory is scanned only when the cache is first used.
+            self.assertEqual(1, scandir.call_count)
+            cache.set("c", ".pdf", 10 * b"c")
+            self.assertEqual(2, scandir.call_count)
+        self.assertIsNotNone(cache.get("a", ".pdf"))
+        self.assertIsNone(cache.get("b", ".pdf"))
+        self.assertIsNotNone(cache.get("c", ".pdf"))
+
+
+class LaTeXFormatTest(TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.build_dir = temp_dir.name
+        version = mock.patch(
+            "documents.models._pdf_latex_version", return_value="pdfTeX 3.141592653"
+        )
+        version.start()
+        self.addCleanup(version.stop)
+
+    def test_rezervni_prevod(self):
+        """If compiling with a precompiled preamble fails, the whole source is used."""
+
+        def _run_pdf_latex(source, options=(), env=None):
+            if options:
+                raise LaTeXError(b"", b"")
+            return source.encode()
+
+        source = "preambula\\begin{document}telo"
+        with override_settings(LATEX_BUILD_DIR=self.build_dir), mock.patch(
+            "documents.models._latex_format", return_value="format"
+        ), mock.patch("documents.models._run_pdf_latex", side_effect=_run_pdf_latex):
+            self.assertEqual(source.encode(), _compile_pdf_latex(source))
+
+    def test_odstranjevanje(self):
+        """Least recently used formats are removed once there are too many."""
+
+        def run(command, cwd, **kwargs):
+            job_name = command[4].removeprefix("-jobname=")
+            with open(os.path.join(cwd, job_name + ".fmt"), "wb") as format_file:
+                format_file.write(10 * b"f")
+            return subprocess.CompletedProcess(command, 0)
+
+        with override_settings(
+            LATEX_BUILD_DIR=self.build_dir,
+            LATEX_BUILD_SIZE=2.5 * _entry_size(self.build_dir),
+        ), mock.patch("documents.models.subprocess.run", side_effect=run) as run_mock:
+            formats = [_latex_format(preamble) for preamble in ["a", "b", "a"]]
+            self.assertEqual(2, run_mock.call_count)
+            # File timestamps may be too coarse to distinguish the uses.
+            os.utime(os.path.join(self.build_dir, formats[0] + ".fmt"), (2, 2))
+            os.utime(os.path.join(self.build_dir, formats[1] + ".fmt"), (1, 1))
+            formats.append(_latex_format("c"))
+        self.assertEqual(
+            sorted([".lock", formats[0] + ".fmt", formats[3] + ".fmt"]),
+            sorted(os.listdir(self.build_dir)),
+        )
+
+    def test_neuspesna_preambula(self):
+        """Preambles that fail to build are not built again."""
+        failed = subprocess.CompletedProcess([], 1)
+        with override_settings(LATEX_BUILD_DIR=self.build_dir), mock.patch(
+            "documents.models.subprocess.run", return_value=failed
+        ) as run_mock:
+            self.assertIsNone(_latex_format("a"))
+            self.assertIsNone(_latex_format("a"))
+            self.assertEqual(1, run_mock.call_count)
+            # A different version of pdflatex may build the same preamble.
+            with mock.patch(
+                "documents.models._pdf_latex_version", return_value="pdfTeX 3.2"
+            ):
+                self.assertIsNone(_latex_format("a"))
+            self.assertEqual(2, run_mock.call_count)
+
+    def test_zaklenjena_mapa(self):
+        """Compilations do not wait while another format is being built."""
+        with override_settings(LATEX_BUILD_DIR=self.build_dir), mock.patch(
+            "documents.models.subprocess.run"
+        ) as run_mock, _build_lock(self.build_dir) as locked:
+            self.assertTrue(locked)
+            self.assertIsNone(_latex_format("a"))
+            run_mock.assert_not_called()
+
+
+class ZipArchiveTest(TestCase):
+    def test_arhiv(self):
+        """The streamed archive is valid and files with equal names are renamed."""
+        files = [("a/b.tex", "1"), ("a/c.tex", "2"), ("a/b.tex", "3")]
+        response = _zip_archive("Arhiv", iter(files))
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(["a/b.tex", "a/c.tex", "a/b_2.tex"], archive.namelist())
+        self.assertEqual(b"3", archive.read("a/b_2.tex"))
+
+
+def empty_view(request):
+    return HttpResponse()
+
+
+def streaming_view(request):
+    return StreamingHttpResponse(iter(["a", "b"]))
+
+
+class MemoryTest(TestCase):
+    def test_porocilo(self):
+        """Exports report the memory and the sympy cache size of the process."""
+        view = reports_memory_usage(empty_view)
+        with self.assertLogs("utils.memory", "INFO") as logs:
+            view(RequestFactory().get("/"))
+        self.assertIn("empty_view", logs.output[0])
+        self.assertIn("sympy cache", logs.output[0])
+
+    def test_porocilo_pretoka(self):
+        """Memory of streaming responses is reported once the content is consumed."""
+        view = reports_memory_usage(streaming_view)
+        with self.assertNoLogs("utils.memory", "INFO"):
+            response = view(RequestFactory().get("/"))
+        with self.assertLogs("utils.memory", "INFO") as logs:
+            self.assertEqual(b"ab", b"".join(response.streaming_content))
+        self.assertIn("streaming_view", logs.output[0])
+
+    @override_settings(SYMPY_CACHE_CLEAR_INTERVAL=1)
+    def test_praznjenje(self):
+        """The sympy cache is cleared after requests."""
+        x = sympy.symbols("x")
+        sympy.factor(x**2 - 1)
+        self.assertGreater(sympy_cache_size(), 0)
+        middleware = SympyCacheMiddleware(empty_view)
+        with self.assertLogs("utils.memory", "INFO"):
+            middleware(RequestFactory().get("/"))
+        self.assertEqual(sympy_cache_size(), 0)
@@ -1,13 +1,16 @@
 import io
+import itertools
 import zipfile
 
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.text import slugify
+from problems.models import GenerationTimeout, GeneratorExhausted
 from students.models import StudentGroup
 from students.views import get_group_if_allowed
+from utils.memory import reports_memory_usage
 
 from .forms import DocumentForm
 from .models import Document, LaTeXError
@@ -83,32 +86,85 @@ def copy_document(request, group_id: int, document_id: int, new_group_id: int):
         return redirect(new_document.get_absolute_url())
 
 
+class _ZipStream(io.RawIOBase):
+    """A write-only stream that collects the data written to it until it is popped.
+
+    Since the stream is not seekable, zipfile writes the archive strictly
+    sequentially, so we can send each part to the client as soon as it is written."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _zip_chunks(files):
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+        name_counter = {}
+        for file_name, file_contents in files:
+            # If there are multiple files with the same name, add a number
+            # before the file extension.
+            if file_name in name_counter:
+                name_counter[file_name] += 1
+                base_name, extension = file_name.rsplit(".", 1)
+                file_name = f"{base_name}_{name_counter[file_name]}.{extension}"
+            else:
+                name_counter[file_name] = 1
+            archive.writestr(file_name, file_contents)
+            yield stream.pop()
+    # Closing the archive writes the central directory.
+    yield stream.pop()
+
+
 def _zip_archive(archive_name, files):
-    string_buffer = io.BytesIO()
-    archive = zipfile.ZipFile(string_buffer, "w", zipfile.ZIP_DEFLATED)
-    name_counter = {}
-    for file_name, file_contents in files:
-        # If there are multiple files with the same name, add a number
-        # before the file extension.
-        if file_name in name_counter:
-            name_counter[file_name] += 1
-            base_name, extension = file_name.rsplit(".", 1)
-            file_name = f"{base_name}_{name_counter[file_name]}.{extension}"
-        else:
-            name_counter[file_name] = 1
-        archive.writestr(file_name, file_contents)
-    archive.close()
-    response = HttpResponse(string_buffer.getvalue(), content_type="application/zip")
+    response = StreamingHttpResponse(_zip_chunks(files), content_type="application/zip")
     response["Content-Disposition"] = 'attachment; filename="{0}.zip"'.format(
         slugify(archive_name)
     )
     return response
 
 
+def _pdf_files_with_error_log(first_files, files):
+    yield from first_files
+    try:
+        yield from files
+    except LaTeXError as error:
+        # Once the response has started, we can no longer display an error page, so we
+        # add the pdflatex output to the archive instead.
+        yield "napaka.log", error.args[0]
+
+
+def _generator_error(request, document, error):
+    return render(
+        request,
+        "documents/generator_error.html",
+        {
+            "document": document,
+            "error": error,
+            "timeout": isinstance(error, GenerationTimeout),
+        },
+    )
+
+
 @login_required
+@reports_memory_usage
 def preview(request, group_id: int, document_id: int):
     document = _get_document_if_allowed(request, group_id, document_id)
-    student_problem_texts = document.generate_student_problem_texts()
+    try:
+        student_problem_texts = document.generate_student_problem_texts()
+    except (GeneratorExhausted, GenerationTimeout) as error:
+        return _generator_error(request, document, error)
     problems = [{"students": []} for _ in document.problems.all()]
     for student, problem_texts in student_problem_texts.items():
         for i, problem_text in enumerate(problem_texts):
@@ -121,19 +177,38 @@ def preview(request, group_id: int, document_id: int):
 
 
 @login_required
+@reports_memory_usage
 def download_tex(request, group_id: int, document_id: int):
     document = _get_document_if_allowed(request, group_id, document_id)
-    return _zip_archive(document.name, document.tex_files())
+    files = document.tex_files()
+    try:
+        # Problem texts are generated before the first file is produced, so we can
+        # still display an error page if a generator fails.
+        first_files = list(itertools.islice(files, 1))
+    except (GeneratorExhausted, GenerationTimeout) as error:
+        return _generator_error(request, document, error)
+    return _zip_archive(document.name, itertools.chain(first_files, files))
 
 
 @login_required
+@reports_memory_usage
 def download_pdf(request, group_id: int, document_id: int):
     document = _get_document_if_allowed(request, group_id, document_id)
+    files = document.pdf_files()
     try:
-        return _zip_archive(document.name, document.pdf_files())
+        # We compile the first file before responding, so that we can still display
+        # an error page if the templates are broken.
+        first_files = list(itertools.islice(files, 1))
     except LaTeXError as error:
         return render(
             request,
             "documents/latex_error.html",
-            {"document": document, "error": error},
+            {
+                "document": document,
+                "error": error,
+                "timeout": isinstance(error, GenerationTimeout),
+            },
         )
+    except (GeneratorExhausted, GenerationTimeout) as error:
+        return _generator_error(request, document, error)
+    return _zip_archive(document.name, _pdf_files_with_error_log(first_files, files))
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ProblemsConfig(AppConfig):
+    name = "problems"
+
+    def ready(self):
+        from . import registry
+
+        registry.register_problem_kinds()
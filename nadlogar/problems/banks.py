@@ -0,0 +1,103 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+# A sample bank stores the data of all possible outcomes of a problem generator in
+# a single file with the following layout:
+#
+#     number of samples n
+#     offsets o_0, o_1, ..., o_n
+#     data of samples 0, 1, ..., n - 1
+#
+# The number and the offsets are 64-bit unsigned integers and the data of sample i,
+# encoded as JSON, spans the bytes from o_i to o_(i + 1). Outcomes whose data is not
+# suitable are stored as null. Banks are memory-mapped, so looking up a sample only
+# reads a few pages, and all worker processes share the pages of the same bank.
+
+_INTEGER = struct.Struct("<Q")
+_INTERVAL = struct.Struct("<QQ")
+
+
+class SampleBank:
+    """A read-only, memory-mapped list of generated problem data.
+
+    Samples can be looked up either by their index or by the outcome that they were
+    generated from, given a list of outcomes in the order of samples.
+    """
+
+    def __init__(self, path, outcomes):
+        with open(path, "rb") as bank_file:
+            self._map = mmap.mmap(bank_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (self._length,) = _INTEGER.unpack_from(self._map, 0)
+        self._indices = {outcome: index for index, outcome in enumerate(outcomes)}
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        start, end = _INTERVAL.unpack_from(self._map, _INTEGER.size * (index + 1))
+        return json.loads(self._map[start:end])
+
+    def lookup(self, outcome):
+        """Returns the sample generated from the given outcome."""
+        return self[self._indices[outcome]]
+
+    @staticmethod
+    def write(path, samples):
+        """Writes a bank with the given samples, replacing the file atomically."""
+        encoded_samples = [json.dumps(sample).encode() for sample in samples]
+        offset = _INTEGER.size * (len(encoded_samples) + 2)
+        offsets = []
+        for encoded_sample in encoded_samples:
+            offsets.append(offset)
+            offset += len(encoded_sample)
+        offsets.append(offset)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=".")
+        try:
+            with os.fdopen(file_descriptor, "wb") as temp_file:
+                temp_file.write(_INTEGER.pack(len(encoded_samples)))
+                for offset in offsets:
+                    temp_file.write(_INTEGER.pack(offset))
+                for encoded_sample in encoded_samples:
+                    temp_file.write(encoded_sample)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def open_bank(path, sample_space):
+    """Returns the bank of samples stored at the given path or None if there is none.
+
+    Banks are looked up by the outcomes returned by sample_space. Opened banks are
+    kept for the lifetime of the process.
+    """
+    with _banks_lock:
+        if path in _banks:
+            return _banks[path]
+    if not os.path.exists(path):
+        return None
+    bank = SampleBank(path, sample_space())
+    with _banks_lock:
+        return _banks.setdefault(path, bank)
+
+
+def build_bank(path, sample_space, generate_sample):
+    """Stores the bank of samples for all outcomes in the given sample space.
+
+    We compute the samples by calling generate_sample on each outcome returned by
+    sample_space. If the bank is already stored at the given path, we do nothing.
+    """
+    if not os.path.exists(path):
+        SampleBank.write(path, [generate_sample(outcome) for outcome in sample_space()])
@@ -3,13 +3,15 @@ from django.core.exceptions import ValidationError
 from django.utils.text import normalize_newlines
 
 
-def problem_form(content_type, *args, **kwargs):
-    """Returns a form for editing a problem.
+def problem_form_class(kind):
+    """Returns a form class for editing problems of a given kind.
 
     The form is generated dynamically based on the problem generator class. The
-    form is used for both creating a new problem and editing an existing one."""
+    form is used for both creating a new problem and editing an existing one. Since
+    creating a form class is relatively slow, the classes are created once for each
+    problem kind and kept in the registry of problem kinds."""
 
-    Generator = content_type.model_class()
+    Generator = kind.generator
 
     class ProblemForm(forms.ModelForm):
         """A form for editing a problem.
@@ -35,8 +37,8 @@ def problem_form(content_type, *args, **kwargs):
             # If the instance does not use custom text, we set the initial values
             # for the instruction and solution fields to the default values.
             if not instance_uses_custom_text:
-                self.initial["instruction"] = Generator.default_instruction
-                self.initial["solution"] = Generator.default_solution
+                self.initial["instruction"] = kind.default_instruction
+                self.initial["solution"] = kind.default_solution
             self.initial["uses_custom_text"] = (
                 instance_uses_custom_text and user_wants_custom_text
             )
@@ -66,8 +68,8 @@ def problem_form(content_type, *args, **kwargs):
                     if normalized_value == normalized_default:
                         self.cleaned_data[field] = ""
 
-                _erase_if_equal("instruction", Generator.default_instruction)
-                _erase_if_equal("solution", Generator.default_solution)
+                _erase_if_equal("instruction", kind.default_instruction)
+                _erase_if_equal("solution", kind.default_solution)
                 for field_name in ["instruction", "solution"]:
                     if self.cleaned_data[field_name]:
                         errors[field_name] = (
@@ -85,4 +87,4 @@ def problem_form(content_type, *args, **kwargs):
                 for field in self.visible_fields()
             )
 
-    return ProblemForm(*args, **kwargs)
+    return ProblemForm
@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from utils.cache import FileCache
+
+from .registry import problem_kinds
+
+
+def _gallery_key(kinds):
+    # Example texts change only when the code of the generators does, so we include
+    # its version in the key, together with the content types that the gallery links.
+    parts = []
+    for kind in kinds:
+        parts += [kind.generator._meta.label, str(kind.content_type_id)]
+        parts.append(kind.generator._generator_version())
+    return "problems:gallery:" + FileCache.key(*parts)
+
+
+def _build_gallery(kinds):
+    problem_groups = {}
+    for kind in kinds:
+        # We create an instance of the generator class to get the example text.
+        example_problem = kind.generator()
+        example_text = example_problem.example_text()
+        problem_groups.setdefault(kind.group, []).append(
+            (
+                kind.content_type_id,
+                example_text,
+                kind.description,
+            )
+        )
+    # We use the "???" group as a hack for any problems we do not want to display.
+    if "???" in problem_groups:
+        del problem_groups["???"]
+    special_problems = problem_groups.pop("Razno")
+    return [("Razno", special_problems)] + sorted(problem_groups.items())
+
+
+def problem_gallery(refresh=False):
+    """Returns example texts of all problem kinds, grouped for the problem picker.
+
+    Since example data is generated with a fixed seed, the texts change only when
+    the generators do, so we store them in the cache instead of generating dozens
+    of examples on each page load. If refresh is True, the texts are regenerated.
+    """
+    kinds = problem_kinds()
+    key = _gallery_key(kinds)
+    grouped_problems = None if refresh else cache.get(key)
+    if grouped_problems is None:
+        grouped_problems = _build_gallery(kinds)
+        cache.set(key, grouped_problems, timeout=None)
+    return grouped_problems
@@ -0,0 +1,130 @@
+from fractions import Fraction
+
+# Complex numbers in generators mostly have small integer or rational components, and
+# computing with them in sympy is much slower than necessary. This module provides
+# exact complex numbers with rational components together with a LaTeX printer whose
+# output is the same as the output of sympy.latex for the corresponding numbers.
+
+
+def _fraction_latex(numerator, denominator, factor=""):
+    """Returns the LaTeX code of a positive fraction multiplied by a factor."""
+    if factor:
+        tex = factor if numerator == 1 else f"{numerator} {factor}"
+    else:
+        tex = str(numerator)
+    if denominator != 1:
+        tex = rf"\frac{{{tex}}}{{{denominator}}}"
+    return tex
+
+
+class GaussianRational:
+    """An exact complex number with rational real and imaginary parts."""
+
+    __slots__ = ("real", "imag")
+
+    def __init__(self, real, imag=0):
+        self.real = Fraction(real)
+        self.imag = Fraction(imag)
+
+    @staticmethod
+    def _coerce(value):
+        if isinstance(value, GaussianRational):
+            return value
+        return GaussianRational(value)
+
+    def __eq__(self, other):
+        if not isinstance(other, (GaussianRational, int, Fraction)):
+            return NotImplemented
+        other = self._coerce(other)
+        return self.real == other.real and self.imag == other.imag
+
+    def __hash__(self):
+        return hash((self.real, self.imag))
+
+    def __complex__(self):
+        return complex(float(self.real), float(self.imag))
+
+    def __repr__(self):
+        return f"GaussianRational({self.real}, {self.imag})"
+
+    def _sympy_(self):
+        # Sympy converts objects with this method when they appear in expressions.
+        import sympy
+
+        return sympy.Rational(
+            self.real.numerator, self.real.denominator
+        ) + sympy.I * sympy.Rational(self.imag.numerator, self.imag.denominator)
+
+    def __neg__(self):
+        return GaussianRational(-self.real, -self.imag)
+
+    def __add__(self, other):
+        other = self._coerce(other)
+        return GaussianRational(self.real + other.real, self.imag + other.imag)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self + (-self._coerce(other))
+
+    def __rsub__(self, other):
+        return self._coerce(other) - self
+
+    def __mul__(self, other):
+        other = self._coerce(other)
+        return GaussianRational(
+            self.real * other.real - self.imag * other.imag,
+            self.real * other.imag + self.imag * other.real,
+        )
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        other = self._coerce(other)
+        norm = other.norm()
+        return GaussianRational(
+            (self.real * other.real + self.imag * other.imag) / norm,
+            (self.imag * other.real - self.real * other.imag) / norm,
+        )
+
+    def __rtruediv__(self, other):
+        return self._coerce(other) / self
+
+    def __pow__(self, exponent):
+        if exponent < 0:
+            return 1 / self**-exponent
+        result, power = GaussianRational(1), self
+        while exponent:
+            if exponent % 2:
+                result *= power
+            power *= power
+            exponent //= 2
+        return result
+
+    def conjugate(self):
+        return GaussianRational(self.real, -self.imag)
+
+    def norm(self):
+        """Returns the square of the modulus."""
+        return self.real**2 + self.imag**2
+
+    def latex(self):
+        """Returns the LaTeX code of the number as printed by sympy.latex.
+
+        >>> GaussianRational(Fraction(-1, 2), Fraction(3, 4)).latex()
+        '- \\\\frac{1}{2} + \\\\frac{3 i}{4}'
+        """
+        real, imag = self.real, self.imag
+        tex = ""
+        if real:
+            if real < 0:
+                # Sympy prints negative integers without a space after the sign.
+                tex += "-" if real.denominator == 1 else "- "
+            tex += _fraction_latex(abs(real.numerator), real.denominator)
+        if imag:
+            if tex:
+                tex += " - " if imag < 0 else " + "
+            elif imag < 0:
+                tex += "- "
+            tex += _fraction_latex(abs(imag.numerator), imag.denominator, "i")
+        return tex or "0"
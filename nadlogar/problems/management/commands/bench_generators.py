@@ -0,0 +1,229 @@
+import json
+import statistics
+import time
+from unittest import mock
+
+import sympy
+from django.core.management.base import BaseCommand, CommandError
+
+from ...memo import memo_statistics
+from ...models import GeneratedDataIncorrect
+from ...registry import problem_kinds
+
+# Functions of sympy whose share of the generation time we report. Generators call
+# them through the sympy module, so we can measure them by replacing its attributes.
+SYMPY_FUNCTIONS = ["latex", "simplify"]
+
+
+class _Timer:
+    """Measures the total time spent in the given functions of sympy."""
+
+    def __init__(self, names):
+        self.totals = dict.fromkeys(names, 0.0)
+        self._depth = 0
+
+    def wrap(self, name, function):
+        def timed_function(*args, **kwargs):
+            # We only measure the outermost call, as simplify may call itself.
+            self._depth += 1
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.totals[name] += time.perf_counter() - start
+
+        return timed_function
+
+
+def _attempt_counter(generate, counts):
+    def counting_generate(rng):
+        counts["attempts"] += 1
+        try:
+            return generate(rng)
+        except GeneratedDataIncorrect:
+            counts["rejected"] += 1
+            raise
+
+    return counting_generate
+
+
+def _draw_counter(draw, counts):
+    def counting_draw(rng):
+        counts["attempts"] += 1
+        return draw(rng)
+
+    return counting_draw
+
+
+def _rejection_counter(validate, counts):
+    def counting_validate(condition):
+        if not condition:
+            counts["rejected"] += 1
+        return validate(condition)
+
+    return counting_validate
+
+
+def _percentile(quantiles, percent):
+    return round(quantiles[percent - 1] * 1000, 3)
+
+
+def benchmark(generator, parameters, seeds):
+    """Generates problems with the given parameters and reports the time it took.
+
+    Times are given in milliseconds per problem, and a problem is counted as
+    a retry if its generator raised GeneratedDataIncorrect or produced a duplicate.
+    """
+    problem = generator(**parameters)
+    counts = {"attempts": 0, "rejected": 0}
+    # A sample bank is built only once, so we build it before measuring. Instance
+    # attributes take precedence over the methods of the class.
+    if problem._build_sample_bank() is None:
+        problem.generate = _attempt_counter(problem.generate, counts)
+    else:
+        # Data is looked up in the bank instead of generated, so we count the draws
+        # and the failed checks of the looked up samples.
+        problem.draw = _draw_counter(problem.draw, counts)
+        problem.validate = _rejection_counter(problem.validate, counts)
+    timer = _Timer(SYMPY_FUNCTIONS)
+    patches = [
+        mock.patch.object(sympy, name, timer.wrap(name, getattr(sympy, name)))
+        for name in SYMPY_FUNCTIONS
+    ]
+    times = []
+    for patch in patches:
+        patch.start()
+    try:
+        for seed in range(seeds):
+            start = time.perf_counter()
+            problem._generate_data(f"bench-{seed}")
+            times.append(time.perf_counter() - start)
+    finally:
+        for patch in patches:
+            patch.stop()
+    total_time = sum(times)
+    samples = seeds * problem.number_of_subproblems
+    quantiles = statistics.quantiles(times, n=100, method="inclusive")
+    return {
+        "parameters": parameters,
+        "seeds": seeds,
+        "p50": _percentile(quantiles, 50),
+        "p95": _percentile(quantiles, 95),
+        "p99": _percentile(quantiles, 99),
+        "retries_per_sample": round((counts["attempts"] - samples) / samples, 3),
+        "rejected_per_sample": round(counts["rejected"] / samples, 3),
+        **{
+            f"sympy_{name}_share": round(timer.totals[name] / total_time, 3)
+            for name in SYMPY_FUNCTIONS
+        },
+    }
+
+
+def compare(baseline, results, threshold):
+    """Returns the benchmarks whose latency increased by more than the threshold."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or "error" in baseline[name] or "error" in result:
+            continue
+        for percentile in ["p50", "p95", "p99"]:
+            old, new = baseline[name][percentile], result[percentile]
+            if old > 0 and new / old > threshold:
+                regressions.append(
+                    {
+                        "benchmark": name,
+                        "percentile": percentile,
+                        "baseline": old,
+                        "current": new,
+                        "ratio": round(new / old, 3),
+                    }
+                )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the latency of problem generators and reports it in JSON. "
+        "With --compare, latencies are compared to a saved baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "kinds",
+            nargs="*",
+            help="Names of problem kinds to measure. By default, all are measured.",
+        )
+        parser.add_argument(
+            "--seeds",
+            type=int,
+            default=100,
+            help="Number of seeds for each problem kind.",
+        )
+        parser.add_argument(
+            "--parameters",
+            type=json.loads,
+            default={},
+            help=(
+                "A JSON object that maps names of problem kinds to lists of parameter "
+                "objects, which are measured in addition to the default parameters."
+            ),
+        )
+        parser.add_argument(
+            "--output",
+            help="A file to which the results are written instead of the output.",
+        )
+        parser.add_argument(
+            "--compare",
+            metavar="BASELINE",
+            help="A file with saved results to which the new results are compared.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=1.2,
+            help="The ratio of latencies above which a change counts as regression.",
+        )
+
+    def benchmark(self, generator, parameters, seeds):
+        try:
+            return benchmark(generator, parameters, seeds)
+        except Exception as error:
+            # A failing generator should not prevent us from measuring the others.
+            return {
+                "parameters": parameters,
+                "error": f"{type(error).__name__}: {error}",
+            }
+
+    def handle(self, *args, **options):
+        if options["seeds"] < 2:
+            raise CommandError("At least two seeds are needed to compute percentiles.")
+        generators = {
+            kind.generator.__name__: kind.generator for kind in problem_kinds()
+        }
+        unknown_kinds = set(options["kinds"]) - generators.keys()
+        if unknown_kinds:
+            raise CommandError(f"Unknown problem kinds: {', '.join(unknown_kinds)}")
+        results = {}
+        for name, generator in generators.items():
+            if options["kinds"] and name not in options["kinds"]:
+                continue
+            results[name] = self.benchmark(generator, {}, options["seeds"])
+            for parameters in options["parameters"].get(name, []):
+                key = f"{name} {json.dumps(parameters, sort_keys=True)}"
+                results[key] = self.benchmark(generator, parameters, options["seeds"])
+        report = {"results": results, "memo": memo_statistics()}
+        if options["compare"]:
+            with open(options["compare"]) as baseline_file:
+                baseline = json.load(baseline_file)["results"]
+            report["regressions"] = compare(baseline, results, options["threshold"])
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w") as output_file:
+                output_file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+        if report.get("regressions"):
+            raise CommandError(
+                f"Found {len(report['regressions'])} regressions against the baseline."
+            )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from ...registry import problem_kinds
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds sample banks for the default parameters of all problem kinds and for "
+        "the parameters of all saved problems."
+    )
+
+    def handle(self, *args, **options):
+        paths = set()
+        for kind in problem_kinds():
+            if kind.generator()._sample_bank_path() is None:
+                # The generator does not use sample banks.
+                continue
+            # Saved problems are loaded through the kind, so they have its generator.
+            for problem in [kind.generator(), *kind.generator.objects.all()]:
+                path = problem._sample_bank_path()
+                if path not in paths:
+                    problem._build_sample_bank()
+                    paths.add(path)
+        self.stdout.write(self.style.SUCCESS(f"Prepared {len(paths)} sample banks."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ...gallery import problem_gallery
+
+
+class Command(BaseCommand):
+    help = "Generates example texts of all problem kinds and stores them in the cache."
+
+    def handle(self, *args, **options):
+        grouped_problems = problem_gallery(refresh=True)
+        count = sum(len(problems) for _, problems in grouped_problems)
+        self.stdout.write(self.style.SUCCESS(f"Generated {count} example problems."))
@@ -0,0 +1,90 @@
+import collections
+import threading
+
+import sympy
+from django.conf import settings
+
+# Since parameter spaces of generators are small, the same sympy expressions are
+# printed, simplified, differentiated and factored over and over again for different
+# students and documents. Generators can opt into memoizing these operations by
+# calling them through this module, for example memo.latex(expression) instead of
+# sympy.latex(expression). Results are kept for the lifetime of the process, so they
+# are shared by all generators running in the same worker.
+
+
+class Memo:
+    """A size-bounded LRU memo of an operation on sympy expressions.
+
+    Results are looked up by the structural hash of the expression and the remaining
+    (hashable) arguments. Sympy considers floats equal to rationals and to floats of
+    a different precision with the same value, so expressions containing floats are
+    not memoized, as their results may differ.
+    """
+
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self.hits = 0
+        self.misses = 0
+        self._results = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, expression, *args, **options):
+        if not isinstance(expression, sympy.Basic) or expression.has(sympy.Float):
+            return self.function(expression, *args, **options)
+        key = (expression, args, tuple(sorted(options.items())))
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                self._results.move_to_end(key)
+                return self._results[key]
+            self.misses += 1
+        result = self.function(expression, *args, **options)
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > settings.PROBLEM_MEMO_SIZE:
+                self._results.popitem(last=False)
+        return result
+
+    def __len__(self):
+        return len(self._results)
+
+    def hit_rate(self):
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+    def clear(self):
+        """Forgets all results and resets the counters."""
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# The functions of sympy are looked up on each call, so that they can be replaced,
+# for example when measuring their share of the generation time.
+latex = Memo("latex", lambda expression, **options: sympy.latex(expression, **options))
+simplify = Memo("simplify", lambda expression: sympy.simplify(expression))
+factor = Memo("factor", lambda expression: sympy.factor(expression))
+diff = Memo("diff", lambda expression, *symbols: expression.diff(*symbols))
+
+_memos = [latex, simplify, factor, diff]
+
+
+def memo_statistics():
+    """Returns the number of hits, misses and stored results of each operation."""
+    return {
+        memo.name: {
+            "hits": memo.hits,
+            "misses": memo.misses,
+            "hit_rate": memo.hit_rate(),
+            "size": len(memo),
+        }
+        for memo in _memos
+    }
+
+
+def clear_memos():
+    """Forgets the results of all operations."""
+    for memo in _memos:
+        memo.clear()
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("problems", "0025_temegorisceenacba_premaknjena"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="estimated_cost",
+            field=models.FloatField(default=None, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+def copy_parameters(apps, schema_editor):
+    """Copies the parameters of existing problems from the child tables."""
+    Problem = apps.get_model("problems", "Problem")
+    for model in apps.get_app_config("problems").get_models():
+        if Problem not in model._meta.parents:
+            continue
+        fields = [
+            field
+            for field in model._meta.local_concrete_fields
+            if not field.remote_field
+        ]
+        for problem in model.objects.all():
+            parameters = {
+                field.attname: field.value_from_object(problem) for field in fields
+            }
+            Problem.objects.filter(id=problem.problem_ptr_id).update(
+                parameters=parameters
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("problems", "0026_problem_estimated_cost"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="parameters",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.RunPython(copy_parameters, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,9 @@
-import random
-
 import sympy
 
 from .meta import GeneratedDataIncorrect, Problem
 
 
-def naredi_eksponentno(do=3, cela_osnova=False, premik=0):
+def naredi_eksponentno(rng, do=3, cela_osnova=False, premik=0):
     """
     Funkcija vrne naključno eksponentno funkcijo, ki ustreza vpisanim pogojem.
     """
@@ -19,7 +17,7 @@ def naredi_eksponentno(do=3, cela_osnova=False, premik=0):
             + [sympy.Rational(x, 4) for x in range(1, 4 * (do)) if x != 4]
             + [sympy.Rational(x, 5) for x in range(1, 5 * (do)) if x != 5]
         )
-    osnova = random.choice(izbor)
+    osnova = rng.choice(izbor)
     return (osnova, premik, sympy.Add(sympy.Pow(osnova, x), premik, evaluate=False))
 
 
@@ -80,19 +78,20 @@ class ResevanjeEksponentneEnacbe(Problem):
 
     default_instruction = r"""Reši eksponentno enačbo $@enacba$."""
     default_solution = r"""$x=@resitev$."""
+    generation_cost = 10
 
     class Meta:
         verbose_name = (
             "Eksponentna funkcija / reševanje eksponentne enačbe z eno osnovo"
         )
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
-        osnova = random.choice([2, 3, 4, 5, 10])
-        zamik_clena1 = random.choice([-3, -2, -1, 1, 2, 3])
-        zamik_clena2 = random.choice([-3, -2, -1, 1, 2, 3])
-        k_clena2 = random.choice([1, 2, 3, -1, -2, -3])
-        resitev = random.choice([-1, 0, 1, 2, 3])
+        osnova = rng.choice([2, 3, 4, 5, 10])
+        zamik_clena1 = rng.choice([-3, -2, -1, 1, 2, 3])
+        zamik_clena2 = rng.choice([-3, -2, -1, 1, 2, 3])
+        k_clena2 = rng.choice([1, 2, 3, -1, -2, -3])
+        resitev = rng.choice([-1, 0, 1, 2, 3])
         if not (-2 < (resitev + zamik_clena1) and -2 < (resitev + zamik_clena2)):
             raise GeneratedDataIncorrect
         vrednost = sympy.Rational(
@@ -115,6 +114,7 @@ class ResevanjeEksponentneEnacbeZDvemaOsnovama(Problem):
 
     default_instruction = r"""Reši eksponentno enačbo $@enacba$."""
     default_solution = r"""$x=@resitev$"""
+    generation_cost = 20
 
     class Meta:
         verbose_name = (
@@ -123,21 +123,21 @@ class ResevanjeEksponentneEnacbeZDvemaOsnovama(Problem):
 
     # TODO Ta funkcija daje zelo nenavadne in nenaravne naloge. Morda jo je treba popraviti.
 
-    def generate(self):
-        [osnova1, osnova2] = random.sample([2, 3, 5, 7, 10], 2)
+    def generate(self, rng):
+        [osnova1, osnova2] = rng.sample([2, 3, 5, 7, 10], 2)
         x = sympy.symbols("x")
-        u = random.choice([0, 1, 2, 3])
-        v = random.choice([0, 1, 2, 3])
+        u = rng.choice([0, 1, 2, 3])
+        v = rng.choice([0, 1, 2, 3])
         # V primeru, da imamo kako osnovo 7 ali 10, nekoliko omejimo zamik, da ne pridejo prevelike vrednosti.
         if max(osnova1, osnova2) > 5:
-            komponenta1_zamika_enacbe1 = random.randint(-3, 3)
+            komponenta1_zamika_enacbe1 = rng.randint(-3, 3)
         else:
-            komponenta1_zamika_enacbe1 = random.randint(-5, 5)
-        komponenta2_zamika_enacbe1 = random.choice([1, 2])
+            komponenta1_zamika_enacbe1 = rng.randint(-5, 5)
+        komponenta2_zamika_enacbe1 = rng.choice([1, 2])
         komponenta1_zamika_enacbe2 = komponenta1_zamika_enacbe1 - v + u
-        komponenta2_zamika_enacbe2 = random.choice([1, 2])
-        k_osnove1_levi = random.choice([1, 2, 3, 4, 5])
-        k_osnove1_desni = random.choice([1, 2, 3, 4, 5])
+        komponenta2_zamika_enacbe2 = rng.choice([1, 2])
+        k_osnove1_levi = rng.choice([1, 2, 3, 4, 5])
+        k_osnove1_desni = rng.choice([1, 2, 3, 4, 5])
         k_osnove2_levi = (
             osnova2**u - osnova1**komponenta2_zamika_enacbe1 * k_osnove1_levi
         )
@@ -1,21 +1,24 @@
-import random
+import itertools
+from fractions import Fraction
 
 import sympy
 from django.db import models
 
+from ..gaussian_rationals import GaussianRational
+from ..polynomials import sqrt_latex
 from .meta import GeneratedDataIncorrect, Problem
 
 
-def generiraj_kompleksna_stevila(kolicina):
-    stevila_r = random.choices(
+def generiraj_kompleksna_stevila(rng, kolicina):
+    stevila_r = rng.choices(
         [x for x in range(-5, 6) if x != 0],
         k=kolicina,  # Izbere naključne realne dele
     )
-    stevila_i = random.choices(
+    stevila_i = rng.choices(
         [x for x in range(-5, 6) if x != 0],
         k=kolicina,  # Izbere naključne imaginarne dele
     )
-    stevila = [r + i * sympy.I for r, i in zip(stevila_r, stevila_i)]
+    stevila = [GaussianRational(r, i) for r, i in zip(stevila_r, stevila_i)]
 
     if len(stevila) != len(
         set(stevila)
@@ -28,6 +31,102 @@ def generiraj_kompleksna_stevila(kolicina):
     return stevila
 
 
+def vrstni_red_clena(stevilo):
+    """
+    Vrne ključ, po katerem sympy uredi člene vsote s podano vrednostjo. Sympy jih
+    primerja po približkih v plavajoči vejici, zato jih izračunamo na enak način.
+    """
+    re, im = stevilo.real, stevilo.imag
+    return ((im != 0, im), (re, im))
+
+
+def _produkt_latex(koeficient, stevilo):
+    """
+    Vrne LaTeX zapis neovrednotenega produkta pozitivnega racionalnega koeficienta in
+    kompleksnega števila, kot ga zapiše sympy.
+    """
+    # Med števili sympy zapiše piko, če se tudi kompleksno število začne s števko.
+    locilo = r" \cdot " if stevilo.real > 0 else " "
+    faktor = rf"\left({stevilo.latex()}\right)"
+    if koeficient.numerator == 1 and koeficient.denominator != 1:
+        stevec = stevilo.latex()
+    else:
+        stevec = f"{koeficient.numerator}{locilo}{faktor}"
+    if koeficient.denominator == 1:
+        return stevec
+    return rf"\frac{{{stevec}}}{{{koeficient.denominator}}}"
+
+
+def vsota_clenov_latex(koeficienti, stevila):
+    """
+    Vrne LaTeX zapis neovrednotene vsote produktov racionalnih koeficientov in
+    kompleksnih števil, kot ga zapiše sympy.
+    """
+    cleni = sorted(
+        zip(koeficienti, stevila),
+        key=lambda clen: vrstni_red_clena(complex(float(clen[0])) * complex(clen[1])),
+    )
+    izraz = ""
+    for i, (k, z) in enumerate(cleni):
+        if k > 0:
+            izraz += (" + " if i > 0 else "") + _produkt_latex(k, z)
+        elif k == -1:
+            # Sympy zapiše -1 * z kot -z, ki ga v nadaljnjih členih vsote obda z
+            # oklepaji, na začetku pa ne.
+            if i > 0:
+                izraz += rf" - \left({z.latex()}\right)"
+            else:
+                izraz += f"- ({z.latex()})"
+        else:
+            izraz += (" - " if i > 0 else "- ") + _produkt_latex(-k, z)
+    return izraz
+
+
+def vsota_ulomkov_latex(ulomki):
+    """
+    Vrne LaTeX zapis neovrednotene vsote ulomkov kompleksnih števil, podanih s pari
+    števcev in imenovalcev, kot ga zapiše sympy.
+    """
+    ulomki = sorted(
+        ulomki,
+        key=lambda ulomek: vrstni_red_clena(
+            complex(ulomek[0]) * complex(1 / ulomek[1])
+        ),
+    )
+    return " + ".join(
+        rf"\frac{{{stevec.latex()}}}{{{imenovalec.latex()}}}"
+        for stevec, imenovalec in ulomki
+    )
+
+
+def zmnozek_latex(stevila):
+    """
+    Vrne LaTeX zapis neovrednotenega produkta kompleksnih števil, kot ga zapiše sympy.
+    """
+    # Sympy uredi faktorje produkta po realnem in nato po imaginarnem delu.
+    return " ".join(
+        rf"\left({z.latex()}\right)"
+        for z in sorted(stevila, key=lambda z: (z.real, z.imag))
+    )
+
+
+def vsota_produktov_latex(produkti):
+    """
+    Vrne LaTeX zapis poenostavljene vsote produktov parov kompleksnih števil, kot ga
+    zapiše sympy. Če sta dva faktorja racionalna večkratnika drug drugega, ju sympy
+    lahko združi, na primer v -(2 + i)^2, zato v tem redkem primeru vsoto
+    poenostavimo s sympy.
+    """
+    faktorji = [faktor for produkt in produkti for faktor in produkt]
+    if any(
+        z.real * w.imag == z.imag * w.real
+        for z, w in itertools.combinations(faktorji, 2)
+    ):
+        izraz = sympy.Add(*(sympy.Mul(*produkt) for produkt in produkti))
+        return sympy.latex(sympy.simplify(izraz))
+    return sum(z * w for z, w in produkti).latex()
+
+
 class VsotaKompleksnih(Problem):
     """Problem za seštevanje in odštevanje kompleksnih števil."""
 
@@ -37,39 +136,36 @@ class VsotaKompleksnih(Problem):
     class Meta:
         verbose_name = "Kompleksna števila / seštevanje in odštevanje ulomkov"
 
-    def generate(self):
+    def generate(self, rng):
         kolicina = 3
-        koeficienti_s = random.choices(
+        koeficienti_s = rng.choices(
             range(1, 5),
             weights=(3, 1, 1, 1),
             k=kolicina,  # Izbere naključne števce, prednost ima 1
         )
-        koeficienti_i = random.choices(
+        koeficienti_i = rng.choices(
             range(1, 5),
             weights=(7, 1, 1, 1),
             k=kolicina,  # Izbere naključne imenovalce, prednost ima 1
         )
-        koeficienti_p = random.choices(
+        koeficienti_p = rng.choices(
             (-1, 1),
             weights=(1, 2),
             k=kolicina,  # Izbere naključne predznake, prednost ima pozitiven
         )
         koeficienti = [
-            p * sympy.Rational(s, i)
+            p * Fraction(s, i)
             for p, s, i in zip(koeficienti_p, koeficienti_s, koeficienti_i)
         ]
 
-        stevila = generiraj_kompleksna_stevila(kolicina)
+        stevila = generiraj_kompleksna_stevila(rng, kolicina)
 
-        izraz = sympy.Add(
-            *[sympy.Mul(k, z, evaluate=False) for k, z in zip(koeficienti, stevila)],
-            evaluate=False,
-        )
-        resitev = sympy.simplify(izraz)
+        izraz = vsota_clenov_latex(koeficienti, stevila)
+        resitev = sum(k * z for k, z in zip(koeficienti, stevila))
 
         return {
-            "izraz": sympy.latex(izraz),
-            "resitev": sympy.latex(resitev),
+            "izraz": izraz,
+            "resitev": resitev.latex(),
         }
 
 
@@ -78,28 +174,23 @@ class KompleksniUlomek(Problem):
 
     default_instruction = "Izračunaj $z=@izraz$."
     default_solution = "$z=@resitev$"
+    generation_cost = 5
 
     class Meta:
         verbose_name = "Kompleksna števila / seštevanje in racionalizacija ulomkov"
 
-    def generate(self):
+    def generate(self, rng):
         kolicina = 4
-        stevila = generiraj_kompleksna_stevila(kolicina)
-
-        izraz = sympy.Add(
-            sympy.Mul(
-                stevila[0], sympy.Pow(stevila[1], -1, evaluate=False), evaluate=False
-            ),
-            sympy.Mul(
-                stevila[2], sympy.Pow(stevila[3], -1, evaluate=False), evaluate=False
-            ),
-            evaluate=False,
+        stevila = generiraj_kompleksna_stevila(rng, kolicina)
+
+        izraz = vsota_ulomkov_latex(
+            [(stevila[0], stevila[1]), (stevila[2], stevila[3])]
         )
-        resitev = sympy.simplify(izraz)
+        resitev = stevila[0] / stevila[1] + stevila[2] / stevila[3]
 
         return {
-            "izraz": sympy.latex(izraz),
-            "resitev": sympy.latex(resitev),
+            "izraz": izraz,
+            "resitev": resitev.latex(),
         }
 
 
@@ -112,16 +203,13 @@ class MnozenjeKompleksnih(Problem):
     class Meta:
         verbose_name = "Kompleksna števila / množenje"
 
-    def generate(self):
+    def generate(self, rng):
         kolicina = 2
-        stevila = generiraj_kompleksna_stevila(kolicina)
-
-        izraz = sympy.Mul(*stevila, evaluate=False)
-        resitev = sympy.simplify(izraz)
+        stevila = generiraj_kompleksna_stevila(rng, kolicina)
 
         return {
-            "izraz": sympy.latex(izraz),
-            "resitev": sympy.latex(resitev),
+            "izraz": zmnozek_latex(stevila),
+            "resitev": vsota_produktov_latex([stevila]),
         }
 
 
@@ -136,23 +224,23 @@ class RacunanjeKompleksno(Problem):
     class Meta:
         verbose_name = "Kompleksna števila / računanje s kompleksno enoto"
 
-    def generate(self):
-        z = sympy.symbols("z")
-        z0 = generiraj_kompleksna_stevila(1)
+    def generate(self, rng):
+        z0 = generiraj_kompleksna_stevila(rng, 1)
+        potenca = rng.randint(2, 3)
+        potenca_i = rng.randint(1991, 2018)
         izraz = (
-            sympy.Pow(z, random.randint(2, 3))
-            + sympy.Mul(
-                sympy.Pow(sympy.I, random.randint(1991, 2018), evaluate=False),
-                sympy.conjugate(z),
-                evaluate=False,
-            )
-            + abs(z) ** 2
+            rf"z^{{{potenca}}} + i^{{{potenca_i}}} \overline{{z}}"
+            r" + \left|{z}\right|^{2}"
+        )
+        resitev = (
+            z0**potenca
+            + GaussianRational(0, 1) ** potenca_i * z0.conjugate()
+            + z0.norm()
         )
-        resitev = sympy.simplify(izraz.subs(z, z0))
         return {
-            "stevilo": sympy.latex(z0),
-            "izraz": sympy.latex(izraz),
-            "resitev": sympy.latex(resitev),
+            "stevilo": z0.latex(),
+            "izraz": izraz,
+            "resitev": resitev.latex(),
         }
 
 
@@ -161,6 +249,7 @@ class KompleksnaEnacba(Problem):
 
     default_instruction = "Katero kompleksno število $z$ zadošča enačbi $@enacba$? Zapiši $\\operatorname{Re}(z)$ in $\\operatorname{Im}(z)$ ter izračunaj $\\left| z \\right|$."
     default_solution = "$z=@resitev$, $\\operatorname{Re}(z)=@realna$, $\\operatorname{Im}(z)=@imaginarna$, $\\left|z\\right|=@absolutna$"
+    generation_cost = 5
 
     konjugirana_vrednost = models.BooleanField(
         "konjugirana vrednost",
@@ -172,25 +261,25 @@ class KompleksnaEnacba(Problem):
     class Meta:
         verbose_name = "Kompleksna števila / reševanje enačb s kompleksnimi števili"
 
-    def generate(self):
-        z = sympy.symbols("z")
-        resitev, z1 = generiraj_kompleksna_stevila(2)
+    def generate(self, rng):
+        resitev, z1 = generiraj_kompleksna_stevila(rng, 2)
         if not self.konjugirana_vrednost:
-            enacba = z1 * z
+            enacba = rf"z \left({z1.latex()}\right)"
+            produkti = [(z1, resitev)]
         else:
-            z2 = generiraj_kompleksna_stevila(1)
-            enacba = z1 * z + z2 * sympy.conjugate(z)
-        z3 = sympy.simplify(enacba.subs(z, resitev))
-        im = sympy.im(resitev)
-        re = sympy.re(resitev)
-        absolutna = abs(resitev)
+            z2 = generiraj_kompleksna_stevila(rng, 1)
+            enacba = (
+                rf"z \left({z1.latex()}\right)"
+                rf" + \left({z2.latex()}\right) \overline{{z}}"
+            )
+            produkti = [(z1, resitev), (z2, resitev.conjugate())]
 
         return {
-            "enacba": sympy.latex(sympy.Eq(enacba, z3)),
-            "resitev": sympy.latex(resitev),
-            "imaginarna": sympy.latex(im),
-            "realna": sympy.latex(re),
-            "absolutna": sympy.latex(absolutna),
+            "enacba": f"{enacba} = {vsota_produktov_latex(produkti)}",
+            "resitev": resitev.latex(),
+            "imaginarna": str(resitev.imag),
+            "realna": str(resitev.real),
+            "absolutna": sqrt_latex(int(resitev.norm())),
         }
 
 
@@ -203,8 +292,8 @@ class NarisiKompleksna(Problem):
     class Meta:
         verbose_name = "??? / risanje v ravnino"
 
-    def generate(self):
+    def generate(self, rng):
         kolicina = 4
-        stevila = generiraj_kompleksna_stevila(kolicina)
-        koordinate = ["({0}, {1})".format(sympy.re(z), sympy.im(z)) for z in stevila]
-        return {"stevila": [sympy.latex(z) for z in stevila], "koordinate": koordinate}
+        stevila = generiraj_kompleksna_stevila(rng, kolicina)
+        koordinate = ["({0}, {1})".format(z.real, z.imag) for z in stevila]
+        return {"stevila": [z.latex() for z in stevila], "koordinate": koordinate}
@@ -1,5 +1,3 @@
-import random
-
 import sympy
 from django.db import models
 
@@ -7,46 +5,46 @@ from .linearna import seznam_polovick, seznam_tretinj, skozi_tocki
 from .meta import GeneratedDataIncorrect, Problem
 
 
-def nicelna_oblika(od=-5, do=5, risanje=False):
+def nicelna_oblika(rng, od=-5, do=5, risanje=False):
     """
     Vrne naključno kvadratno funkcijo v ničelni obliki.
     :param od: najmanjša možna vrednost za ničlo funkcije
     :param do: največja možna vrednost za ničlo funkcije
     :param risanje: če fukcijo potrebujejmo za risanje, izbere lepši vodilni koeficient
     :return: vodilni koeficient, ničli in kvadratno funkcijo v ničelni obliki
-    >>> nicelna_oblika(od=0, do=15)
+    >>> nicelna_oblika(rng, od=0, do=15)
     (-11/3, 7, 10/3, -11*(x - 7)*(x - 10/3)/3)
-    >>> nicelna_oblika(od=-2, risanje=True)
+    >>> nicelna_oblika(rng, od=-2, risanje=True)
     (2, -2, 3/2, 2*(x - 3/2)*(x + 2))
     """
     if risanje:
-        a = random.choice([-2, -1, sympy.Rational(-1, 2), sympy.Rational(1, 2), 1, 2])
+        a = rng.choice([-2, -1, sympy.Rational(-1, 2), sympy.Rational(1, 2), 1, 2])
     else:
-        a = random.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
-    x1 = random.choice(seznam_polovick(od, do) + seznam_tretinj(od, do))
-    x2 = random.choice(seznam_polovick(od, do) + seznam_tretinj(od, do))
+        a = rng.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
+    x1 = rng.choice(seznam_polovick(od, do) + seznam_tretinj(od, do))
+    x2 = rng.choice(seznam_polovick(od, do) + seznam_tretinj(od, do))
     x = sympy.symbols("x")
     nicelna = sympy.Mul(a, x - x1, x - x2, evaluate=False)
     return (a, x1, x2, nicelna)
 
 
-def splosna_oblika(risanje=False):
+def splosna_oblika(rng, risanje=False):
     """
     Vrne naključno kvadratno funkcijo v splošni obliki.
     :param risanje: če fukcijo potrebujejmo za risanje, izbere lepši vodilni koeficient
     :return: vrne seznam koeficientov in kvadratno funkcijo v splošni obliki
-    >>> splosna_oblika()
+    >>> splosna_oblika(rng)
     (8/3, 1/2, -1/3, 8*x**2/3 + x/2 - 1/3)
-    >>> splosna_oblika(risanje=True)
+    >>> splosna_oblika(rng, risanje=True)
     (-2, 5/2, 1/3, -2*x**2 + 5*x/2 + 1/3)
     """
     if risanje:
-        a = random.choice([-2, -1, sympy.Rational(-1, 2), sympy.Rational(1, 2), 1, 2])
+        a = rng.choice([-2, -1, sympy.Rational(-1, 2), sympy.Rational(1, 2), 1, 2])
     else:
-        a = random.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
+        a = rng.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
 
-    b = random.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
-    c = random.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
+    b = rng.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
+    c = rng.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
     x = sympy.symbols("x")
     splosna = a * x**2 + b * x + c
     return (a, b, c, splosna)
@@ -125,8 +123,8 @@ class KvadratnaIzracunajNicle(Problem):
     class Meta:
         verbose_name = "Kvadratna funkcija / Ničle kvadratne funkcije"
 
-    def generate(self):
-        (a, b, c, splosna) = splosna_oblika()
+    def generate(self, rng):
+        (a, b, c, splosna) = splosna_oblika(rng)
         if not self.kompleksni_nicli:
             if not (diskriminanta(a, b, c) >= 0 and abs(diskriminanta(a, b, c)) <= 200):
                 raise GeneratedDataIncorrect
@@ -199,8 +197,8 @@ class TemenskaOblika(Problem):
     class Meta:
         verbose_name = "Kvadratna funkcija / Temenska oblika kvadratne funkcije"
 
-    def generate(self):
-        (a, b, c, splosna) = splosna_oblika()
+    def generate(self, rng):
+        (a, b, c, splosna) = splosna_oblika(rng)
         D = diskriminanta(a, b, c)
         if not (D >= 0 and abs(D) <= 200):
             raise GeneratedDataIncorrect
@@ -217,19 +215,20 @@ class Presecisce(Problem):
         r"Izračunaj presečišče parabole $y=@parabola$ in premice $y=@premica$."
     )
     default_solution = r"$T_1(@x1,@y1)$, $T_2(@x2,@y2)$"
+    generation_cost = 10
 
     class Meta:
         verbose_name = "Kvadratna funkcija / Presečišče parabole in premice"
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
         b = sympy.symbols("b")
         c = sympy.symbols("c")
-        a = random.choice([-2, -1, sympy.Rational(-1, 2), sympy.Rational(1, 2), 1, 2])
-        x1 = random.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
-        x2 = random.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
-        y1 = random.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
-        y2 = random.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
+        a = rng.choice([-2, -1, sympy.Rational(-1, 2), sympy.Rational(1, 2), 1, 2])
+        x1 = rng.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
+        x2 = rng.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
+        y1 = rng.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
+        y2 = rng.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
         premica = skozi_tocki(x1, y1, x2, y2)[-1]
         koeficienta = sympy.solve(
             (a * x1**2 + b * x1 + c - y1, a * x2**2 + b * x2 + c - y2), b, c
@@ -260,6 +259,7 @@ class KvadratnaNeenacba(Problem):
 
     default_instruction = r"Reši kvadratno neenačbo $@neenakost$."
     default_solution = r"$x \in @resitev$"
+    generation_cost = 20
 
     primerjava_s_stevilom = models.BooleanField(
         "konstanta",
@@ -271,18 +271,16 @@ class KvadratnaNeenacba(Problem):
     class Meta:
         verbose_name = "Kvadratna funkcija / Reševanje kvadratnih neenačb"
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
-        splosna1 = splosna_oblika(risanje=True)[-1]
+        splosna1 = splosna_oblika(rng, risanje=True)[-1]
         if self.primerjava_s_stevilom:
-            primerjava = random.choice(
-                seznam_polovick(-10, 10) + seznam_tretinj(-10, 10)
-            )
+            primerjava = rng.choice(seznam_polovick(-10, 10) + seznam_tretinj(-10, 10))
         else:
-            primerjava = splosna_oblika()[-1]
+            primerjava = splosna_oblika(rng)[-1]
         if not (splosna1 != primerjava):
             raise GeneratedDataIncorrect
-        neenacaj = random.choice(["<", "<=", ">", ">="])
+        neenacaj = rng.choice(["<", "<=", ">", ">="])
         neenakost = sympy.Rel(splosna1, primerjava, neenacaj)
         nicli = sympy.solve(sympy.Eq(splosna1, primerjava), x)
         if len(nicli) == 0:
@@ -317,17 +315,17 @@ class SkoziTocke(Problem):
     class Meta:
         verbose_name = "Kvadratna funkcija / Predpis kvadratne funkcije iz točk"
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
-        (a, nicla1, nicla2, funkcija) = nicelna_oblika(risanje=True)
+        (a, nicla1, nicla2, funkcija) = nicelna_oblika(rng, risanje=True)
         if self.presecisca:
             x1 = nicla1
             x2 = 0
         else:
-            x1 = random.randint(-5, 5)
-            x2 = random.randint(-5, 5)
+            x1 = rng.randint(-5, 5)
+            x2 = rng.randint(-5, 5)
 
-        x3 = random.randint(-5, 5)
+        x3 = rng.randint(-5, 5)
         if not (len({x1, x2, x3}) == 3):
             raise GeneratedDataIncorrect
         y1 = funkcija.subs(x, x1)
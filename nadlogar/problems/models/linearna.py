@@ -1,8 +1,9 @@
-import random
+from fractions import Fraction
 
 import sympy
 from django.db import models
 
+from ..polynomials import Polynomial, equation_latex, number_latex
 from .meta import GeneratedDataIncorrect, Problem
 
 
@@ -34,39 +35,37 @@ def seznam_tretinj(od=-10, do=10):
     return [sympy.Rational(x, 3) for x in range(3 * od, 3 * (do + 1)) if x != 0]
 
 
-def eksplicitna_premica():
+def eksplicitna_premica(rng):
     """
     Vrne naključno eksplicitno obliko premice, ki jo moramo izenačiti z y.
     :return: smerni koeficient, začetno vrednost in eksplicitno podano premico
-    >>> eksplicitna_premica()
+    >>> eksplicitna_premica(rng)
     (-4/3, 2, 2 - 4*x/3)
-    >>> eksplicitna_premica()
+    >>> eksplicitna_premica(rng)
     (3, -11/3, 3*x - 11/3)
     """
     # Funkcija vrne naključno eksplicitno podano premico
-    k = random.choice(seznam_polovick(-3, 3) + seznam_tretinj(-3, 3))
-    n = random.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
+    k = rng.choice(seznam_polovick(-3, 3) + seznam_tretinj(-3, 3))
+    n = rng.choice(seznam_polovick(-4, 4) + seznam_tretinj(-4, 4))
     x = sympy.symbols("x")
     eksplicitna = k * x + n
     return (k, n, eksplicitna)
 
 
-def implicitna_premica():
+def implicitna_premica(rng):
     """
     Vrne implicitno podano obliko premice, ki jo moramo izenačiti z 0. Premice niso vzporedne z osema.
-    :return: koeficiente in implicitno podano premico
-    >>> implicitna_premica()
-    (-7, 2, 3, -7*x + 2*y + 3)
-    >>> implicitna_premica()
-    (-2, 7, -6, -2*x + 7*y - 6)
+    :return: koeficiente in implicitno podano premico kot polinom
+    >>> implicitna_premica(rng)[-1].latex()
+    '- 7 x + 2 y + 3'
+    >>> implicitna_premica(rng)[-1].latex()
+    '- 2 x + 7 y - 6'
     """
     seznamStevil = [x for x in range(-10, 10) if x != 0]
-    a = random.choice(seznamStevil)
-    b = random.choice(seznamStevil)
-    c = random.choice(seznamStevil)
-    x = sympy.symbols("x")
-    y = sympy.symbols("y")
-    implicitna = sympy.simplify(a * x + b * y + c)
+    a = rng.choice(seznamStevil)
+    b = rng.choice(seznamStevil)
+    c = rng.choice(seznamStevil)
+    implicitna = Polynomial.from_terms([(a, {"x": 1}), (b, {"y": 1}), (c, {})])
     return (a, b, c, implicitna)
 
 
@@ -89,18 +88,33 @@ def skozi_tocki(x1, y1, x2, y2):
     return (k, n, k * x + n)
 
 
-def izberi_koordinato(od=-10, do=10):
+def _v_ulomke(stevila):
+    """
+    Pretvori seznam racionalnih števil iz sympy v seznam ulomkov.
+    """
+    return [Fraction(int(stevilo.p), int(stevilo.q)) for stevilo in stevila]
+
+
+# Koordinate točk in lepi smerni koeficienti premic za PremicaSkoziTocki. Seznama
+# pripravimo vnaprej, da jih ne sestavljamo ob vsakem poskusu.
+KOORDINATE_TOCK = _v_ulomke(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
+LEPI_SMERNI_KOEFICIENTI = frozenset(
+    Fraction(x, y) for x in range(1, 6) for y in range(1, 2 * 10)
+)
+
+
+def izberi_koordinato(rng, od=-10, do=10):
     """
     Izbere poljubno celoštevilsko koordinato med vrednostima od in do.
     :param od: najmanjša vrednost
     :param do: največja vrednost
     :return: celoštevilsko koordinato
-    >>> izberi_koordinato()
+    >>> izberi_koordinato(rng)
     2
-    >>> izberi_koordinato(do=0)
+    >>> izberi_koordinato(rng, do=0)
     -4
     """
-    koordinata = random.randint(od, do)
+    koordinata = rng.randint(od, do)
     return koordinata
 
 
@@ -135,28 +149,25 @@ class PremicaSkoziTocki(Problem):
     class Meta:
         verbose_name = "Linearna funkcija / Enačba premice skozi dve točki"
 
-    def generate(self):
-        x1 = random.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
-        y1 = random.choice(seznam_polovick(-5, 5) + seznam_tretinj(-5, 5))
-        x2 = random.randint(-10, 10)
-        y2 = random.randint(-10, 10)
+    def generate(self, rng):
+        x1 = rng.choice(KOORDINATE_TOCK)
+        y1 = rng.choice(KOORDINATE_TOCK)
+        x2 = rng.randint(-10, 10)
+        y2 = rng.randint(-10, 10)
         if not (
             x1 != x2 and y1 != y2
         ):  # Preveri, da sta 2 različni točki in nista vzporedni osem
             raise GeneratedDataIncorrect
-        if not skozi_tocki(x1, y1, x2, y2)[0] in [
-            sympy.Rational(x, y)
-            for x in range(0, 6)
-            for y in range(0, 2 * 10)
-            if (x != 0 and y != 0)
-        ]:  # Lepše rešitve
+        k = (y2 - y1) / (x2 - x1)
+        if k not in LEPI_SMERNI_KOEFICIENTI:  # Lepše rešitve
             raise GeneratedDataIncorrect
-        premica = sympy.latex(skozi_tocki(x1, y1, x2, y2)[-1])
+        n = y1 - k * x1
+        premica = Polynomial.from_terms([(k, {"x": 1}), (n, {})]).latex()
         return {
-            "x1": sympy.latex(x1),
-            "y1": sympy.latex(y1),
-            "x2": sympy.latex(x2),
-            "y2": sympy.latex(y2),
+            "x1": number_latex(x1),
+            "y1": number_latex(y1),
+            "x2": number_latex(x2),
+            "y2": number_latex(y2),
             "premica": premica,
         }
 
@@ -174,11 +185,11 @@ class RazdaljaMedTockama(Problem):
     class Meta:
         verbose_name = "Linearna funkcija / Računanje razdalje med dvema točkama"
 
-    def generate(self):
-        x1 = izberi_koordinato()
-        y1 = izberi_koordinato()
-        x2 = izberi_koordinato()
-        y2 = izberi_koordinato()
+    def generate(self, rng):
+        x1 = izberi_koordinato(rng)
+        y1 = izberi_koordinato(rng)
+        x2 = izberi_koordinato(rng)
+        y2 = izberi_koordinato(rng)
         if not (x1 != x2 and y1 != y2):
             raise GeneratedDataIncorrect
         razdalja = sympy.latex(razdalja_med_tockama(x1, y1, x2, y2))
@@ -204,26 +215,27 @@ class OblikeEnacbPremice(Problem):
     class Meta:
         verbose_name = "Linearna funkcija / Odsekovna in eksplicitna oblika"
 
-    def generate(self):
-        x = sympy.symbols("x")
-        y = sympy.symbols("y")
-        (koeficient_x, koeficient_y, prosti, implicitnaOblika) = implicitna_premica()
-
-        implicitna = sympy.latex(sympy.Eq(implicitnaOblika, 0))
-        eksplicitna = sympy.latex(
-            sympy.Eq(
-                y,
-                sympy.Rational(-koeficient_x, koeficient_y) * x
-                + sympy.Rational(-prosti, koeficient_y),
-                evaluate=False,
-            )
+    def generate(self, rng):
+        (koeficient_x, koeficient_y, prosti, implicitnaOblika) = implicitna_premica(rng)
+
+        implicitna = equation_latex(implicitnaOblika, 0)
+        eksplicitna = equation_latex(
+            Polynomial.from_terms([(1, {"y": 1})]),
+            Polynomial.from_terms(
+                [
+                    (Fraction(-koeficient_x, koeficient_y), {"x": 1}),
+                    (Fraction(-prosti, koeficient_y), {}),
+                ]
+            ),
         )
-        odsekovna = sympy.latex(
-            sympy.Eq(
-                sympy.Rational(-koeficient_x, prosti) * x
-                + sympy.Rational(-koeficient_y, prosti) * y,
-                1,
-            )
+        odsekovna = equation_latex(
+            Polynomial.from_terms(
+                [
+                    (Fraction(-koeficient_x, prosti), {"x": 1}),
+                    (Fraction(-koeficient_y, prosti), {"y": 1}),
+                ]
+            ),
+            1,
         )
 
         return {
@@ -247,43 +259,42 @@ class PremiceTrikotnik(Problem):
     class Meta:
         verbose_name = "Linearna funkcija / Ploščina trikotnika"
 
-    def generate(self):
-        x1 = izberi_koordinato(1, 5)
+    def generate(self, rng):
+        x1 = izberi_koordinato(rng, 1, 5)
         y1 = 0
-        x2 = random.choice([x for x in range(-5, 6) if x != 0])
-        y2 = random.choice([x for x in range(-5, 6) if x != 0])
-        x3 = izberi_koordinato(-5, 0)
+        x2 = rng.choice([x for x in range(-5, 6) if x != 0])
+        y2 = rng.choice([x for x in range(-5, 6) if x != 0])
+        x3 = izberi_koordinato(rng, -5, 0)
         y3 = 0
-        x = sympy.symbols("x")
-        y = sympy.symbols("y")
+        x = Polynomial.from_terms([(1, {"x": 1})])
+        y = Polynomial.from_terms([(1, {"y": 1})])
         if not (x2 != x1 and x2 != x3):  # premici sta vzporedni
             raise GeneratedDataIncorrect
         if x2 == x1:
-            premica1 = sympy.Eq(x, x1)
+            premica1 = equation_latex(x, x1)
         else:
-            k1 = sympy.Rational((y2 - y1), (x2 - x1))
+            k1 = Fraction((y2 - y1), (x2 - x1))
             n1 = y1 - k1 * x1
-            premica1 = sympy.Eq(y, k1 * x + n1)
+            premica1 = equation_latex(
+                y, Polynomial.from_terms([(k1, {"x": 1}), (n1, {})])
+            )
         if x3 == x2:
-            premica2 = sympy.Eq(x, x3)
+            premica2 = equation_latex(x, x3)
         else:
-            k2 = sympy.Rational((y3 - y2), (x3 - x2))
+            k2 = Fraction((y3 - y2), (x3 - x2))
             n2 = y3 - k2 * x3
-            premica2 = sympy.Eq(y, k2 * x + n2)
-
-        ploscina_trikotnika = (
-            sympy.latex(
-                sympy.simplify(
-                    abs((x2 - x1) * (y3 - y1) - (x3 - x1) * (y2 - y1)) / 2
-                ).evalf(3)
+            premica2 = equation_latex(
+                y, Polynomial.from_terms([(k2, {"x": 1}), (n2, {})])
             )
-            .rstrip("0")
-            .rstrip(".")
+
+        # Ploščina je večkratnik 1/2, ki ga izpišemo brez odvečnih ničel.
+        ploscina_trikotnika = "{:g}".format(
+            abs((x2 - x1) * (y3 - y1) - (x3 - x1) * (y2 - y1)) / 2
         )
 
         return {
-            "premica1": sympy.latex(premica1),
-            "premica2": sympy.latex(premica2),
+            "premica1": premica1,
+            "premica2": premica2,
             "ploscina": ploscina_trikotnika,
         }
 
@@ -336,17 +347,18 @@ class VrednostiLinearne(Problem):
         r" negativne?"
     )
     default_solution = r"$f (@x1)=@y1$, $x=@x2$, $x \in @negativno$"
+    generation_cost = 5
 
     class Meta:
         verbose_name = "Linearna funkcija / Vrednosti linearne funkcije"
 
-    def generate(self):
+    def generate(self, rng):
         f = sympy.symbols("f(x)")
 
-        (k, n, funkcija) = eksplicitna_premica()
+        (k, n, funkcija) = eksplicitna_premica(rng)
 
-        x1 = random.choice(seznam_polovick(-3, 3) + seznam_tretinj(-3, 3))
-        x2 = random.choice(seznam_polovick(-3, 3) + seznam_tretinj(-3, 3))
+        x1 = rng.choice(seznam_polovick(-3, 3) + seznam_tretinj(-3, 3))
+        x2 = rng.choice(seznam_polovick(-3, 3) + seznam_tretinj(-3, 3))
         if not (x1 != x2):
             raise GeneratedDataIncorrect
         y1 = k * x1 + n
@@ -381,26 +393,26 @@ class Neenacba(Problem):
     class Meta:
         verbose_name = "Linearna funkcija / Linearne neenačbe"
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
         izbor = [x for x in range(-5, 5) if x != 0]
         if not self.kvadratna:
-            a = random.choice(izbor)
-            b = random.choice(izbor)
-            c = random.choice(izbor)
-            d = random.choice(izbor)
+            a = rng.choice(izbor)
+            b = rng.choice(izbor)
+            c = rng.choice(izbor)
+            d = rng.choice(izbor)
             leva = a * x + b
             desna = c * x + d
         else:
-            a = random.choice(izbor)
-            x1 = random.choice(izbor)
-            x2 = random.choice(izbor)
-            x3 = random.choice(izbor)
-            x4 = random.choice(izbor)
+            a = rng.choice(izbor)
+            x1 = rng.choice(izbor)
+            x2 = rng.choice(izbor)
+            x3 = rng.choice(izbor)
+            x4 = rng.choice(izbor)
             leva = sympy.simplify(sympy.Mul(a, (x - x1), (x - x2), evaluate=False))
             desna = a * (x - x3) * (x - x4)
 
-        neenacaj = random.choice(["<", "<=", ">", ">="])
+        neenacaj = rng.choice(["<", "<=", ">", ">="])
         neenacba = sympy.Rel(leva, desna, neenacaj)
         resitev = sympy.solveset(sympy.expand(neenacba), x, domain=sympy.S.Reals)
         return {"neenacba": sympy.latex(neenacba), "resitev": sympy.latex(resitev)}
@@ -424,34 +436,32 @@ class SistemDvehEnacb(Problem):
     class Meta:
         verbose_name = "Linearna funkcija / Sistem dveh linearnih enačb"
 
-    def generate(self):
-        x = sympy.symbols("x")
-        y = sympy.symbols("y")
+    def generate(self, rng):
         izborCela = [x for x in range(-5, 6) if x != 0]
         izborUlomki = (
-            [sympy.Rational(x, 2) for x in [-3, -1, 1, 3]]
-            + [sympy.Rational(x, 3) for x in [-2, -1, 1, 2]]
-            + [sympy.Rational(x, 4) for x in [-3, -1, 1, 3]]
+            [Fraction(x, 2) for x in [-3, -1, 1, 3]]
+            + [Fraction(x, 3) for x in [-2, -1, 1, 2]]
+            + [Fraction(x, 4) for x in [-3, -1, 1, 3]]
         )
         if not self.racionalno:
-            x1 = random.choice(izborCela + [0])
-            y1 = random.choice(izborCela + [0])
+            x1 = rng.choice(izborCela + [0])
+            y1 = rng.choice(izborCela + [0])
         else:
-            x1 = random.choice(izborCela + izborUlomki + [0])
-            y1 = random.choice(izborCela + izborUlomki + [0])
-        a = random.choice(izborCela)
-        b = random.choice(izborCela)
-        d = random.choice(izborCela)
-        e = random.choice(izborCela)
+            x1 = rng.choice(izborCela + izborUlomki + [0])
+            y1 = rng.choice(izborCela + izborUlomki + [0])
+        a = rng.choice(izborCela)
+        b = rng.choice(izborCela)
+        d = rng.choice(izborCela)
+        e = rng.choice(izborCela)
         if not ((a, b) != (d, e) and (x1 != 0 or y1 != 0)):
             raise GeneratedDataIncorrect
         c = a * x1 + b * y1
         f = d * x1 + e * y1
-        enacba1 = a * x + b * y
-        enacba2 = d * x + e * y
+        enacba1 = Polynomial.from_terms([(a, {"x": 1}), (b, {"y": 1})])
+        enacba2 = Polynomial.from_terms([(d, {"x": 1}), (e, {"y": 1})])
         return {
-            "enacba1": sympy.latex(sympy.Eq(enacba1, c)),
-            "enacba2": sympy.latex(sympy.Eq(enacba2, f)),
+            "enacba1": equation_latex(enacba1, c),
+            "enacba2": equation_latex(enacba2, f),
             "x": x1,
             "y": y1,
         }
@@ -473,30 +483,27 @@ class SistemTrehEnacb(Problem):
     class Meta:
         verbose_name = "Linearna funkcija / Sistem treh linearnih enačb"
 
-    def generate(self):
-        x = sympy.symbols("x")
-        y = sympy.symbols("y")
-        z = sympy.symbols("z")
+    def generate(self, rng):
         if self.manjsi_koeficienti:
             izborCela = [-2, -1, 0, 1, 2]
         else:
             izborCela = list(range(-5, 6))
 
         # vrednosti spremenljivk
-        x1 = random.choice(izborCela)
-        y1 = random.choice(izborCela)
-        z1 = random.choice(izborCela)
+        x1 = rng.choice(izborCela)
+        y1 = rng.choice(izborCela)
+        z1 = rng.choice(izborCela)
 
         # vrednosti koeficientov pred spremenljivkami
-        koef_x1 = random.choice(izborCela)
-        koef_y1 = random.choice(izborCela)
-        koef_z1 = random.choice(izborCela)
-        koef_x2 = random.choice(izborCela)
-        koef_y2 = random.choice(izborCela)
-        koef_z2 = random.choice(izborCela)
-        koef_x3 = random.choice(izborCela)
-        koef_y3 = random.choice(izborCela)
-        koef_z3 = random.choice(izborCela)
+        koef_x1 = rng.choice(izborCela)
+        koef_y1 = rng.choice(izborCela)
+        koef_z1 = rng.choice(izborCela)
+        koef_x2 = rng.choice(izborCela)
+        koef_y2 = rng.choice(izborCela)
+        koef_z2 = rng.choice(izborCela)
+        koef_x3 = rng.choice(izborCela)
+        koef_y3 = rng.choice(izborCela)
+        koef_z3 = rng.choice(izborCela)
 
         if not (
             len(
@@ -515,14 +522,20 @@ class SistemTrehEnacb(Problem):
         vrednost1 = koef_x1 * x1 + koef_y1 * y1 + koef_z1 * z1
         vrednost2 = koef_x2 * x1 + koef_y2 * y1 + koef_z2 * z1
         vrednost3 = koef_x3 * x1 + koef_y3 * y1 + koef_z3 * z1
-        enacba1 = koef_x1 * x + koef_y1 * y + koef_z1 * z
-        enacba2 = koef_x2 * x + koef_y2 * y + koef_z2 * z
-        enacba3 = koef_x3 * x + koef_y3 * y + koef_z3 * z
+        enacba1 = Polynomial.from_terms(
+            [(koef_x1, {"x": 1}), (koef_y1, {"y": 1}), (koef_z1, {"z": 1})]
+        )
+        enacba2 = Polynomial.from_terms(
+            [(koef_x2, {"x": 1}), (koef_y2, {"y": 1}), (koef_z2, {"z": 1})]
+        )
+        enacba3 = Polynomial.from_terms(
+            [(koef_x3, {"x": 1}), (koef_y3, {"y": 1}), (koef_z3, {"z": 1})]
+        )
 
         return {
-            "enacba1": sympy.latex(sympy.Eq(enacba1, vrednost1)),
-            "enacba2": sympy.latex(sympy.Eq(enacba2, vrednost2)),
-            "enacba3": sympy.latex(sympy.Eq(enacba3, vrednost3)),
+            "enacba1": equation_latex(enacba1, vrednost1),
+            "enacba2": equation_latex(enacba2, vrednost2),
+            "enacba3": equation_latex(enacba3, vrednost3),
             "x": x1,
             "y": y1,
             "z": z1,
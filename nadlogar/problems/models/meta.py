@@ -1,9 +1,24 @@
+import collections
+import functools
+import importlib.metadata
+import json
+import logging
+import os
 import random
 import string
+import time
 
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
 from django.db import models
+from utils.cache import FileCache
+
+from .. import telemetry
+from ..banks import build_bank, open_bank
+
+logger = logging.getLogger(__name__)
 
 # This file describes the Problem class that is a parent class for classes describing
 # particular problem kinds, which are implemented in other files.
@@ -30,6 +45,13 @@ from django.db import models
 # table, we can look up its content type, using that determine the appropriate child
 # model, and finally look up the exact parameters in the child table.
 #
+# Looking up the child tables costs a query for each problem kind in a document. For
+# this reason, each problem also keeps a copy of its kind particular parameters in a
+# JSON column of the parent table, which is updated whenever the problem is saved.
+# With the PROBLEM_PARAMETER_STORAGE setting set to "json", problems are converted to
+# their child classes using this copy, so all problems of a document are loaded with
+# a single query and child tables are only written to.
+#
 # Each child class is equipped with a generate method that produces problem data, which
 # is a dictionary of labels and corresponding values, for example
 #     {"polynomial": "x^2 - 1", "zeroes": [-1, 1]}
@@ -41,8 +63,13 @@ from django.db import models
 
 def problem_content_types():
     """Returns a mapping of all problem kinds and their corresponding content types."""
-    problem_subclasses = Problem.__subclasses__()
-    return ContentType.objects.get_for_models(*problem_subclasses)
+    # The registry imports this module, so we can only import it once it is loaded.
+    from ..registry import problem_kinds
+
+    return {
+        kind.generator: ContentType.objects.get_for_id(kind.content_type_id)
+        for kind in problem_kinds()
+    }
 
 
 def limit_content_type_choices():
@@ -51,8 +78,9 @@ def limit_content_type_choices():
     Passing this to the limit_choices_to argument of a ForeignKey, ensure that those
     foreign keys can refer only to content types that correspond to problem kinds.
     """
-    content_types = problem_content_types().values()
-    return {"id__in": {content_type.id for content_type in content_types}}
+    from ..registry import content_type_ids
+
+    return {"id__in": content_type_ids()}
 
 
 class Template(string.Template):
@@ -75,6 +103,115 @@ class GeneratedDataIncorrect(Exception):
     pass
 
 
+class ProblemQuerySet(models.QuerySet):
+    def downcast(self):
+        """Returns a list of problems converted to their particular child classes.
+
+        Instead of downcasting each problem separately, which costs a query for every
+        problem, we group the problems by their content type and fetch the entries of
+        each child table with a single query. The problems keep their original order.
+        If a problem is missing from its child table, we raise DoesNotExist of the
+        child class, as does downcasting a single problem.
+        """
+        problems = list(self)
+        if settings.PROBLEM_PARAMETER_STORAGE == "json":
+            return [problem.downcast() for problem in problems]
+        ids_by_content_type = collections.defaultdict(list)
+        for problem in problems:
+            ids_by_content_type[problem.content_type_id].append(problem.id)
+        child_problems = {}
+        for content_type_id, ids in ids_by_content_type.items():
+            # Content types are cached, so this does not query the database.
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model == self.model:
+                # The problems are already in the child table.
+                continue
+            children = model.objects.in_bulk(ids)
+            if len(children) < len(ids):
+                missing_ids = sorted(set(ids) - children.keys())
+                raise model.DoesNotExist(
+                    f"{model.__name__} matching problem ids {missing_ids} does not "
+                    "exist."
+                )
+            child_problems.update(children)
+        return [child_problems.get(problem.id, problem) for problem in problems]
+
+
+class GenerationTimeout(Exception):
+    """An exception that is raised when generating problem data takes too long.
+
+    Some sympy computations occasionally take seconds on unlucky inputs. Since such
+    computations cannot be safely interrupted, the time limit is checked between
+    attempts. The exception carries the problem whose data was being generated.
+    """
+
+    def __init__(self, problem):
+        super().__init__(problem)
+        self.problem = problem
+
+    def __str__(self):
+        return (
+            f"generating {type(self.problem).__name__} took more than "
+            f"{self.problem._generation_timeout()} s"
+        )
+
+
+@functools.cache
+def _package_version():
+    """Returns a hash of the code of the problems package and the version of sympy.
+
+    Tests, migrations and management commands do not affect the generated data, so
+    we leave them out.
+    """
+    package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parts = [importlib.metadata.version("sympy")]
+    for directory, subdirectories, file_names in os.walk(package_directory):
+        # Sorting the directories in place makes os.walk visit them in order.
+        subdirectories[:] = sorted(
+            subdirectory
+            for subdirectory in subdirectories
+            if subdirectory not in ("__pycache__", "management", "migrations")
+        )
+        for file_name in sorted(file_names):
+            if file_name.endswith(".py") and file_name != "tests.py":
+                path = os.path.join(directory, file_name)
+                with open(path, encoding="utf-8") as source:
+                    parts += [os.path.relpath(path, package_directory), source.read()]
+    return FileCache.key(*parts)
+
+
+class GeneratorExhausted(Exception):
+    """An exception that is raised when a generator cannot produce enough problem data.
+
+    This happens when a problem asks for more subproblems than the generator has
+    distinct outputs, or when the parameters are such that the generator (almost)
+    never succeeds. The exception carries the problem and the data generated so far.
+    """
+
+    def __init__(self, problem, data):
+        super().__init__(problem, data)
+        self.problem = problem
+        self.data = data
+
+    def __str__(self):
+        return (
+            f"{type(self.problem).__name__} generated only {len(self.data)} of "
+            f"{self.problem.number_of_subproblems} distinct subproblems"
+        )
+
+
+def _canonical_form(value):
+    """Returns a hashable value that is equal for equal data."""
+    if isinstance(value, dict):
+        return frozenset((key, _canonical_form(item)) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        return tuple(_canonical_form(item) for item in value)
+    elif isinstance(value, (set, frozenset)):
+        return frozenset(_canonical_form(item) for item in value)
+    else:
+        return value
+
+
 class Problem(models.Model):
     """A parent class for all problem kinds.
 
@@ -90,6 +227,17 @@ class Problem(models.Model):
     # that they are set.
     default_instruction = None
     default_solution = None
+    # A rough estimate of the time needed to generate a single subproblem, relative to
+    # a typical problem kind. It is only used to schedule the most expensive problems
+    # first when generating texts in parallel, so subclasses override it only if their
+    # generators are notably slow.
+    generation_cost = 1
+    # The number of consecutive unsuccessful attempts (either rejected or duplicate
+    # data) after which we conclude that the generator cannot produce a subproblem.
+    max_attempts = 1000
+    # The time in seconds after which generating the problem for a single student is
+    # aborted. If None, the PROBLEM_GENERATION_TIMEOUT setting is used.
+    generation_timeout = None
     document = models.ForeignKey("documents.Document", on_delete=models.CASCADE)
     # A content type of the problem kind this problem. When saving the model, we have to
     # make sure that the content type corresponds to the particular subclass.
@@ -105,6 +253,13 @@ class Problem(models.Model):
     )
     instruction = models.TextField("navodilo", blank=True)
     solution = models.TextField("rešitev", blank=True)
+    # The expected time in seconds needed to generate the problem for one student,
+    # which we estimate when the parameters are validated.
+    estimated_cost = models.FloatField(null=True, default=None, editable=False)
+    # A copy of the parameters of the problem kind, see the comment at the top.
+    parameters = models.JSONField(default=dict, editable=False)
+
+    objects = ProblemQuerySet.as_manager()
 
     class Meta:
         default_related_name = "problems"
@@ -118,12 +273,89 @@ class Problem(models.Model):
             raise ValidationError("Problems must have a non-trivial generator")
         # The content type is set automatically from the class.
         self.content_type = ContentType.objects.get_for_model(type(self))
+        # We ensure that the generator succeeds with the given parameters in a
+        # reasonable time, so that generating documents does not get stuck.
+        attempts, successes, time_per_attempt = self.probe_generator()
+        if not successes and attempts >= self.max_attempts:
+            # Generating the problem would give up after as many attempts.
+            raise ValidationError(
+                f"Pri izbranih parametrih v {attempts} poskusih ni bilo mogoče "
+                "sestaviti nobene naloge."
+            )
+        # Without successful attempts, this is a lower bound of the cost.
+        self.estimated_cost = (
+            self.number_of_subproblems * time_per_attempt * attempts / max(successes, 1)
+        )
+        if self.estimated_cost > settings.PROBLEM_COST_BUDGET:
+            raise ValidationError(
+                "Pri izbranih parametrih bi sestavljanje nalog za enega učenca trajalo "
+                f"približno {self.estimated_cost:.1f} s. Izberite manj podnalog ali "
+                "parametre, pri katerih je ustreznih nalog več."
+            )
+
+    def probe_generator(self):
+        """Makes a few attempts of generating data to estimate the cost of generation.
+
+        We make attempts until PROBLEM_PROBE_SUCCESSES of them succeed, until they
+        have taken PROBLEM_PROBE_TIME seconds, or until we make max_attempts attempts.
+        We return the number of attempts, the number of successful attempts and the
+        average time of an attempt. The first attempt also fills caches and is usually
+        much slower, so we do not include it in the average time unless it is the only
+        one.
+        """
+        # The seeds are not predictable, as the operations of generators with fixed
+        # seeds are memoized after the first probe and the cost would be
+        # underestimated.
+        rng = random.Random()
+        attempts = successes = 0
+        duration = first_duration = 0.0
+        # We always make one attempt, so that we catch parameters that break the
+        # generator.
+        while attempts < self.max_attempts and (
+            not attempts
+            or (
+                successes < settings.PROBLEM_PROBE_SUCCESSES
+                and duration < settings.PROBLEM_PROBE_TIME
+            )
+        ):
+            start = time.perf_counter()
+            try:
+                self.generate(rng)
+                successes += 1
+            except GeneratedDataIncorrect:
+                pass
+            except Exception:
+                # Invalid parameters may break the generator in other ways, for
+                # example an empty range in rng.randint.
+                raise ValidationError(
+                    "Pri izbranih parametrih naloge ni mogoče sestaviti."
+                )
+            finally:
+                duration += time.perf_counter() - start
+                if not attempts:
+                    first_duration = duration
+            attempts += 1
+        if attempts == 1:
+            return attempts, successes, duration
+        return attempts, successes, (duration - first_duration) / (attempts - 1)
+
+    def expected_generation_cost(self):
+        """Returns the expected time in seconds to generate the problem for a student.
+
+        If we have not estimated it yet, we derive it from the generation cost of the
+        problem kind, where the unit corresponds to roughly five milliseconds.
+        """
+        if self.estimated_cost is not None:
+            return self.estimated_cost
+        return 0.005 * self.generation_cost * self.number_of_subproblems
 
     def save(self, *args, **kwargs):
         # The content type is set automatically from the class.
         # We do this in save in addition to clean, because clean is not called when
         # creating a new object.
         self.content_type = ContentType.objects.get_for_model(type(self))
+        if type(self) is not Problem:
+            self.parameters = self._parameters()
         super().save(*args, **kwargs)
 
     def downcast(self):
@@ -131,21 +363,113 @@ class Problem(models.Model):
 
         This works even if we start with a problem from the parent table.
         """
-        content_type = self.content_type
+        # Content types are cached, so this does not query the database.
+        content_type = ContentType.objects.get_for_id(self.content_type_id)
         # We check if the problem is already in the child table
         if content_type.model_class() == type(self):
             # If it is, we just return it
             return self
+        elif settings.PROBLEM_PARAMETER_STORAGE == "json":
+            return self._downcast_from_parameters(content_type.model_class())
         else:
             # Otherwise, we look up the object in the child table
             return content_type.get_object_for_this_type(problem_ptr_id=self.id)
 
-    def generate(self):
-        """Does a single attempt of generating problem data."""
+    def _downcast_from_parameters(self, model):
+        """Creates an instance of the given child class from the stored parameters.
+
+        Parameters are validated by the fields of the child class, so invalid stored
+        values raise ValidationError. Parameters that were added to the problem kind
+        after the problem was saved take their default values.
+        """
+        values = {
+            field.attname: field.value_from_object(self)
+            for field in Problem._meta.concrete_fields
+        }
+        for field in model._meta.local_concrete_fields:
+            if field.remote_field:
+                # This is the link to the parent table.
+                values[field.attname] = self.id
+            elif field.attname in self.parameters:
+                values[field.attname] = field.clean(
+                    self.parameters[field.attname], None
+                )
+            else:
+                values[field.attname] = field.get_default()
+        field_names = [field.attname for field in model._meta.concrete_fields]
+        return model.from_db(
+            self._state.db, field_names, [values[name] for name in field_names]
+        )
+
+    def generate(self, rng):
+        """Does a single attempt of generating problem data.
+
+        All randomness must be drawn from rng, an instance of random.Random, so that
+        the data depends only on the seed and generators do not share global state.
+        """
         # All child classes must override this method as the parent class does not
         # generate anything.
         raise NotImplementedError
 
+    def sample_space(self):
+        """Returns a list of all possible outcomes of random choices of the generator.
+
+        Some generators make only a few random choices, which can be enumerated for
+        given parameters. Such generators can implement sample_space together with
+        draw, which makes the random choices and returns their outcome, and
+        generate_sample, which computes the data for a given outcome, so that
+        generate(rng) is generate_sample(draw(rng)). The data for all outcomes is then
+        computed only once and stored in a sample bank, and generating a subproblem
+        only takes a single lookup.
+        """
+        raise NotImplementedError
+
+    def draw(self, rng):
+        """Makes the random choices of the generator and returns their outcome."""
+        raise NotImplementedError
+
+    def generate_sample(self, outcome):
+        """Computes the problem data for a given outcome of draw."""
+        raise NotImplementedError
+
+    def _bank_sample(self, outcome):
+        try:
+            return self.generate_sample(outcome)
+        except GeneratedDataIncorrect:
+            # Unsuitable outcomes are stored as None and rejected when drawn.
+            return None
+
+    def _sample_bank_path(self):
+        """Returns the path of the bank of samples for current parameters or None."""
+        if settings.PROBLEM_BANK_DIR is None:
+            return None
+        if type(self).sample_space is Problem.sample_space:
+            # The generator does not have an enumerable sample space.
+            return None
+        key = FileCache.key(
+            self._meta.label, self._generator_version(), self._parameters_json()
+        )
+        return os.path.join(settings.PROBLEM_BANK_DIR, key + ".bank")
+
+    def _sample_bank(self):
+        """Returns the bank of samples for current parameters or None.
+
+        Building a bank takes a while, so banks are only built by the
+        build_sample_banks command, and data is generated from scratch until then.
+        """
+        path = self._sample_bank_path()
+        if path is None:
+            return None
+        return open_bank(path, self.sample_space)
+
+    def _build_sample_bank(self):
+        """Builds the bank of samples for current parameters and returns it or None."""
+        path = self._sample_bank_path()
+        if path is None:
+            return None
+        build_bank(path, self.sample_space, self._bank_sample)
+        return open_bank(path, self.sample_space)
+
     def validate(self, condition):
         """Raises GeneratedDataIncorrect if the condition is not met.
 
@@ -156,29 +480,85 @@ class Problem(models.Model):
         if not condition:
             raise GeneratedDataIncorrect
 
+    def _generation_timeout(self):
+        if self.generation_timeout is not None:
+            return self.generation_timeout
+        return settings.PROBLEM_GENERATION_TIMEOUT
+
     def _generate_data(self, seed):
         """Generates a list of problem data for all subproblems.
 
-        The data is generated using a given seed, which is used to initialize the
-        random number generator. The data is generated in a loop, and if the generated
-        data is not suitable, the loop is restarted with a different seed.
+        The data is generated using a given seed, which is used to initialize a
+        random number generator private to this call. The data is generated in a loop,
+        and if the generated data is not suitable, the loop is restarted with a
+        different seed. If no suitable data is found in max_attempts attempts, we raise
+        GeneratorExhausted, and if generating takes longer than the time limit, we raise
+        GenerationTimeout.
         """
+        timeout = self._generation_timeout()
+        deadline = None if timeout is None else time.perf_counter() + timeout
         data = []
+        # To detect duplicates in constant time, we keep the hashable canonical forms
+        # of the data generated so far.
+        seen = set()
+        bank = self._sample_bank()
         for i in range(self.number_of_subproblems):
             # Ensure that the generated data is predictable, but still different
             # if multiple subproblems are generated.
-            random.seed(f"{i}-{seed}")
-            while True:
+            rng = random.Random(f"{i}-{seed}")
+            attempt_time = slowest_attempt_time = 0.0
+            slowest_attempt = 0
+            sample_start = time.perf_counter()
+            for attempt in range(self.max_attempts):
                 # Repeat until suitable data is found
+                attempt_start = time.perf_counter()
+                if deadline is not None and attempt_start > deadline:
+                    telemetry.record_timeout(type(self).__name__)
+                    raise GenerationTimeout(self)
                 try:
-                    # Generate the data and break the loop if it is suitable
-                    # and not already generated.
-                    new_data = self.generate()
-                    if new_data not in data:
-                        data.append(new_data)
-                        break
+                    if bank is None:
+                        new_data = self.generate(rng)
+                    else:
+                        # Since draw makes the same random choices as generate, the
+                        # sample is the same as the generated data would be.
+                        new_data = bank.lookup(self.draw(rng))
+                        self.validate(new_data is not None)
                 except GeneratedDataIncorrect:
-                    pass
+                    continue
+                finally:
+                    duration = time.perf_counter() - attempt_start
+                    attempt_time += duration
+                    if duration > slowest_attempt_time:
+                        slowest_attempt, slowest_attempt_time = attempt, duration
+                # The data is suitable, so we keep it unless it is already generated.
+                canonical_form = _canonical_form(new_data)
+                if canonical_form not in seen:
+                    seen.add(canonical_form)
+                    data.append(new_data)
+                    break
+            else:
+                raise GeneratorExhausted(self, data)
+            telemetry.record_sample(
+                type(self).__name__,
+                attempt + 1,
+                attempt_time,
+                time.perf_counter() - sample_start,
+            )
+            slow_attempt_time = settings.PROBLEM_SLOW_ATTEMPT_TIME
+            if (
+                slow_attempt_time is not None
+                and slowest_attempt_time > slow_attempt_time
+            ):
+                # We log everything needed to reproduce the slow attempt.
+                logger.warning(
+                    "Generating %s with seed %s and parameters %s took %.3f s "
+                    "in attempt %d.",
+                    type(self).__name__,
+                    f"{i}-{seed}",
+                    self._parameters_json(),
+                    slowest_attempt_time,
+                    slowest_attempt + 1,
+                )
         return data
 
     def uses_custom_text(self):
@@ -209,20 +589,92 @@ class Problem(models.Model):
         return rendered_texts
 
     def example_data(self):
-        """Generates example data for the problem."""
-        return self._generate_data(None)
+        """Generates example data for the problem.
+
+        If the generator cannot produce all subproblems, we return the ones it did,
+        as examples are only illustrative.
+        """
+        try:
+            return self._generate_data(None)
+        except GeneratorExhausted as error:
+            return error.data
 
     def example_text(self):
         """Renders the problem text using the example data."""
         data = self.example_data()
         return self.render(data)
 
+    @classmethod
+    def _generator_version(cls):
+        """Returns a hash of the code that the generator of this problem kind uses.
+
+        Generators import helpers from all over the problems package, so we include
+        the code of the whole package instead of tracking the imports of each kind.
+        """
+        return _package_version()
+
+    def _parameters(self):
+        """Returns a dictionary of the parameters of the problem kind."""
+        return {
+            field.attname: field.value_from_object(self)
+            for field in self._meta.local_concrete_fields
+            if not field.remote_field
+        }
+
+    def _parameters_json(self):
+        """Returns the parameters of the problem kind, encoded as canonical JSON."""
+        return json.dumps(self._parameters(), sort_keys=True, default=str)
+
+    def _data_cache_key(self):
+        """Returns a key that determines the data generated for the students.
+
+        Besides the students, the data depends only on the parameters of the problem
+        and the code of the generator, so editing either of them results in a new key.
+        """
+        return "problems:data:" + FileCache.key(
+            self._meta.label,
+            str(self.id),
+            self._generator_version(),
+            self._parameters_json(),
+            str(self.number_of_subproblems),
+        )
+
+    def _student_seed(self, student):
+        return f"{self.id}-{student.id}"
+
+    def _cached_data(self):
+        """Returns the previously generated data, keyed by the seeds of students.
+
+        The data for all students is cached in a single entry, so that generating a
+        document reads and writes one entry for each problem.
+        """
+        if settings.PROBLEM_CACHE is None:
+            return {}
+        return caches[settings.PROBLEM_CACHE].get(self._data_cache_key(), {})
+
+    def _cache_data(self, data):
+        """Stores the generated data, keyed by the seeds of students."""
+        if settings.PROBLEM_CACHE is not None:
+            caches[settings.PROBLEM_CACHE].set(self._data_cache_key(), data)
+
+    def _student_data(self, student):
+        """Generates the data for a given student, ready to be cached.
+
+        Cached data is only used for rendering, so we store each value exactly as it
+        is substituted into the text. This way ints, sets, sympy expressions, ... are
+        all serialized in the same way, and sets even keep their order of elements.
+        """
+        data = self._generate_data(self._student_seed(student))
+        return [{name: str(value) for name, value in datum.items()} for datum in data]
+
     def student_text(self, student):
         """Renders the problem text for a given student."""
-        seed = f"{self.id}-{student.id}"
-        data = self._generate_data(seed)
-        rendered_text = self.render(data)
-        return rendered_text
+        seed = self._student_seed(student)
+        cached_data = self._cached_data()
+        if seed not in cached_data:
+            cached_data[seed] = self._student_data(student)
+            self._cache_data(cached_data)
+        return self.render(cached_data[seed])
 
     def copy(self, document):
         """Creates a copy of a problem in a given document."""
@@ -1,5 +1,3 @@
-import random
-
 import sympy
 from django.db import models
 
@@ -25,23 +23,43 @@ class ElementiMnozice(Problem):
     class Meta:
         verbose_name = "Množice / elementi iz predpisa"
 
-    def generate(self):
-        pogoj = random.choice(self.POGOJ)
-        n = sympy.symbols("n")
+    def sample_space(self):
+        if not self.linearna_kombinacija:
+            koeficienti = [(1, 0)]
+        else:
+            koeficienti = [(a, b) for a in range(1, 4) for b in range(-2, 3)]
+        stevila = {"|": range(15, 46), "<": range(5, 13), "<=": range(5, 9)}
+        return [
+            (pogoj, a, b, stevilo)
+            for pogoj in self.POGOJ
+            for a, b in koeficienti
+            for stevilo in stevila[pogoj]
+        ]
+
+    def draw(self, rng):
+        pogoj = rng.choice(self.POGOJ)
         if not self.linearna_kombinacija:
             a = 1
             b = 0
         else:
-            a = random.randint(1, 3)
-            b = random.randint(-2, 2)
+            a = rng.randint(1, 3)
+            b = rng.randint(-2, 2)
+        if pogoj == "|":
+            stevilo = rng.randint(15, 45)
+        elif pogoj == "<":
+            stevilo = rng.randint(5, 12)
+        elif pogoj == "<=":
+            stevilo = rng.randint(5, 8)
+        return (pogoj, a, b, stevilo)
+
+    def generate_sample(self, outcome):
+        pogoj, a, b, stevilo = outcome
+        n = sympy.symbols("n")
         if pogoj == "|":
-            stevilo = random.randint(15, 45)
             ustrezni = sympy.divisors(stevilo)
         elif pogoj == "<":
-            stevilo = random.randint(5, 12)
             ustrezni = list(range(1, stevilo))
         elif pogoj == "<=":
-            stevilo = random.randint(5, 8)
             ustrezni = list(range(1, stevilo + 1))
         mnozica = sympy.FiniteSet(*[a * x + b for x in ustrezni if a * x + b > 0])
         return {
@@ -51,6 +69,9 @@ class ElementiMnozice(Problem):
             "mnozica": sympy.latex(mnozica),
         }
 
+    def generate(self, rng):
+        return self.generate_sample(self.draw(rng))
+
 
 class PotencnaMnozica(Problem):
     """Problem za izpis potenčne množice od dane množice."""
@@ -61,21 +82,42 @@ class PotencnaMnozica(Problem):
     class Meta:
         verbose_name = "Množice / potenčna množica"
 
-    def generate(self):
-        velikost = random.randint(2, 3)
-        mnozice = [
-            [sympy.Symbol("a"), sympy.Symbol("b"), sympy.Symbol("c")],
-            [1, 2, 3],
-            [sympy.Symbol("x"), sympy.Symbol("y"), sympy.Symbol("z")],
-            [sympy.Symbol("alpha"), sympy.Symbol("beta"), sympy.Symbol("gamma")],
-            [sympy.Symbol("Pi"), sympy.Symbol("Phi"), sympy.Symbol("Xi")],
-            [3, 6, 9],
-            [3, 7, 42],
+    MNOZICE = [
+        ["a", "b", "c"],
+        [1, 2, 3],
+        ["x", "y", "z"],
+        ["alpha", "beta", "gamma"],
+        ["Pi", "Phi", "Xi"],
+        [3, 6, 9],
+        [3, 7, 42],
+    ]
+
+    def sample_space(self):
+        return [
+            (velikost, indeks)
+            for velikost in range(2, 4)
+            for indeks in range(len(self.MNOZICE))
         ]
-        mnozica = sympy.FiniteSet(*random.choice(mnozice)[:velikost])
+
+    def draw(self, rng):
+        velikost = rng.randint(2, 3)
+        # Choosing an index makes the same random choice as choosing an element.
+        indeks = rng.randrange(len(self.MNOZICE))
+        return (velikost, indeks)
+
+    def generate_sample(self, outcome):
+        velikost, indeks = outcome
+        elementi = [
+            sympy.Symbol(element) if isinstance(element, str) else element
+            for element in self.MNOZICE[indeks]
+        ]
+        mnozica = sympy.FiniteSet(*elementi[:velikost])
         potencna = mnozica.powerset()
         return {"mnozica": sympy.latex(mnozica), "potencna": sympy.latex(potencna)}
 
+    def generate(self, rng):
+        return self.generate_sample(self.draw(rng))
+
 
 class OperacijeMnozic(Problem):
     """Naloga za zapis unije, preseka, razlike, in kartezičnega produkta množic."""
@@ -87,15 +129,15 @@ class OperacijeMnozic(Problem):
         verbose_name = "Množice / operacije z množicami"
 
     @staticmethod
-    def generiraj_mnozico(velikost, od, do):
+    def generiraj_mnozico(rng, velikost, od, do):
         """Pripravi naključno množico dane velikosti."""
         izbor = [x for x in range(od, do + 1)]
-        mnozica = sympy.FiniteSet(*random.sample(izbor, velikost))
+        mnozica = sympy.FiniteSet(*rng.sample(izbor, velikost))
         return mnozica
 
-    def generate(self):
-        A = self.generiraj_mnozico(random.randint(3, 4), 1, 6)
-        B = self.generiraj_mnozico(random.randint(3, 4), 1, 6)
+    def generate(self, rng):
+        A = self.generiraj_mnozico(rng, rng.randint(3, 4), 1, 6)
+        B = self.generiraj_mnozico(rng, rng.randint(3, 4), 1, 6)
         unija = A.union(B)
         presek = A.intersection(B)
         brez = sympy.Complement(A, B)
@@ -119,15 +161,15 @@ class IzpeljaneMnozice(Problem):
     class Meta:
         verbose_name = "Množice / operacije na izpeljanih množicah"
 
-    def generate(self):
+    def generate(self, rng):
         k = sympy.symbols("k")
-        a = random.randint(2, 5)
-        b = random.randint(-4, 4)
-        c = random.randint(2, 5)
-        d = random.randint(-4, 4)
+        a = rng.randint(2, 5)
+        b = rng.randint(-4, 4)
+        c = rng.randint(2, 5)
+        d = rng.randint(-4, 4)
         if abs(b) == a or abs(d) == c:
             raise GeneratedDataIncorrect
-        velikost_univerzalne = random.randint(12, 20)
+        velikost_univerzalne = rng.randint(12, 20)
         univerzalna = sympy.FiniteSet(*range(1, velikost_univerzalne + 1))
         navodilo_A = a * k + b
         navodilo_B = c * k + d
@@ -143,7 +185,7 @@ class IzpeljaneMnozice(Problem):
         ]
         A = sympy.FiniteSet(*mnozica_A)
         B = sympy.FiniteSet(*mnozica_B)
-        C = sympy.FiniteSet(*random.sample(sorted(univerzalna), 8))
+        C = sympy.FiniteSet(*rng.sample(sorted(univerzalna), 8))
         A_unija_B = A.union(B)
         C_komplement = sympy.Complement(univerzalna, C)
         B_brez_A = sympy.Complement(B, A)
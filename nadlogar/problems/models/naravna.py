@@ -1,11 +1,34 @@
-import random
+import functools
+import math
 
-import sympy
 from django.db import models
 
 from .meta import GeneratedDataIncorrect, Problem
 
 
+@functools.lru_cache(maxsize=32)
+def gladka_stevila(od, do, meja):
+    """
+    Funkcija z rešetom sestavi seznam vseh števil med od in do, katerih prafaktorji
+    so vsi manjši ali enaki meji.
+    :param od: najmanjša vrednost
+    :param do: največja vrednost
+    :param meja: zgornja meja za prafaktorje
+    :return: naraščajoča terica števil
+    >>> gladka_stevila(20, 40, 3)
+    (24, 27, 32, 36)
+    """
+    # Iz vsakega števila izločimo vse prafaktorje do meje, pri gladkih ostanejo enice.
+    # Število p je praštevilo natanko tedaj, ko ga nismo delili z nobenim manjšim.
+    ostanki = list(range(do + 1))
+    for p in range(2, min(meja, do) + 1):
+        if ostanki[p] == p:
+            for veckratnik in range(p, do + 1, p):
+                while ostanki[veckratnik] % p == 0:
+                    ostanki[veckratnik] //= p
+    return tuple(n for n in range(max(od, 1), do + 1) if ostanki[n] == 1)
+
+
 class DeliteljVeckratnik(Problem):
     """Problem za izračun največjega skupnega delitelja in najmanjšega skupnega večkratnika danega števila."""
 
@@ -33,17 +56,21 @@ class DeliteljVeckratnik(Problem):
     class Meta:
         verbose_name = "Naravna števila / iskanje največjega skupnega delitelja in najmanjšega skupnega večkratnika"
 
-    def generate(self):
-        stevilo1 = random.randint(self.minimalna_vrednost, self.maksimalna_vrednost)
-        stevilo2 = random.randint(self.minimalna_vrednost, self.maksimalna_vrednost)
-        if not (
-            max(*sympy.factorint(stevilo1).keys(), *sympy.factorint(stevilo2).keys())
-            <= self.maksimalni_prafaktor
-            and stevilo1 != stevilo2
-        ):
+    def generate(self, rng):
+        # Števila izbiramo neposredno med tistimi z dovolj majhnimi prafaktorji.
+        kandidati = gladka_stevila(
+            self.minimalna_vrednost,
+            self.maksimalna_vrednost,
+            self.maksimalni_prafaktor,
+        )
+        if not kandidati:
+            raise GeneratedDataIncorrect
+        stevilo1 = rng.choice(kandidati)
+        stevilo2 = rng.choice(kandidati)
+        if stevilo1 == stevilo2:
             raise GeneratedDataIncorrect
-        najvecji_delitelj = sympy.gcd(stevilo1, stevilo2)
-        najmanjsi_veckratnik = sympy.lcm(stevilo1, stevilo2)
+        najvecji_delitelj = math.gcd(stevilo1, stevilo2)
+        najmanjsi_veckratnik = math.lcm(stevilo1, stevilo2)
 
         return {
             "stevilo1": stevilo1,
@@ -62,15 +89,15 @@ class EvklidovAlgoritem(Problem):
     class Meta:
         verbose_name = "Naravna števila / Evklidov algoritem"
 
-    def generate(self):
-        stevilo_malo = random.randint(50, 199)
-        stevilo_veliko = random.randint(200, 1000)
+    def generate(self, rng):
+        stevilo_malo = rng.randint(50, 199)
+        stevilo_veliko = rng.randint(200, 1000)
         if not (
             stevilo_veliko % stevilo_malo != 0
             and stevilo_malo % (stevilo_veliko % stevilo_malo) != 0
         ):  # Da se ne konča že v prvih dveh korakih
             raise GeneratedDataIncorrect
-        najvecji_delitelj = sympy.gcd(stevilo_malo, stevilo_veliko)
+        najvecji_delitelj = math.gcd(stevilo_malo, stevilo_veliko)
         return {
             "stevilo1": stevilo_malo,
             "stevilo2": stevilo_veliko,
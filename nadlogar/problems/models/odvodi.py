@@ -1,10 +1,19 @@
 import enum
-import random
+import itertools
+import logging
+import math
+from fractions import Fraction
 
 import sympy
+from django.conf import settings
 
+from .. import memo
 from .meta import GeneratedDataIncorrect, Problem
 
+logger = logging.getLogger(__name__)
+
+_klici_hitrih_poti = itertools.count(1)
+
 # Premisli, ali je ta razred smiselen, ker se tak tip podatkov načeloma shranjuje v slovarjih
 
 
@@ -32,24 +41,67 @@ def kot_med_premicama(k1, k2):
     return kot
 
 
-def generiraj_polinom(min_stopnja=2, max_stopnja=3):
+def _v_stopinjah_in_minutah(kot):
+    """
+    Vrne cele stopinje in zaokrožene minute kota, podanega v stopinjah.
+    """
+    return int(kot // 1), int(round(kot % 1 * 60))
+
+
+def kot_med_premicama_v_stopinjah(k1, k2):
+    """
+    Izračuna kot med premicama iz smernih koeficientov in ga vrne v celih stopinjah
+    in zaokroženih minutah.
+    >>> kot_med_premicama_v_stopinjah(1, 6)
+    (35, 32)
+    """
+    if not all(isinstance(k, (int, sympy.Rational)) for k in (k1, k2)):
+        return _v_stopinjah_in_minutah(sympy.N(sympy.deg(kot_med_premicama(k1, k2))))
+    # Racionalne koeficiente najprej točno odštejemo in zmnožimo, kot pa izračunamo
+    # v plavajoči vejici. Funkcija atan2 vrne pravi kot tudi, ko je 1 + k1 * k2 = 0.
+    k1, k2 = (
+        Fraction(int(k.p), int(k.q)) if isinstance(k, sympy.Rational) else k
+        for k in (k1, k2)
+    )
+    kot = math.degrees(math.atan2(abs(k2 - k1), abs(1 + k1 * k2)))
+    rezultat = _v_stopinjah_in_minutah(kot)
+    # Simbolični izračun je počasen, zato z njim preverimo le vsak n-ti rezultat.
+    interval = settings.PROBLEM_FAST_PATH_CHECK_INTERVAL
+    if interval and next(_klici_hitrih_poti) % interval == 0:
+        simbolicni_rezultat = _v_stopinjah_in_minutah(
+            sympy.N(
+                sympy.deg(kot_med_premicama(sympy.Rational(k1), sympy.Rational(k2)))
+            )
+        )
+        if rezultat != simbolicni_rezultat:
+            logger.error(
+                "Kot med premicama s koeficientoma %s in %s je %s, simbolično pa %s.",
+                k1,
+                k2,
+                rezultat,
+                simbolicni_rezultat,
+            )
+    return rezultat
+
+
+def generiraj_polinom(rng, min_stopnja=2, max_stopnja=3):
     """
     Vrne naključen polinom.
 
-    generiraj_polinom(max_stopnja=5)
+    generiraj_polinom(rng, max_stopnja=5)
     -2*x**4 + x**3 + 2*x**2 + 2*x + 3
     """
     x = sympy.symbols("x")
-    stopnja = random.randint(min_stopnja, max_stopnja)
+    stopnja = rng.randint(min_stopnja, max_stopnja)
     polinom = sympy.Poly(
-        [random.choice([-2, -1, 1, 2])]
-        + [random.randint(-3, 3) for i in range(stopnja)],
+        [rng.choice([-2, -1, 1, 2])] + [rng.randint(-3, 3) for i in range(stopnja)],
         x,
     ).as_expr()  # Pazi za stacionarne naj bo največ 3.stopnje!
     return polinom
 
 
 def generiraj_racionalno(
+    rng,
     min_stopnja_stevca=2,
     max_stopnja_stevca=4,
     min_stopnja_imenovalca=1,
@@ -58,52 +110,52 @@ def generiraj_racionalno(
     """
     Vrne naključno racionalno funkcijo.
 
-    generiraj_racionalno(min_stopnja_stevca=3, min_stopnja_imenovalca=3, max_stopnja_imenovalca=3)
+    generiraj_racionalno(rng, min_stopnja_stevca=3, min_stopnja_imenovalca=3, max_stopnja_imenovalca=3)
     (-2*x**3 + 3*x**2 - x + 1)/(x**3 + 3*x**2 - 3*x - 2)
     """
     x = sympy.symbols("x")
-    stopnja_stevca = random.randint(min_stopnja_stevca, max_stopnja_stevca)
-    stopnja_imenovalca = random.randint(min_stopnja_imenovalca, max_stopnja_imenovalca)
+    stopnja_stevca = rng.randint(min_stopnja_stevca, max_stopnja_stevca)
+    stopnja_imenovalca = rng.randint(min_stopnja_imenovalca, max_stopnja_imenovalca)
     stevec = sympy.Poly(
-        [random.choice([-2, -1, 1, 2])]
-        + [random.randint(-3, 3) for i in range(stopnja_stevca)],
+        [rng.choice([-2, -1, 1, 2])]
+        + [rng.randint(-3, 3) for i in range(stopnja_stevca)],
         x,
     ).as_expr()
     imenovalec = sympy.Poly(
-        [random.choice([-2, -1, 1, 2])]
-        + [random.randint(-3, 3) for i in range(stopnja_imenovalca)],
+        [rng.choice([-2, -1, 1, 2])]
+        + [rng.randint(-3, 3) for i in range(stopnja_imenovalca)],
         x,
     ).as_expr()
-    racionalna = sympy.simplify(stevec / imenovalec)
+    racionalna = memo.simplify(stevec / imenovalec)
     return racionalna
 
 
-def generiraj_eksponentno(osnove=[sympy.E, 2, 3, 5]):
+def generiraj_eksponentno(rng, osnove=[sympy.E, 2, 3, 5]):
     """
     Vrne naključno eksponentno funkcijo z eno izmed podanih osnov.
     """
     x = sympy.symbols("x")
-    osnova = random.choice(osnove)
+    osnova = rng.choice(osnove)
     eksponentna = osnova**x
     return eksponentna
 
 
-def izberi_logaritem_z_nakljucno_osnovo(osnove=[sympy.E, 2, 3, 4, 5, 10]):
+def izberi_logaritem_z_nakljucno_osnovo(rng, osnove=[sympy.E, 2, 3, 4, 5, 10]):
     """
     Vrne naključno logaritemsko funkcijo z eno izmed podanih osnov.
-    >>> izberi_logaritem_z_nakljucno_osnovo(osnove=[3,5])
+    >>> izberi_logaritem_z_nakljucno_osnovo(rng, osnove=[3,5])
     log(x)/log(5)
     """
     x = sympy.symbols("x")
-    osnova = random.choice(osnove)
+    osnova = rng.choice(osnove)
     if osnova == sympy.E:
         logaritem = sympy.ln(x)
     else:
-        logaritem = sympy.simplify(sympy.log(x, osnova))
+        logaritem = memo.simplify(sympy.log(x, osnova))
     return logaritem
 
 
-def izberi_nakljucno_kotno_funkcijo():
+def izberi_nakljucno_kotno_funkcijo(rng):
     """
     Naključno izbere kosinus, sinus, tangens ali kotangens.
     """
@@ -112,10 +164,10 @@ def izberi_nakljucno_kotno_funkcijo():
     sinus = sympy.sin(x)
     tangens = sympy.tan(x)
     kotangens = sympy.cot(x)
-    return random.choice([kosinus, sinus, tangens, kotangens])
+    return rng.choice([kosinus, sinus, tangens, kotangens])
 
 
-def izberi_nakljucno_krozno_funkcijo():
+def izberi_nakljucno_krozno_funkcijo(rng):
     """
     Naključno izbere arkus kosinus, arkus sinus, arkus tangens ali arkus kotangens.
     """
@@ -124,7 +176,7 @@ def izberi_nakljucno_krozno_funkcijo():
     arcus_sinus = sympy.asin(x)
     arcus_tangens = sympy.atan(x)
     arcus_kotangens = sympy.acot(x)
-    return random.choice([arcus_kosinus, arcus_sinus, arcus_tangens, arcus_kotangens])
+    return rng.choice([arcus_kosinus, arcus_sinus, arcus_tangens, arcus_kotangens])
 
 
 class KotMedPremicama(Problem):
@@ -138,21 +190,19 @@ class KotMedPremicama(Problem):
     class Meta:
         verbose_name = "Odvodi / računanje kota med premicama"
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
         y = sympy.symbols("y")
-        k1, k2 = random.sample([x for x in range(-6, 7) if x != 0], 2)
-        n1, n2 = random.sample([x for x in range(-10, 11) if x != 0], 2)
+        k1, k2 = rng.sample([x for x in range(-6, 7) if x != 0], 2)
+        n1, n2 = rng.sample([x for x in range(-10, 11) if x != 0], 2)
         premica1 = k1 * x + n1
         premica2 = sympy.Eq(y, k2 * x + n2)
-        kot = sympy.N(sympy.deg(kot_med_premicama(k1, k2)))
-        stopinje = kot // 1
-        minute = round(kot % 1 * 60)
+        stopinje, minute = kot_med_premicama_v_stopinjah(k1, k2)
         return {
-            "premica1": sympy.latex(premica1),
-            "premica2": sympy.latex(premica2),
-            "stopinje": sympy.latex(stopinje),
-            "minute": sympy.latex(minute),
+            "premica1": memo.latex(premica1),
+            "premica2": memo.latex(premica2),
+            "stopinje": str(stopinje),
+            "minute": str(minute),
         }
 
 
@@ -175,10 +225,10 @@ class OdvodKompozitumaElementarnih(Problem):
         VrstaElementarneFunkcije.KOTNA,
     ]
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
-        prva_elementarna = random.choice(self.funkcije)
-        druga_elementarna = random.choice(
+        prva_elementarna = rng.choice(self.funkcije)
+        druga_elementarna = rng.choice(
             [x for x in self.funkcije if x != VrstaElementarneFunkcije.RACIONALNA]
         )
 
@@ -188,29 +238,29 @@ class OdvodKompozitumaElementarnih(Problem):
         vrsti_dveh_elementarnih = {prva_elementarna: None, druga_elementarna: None}
         for vrsta in vrsti_dveh_elementarnih:
             if vrsta.value == "polinom":
-                vrsti_dveh_elementarnih[vrsta] = generiraj_polinom()
+                vrsti_dveh_elementarnih[vrsta] = generiraj_polinom(rng)
             elif vrsta.value == "racionalna":
                 vrsti_dveh_elementarnih[vrsta] = generiraj_racionalno(
-                    max_stopnja_stevca=2, max_stopnja_imenovalca=2
+                    rng, max_stopnja_stevca=2, max_stopnja_imenovalca=2
                 )
             elif vrsta.value == "eksponentna":
-                vrsti_dveh_elementarnih[vrsta] = generiraj_eksponentno()
+                vrsti_dveh_elementarnih[vrsta] = generiraj_eksponentno(rng)
             elif vrsta.value == "logaritem":
                 vrsti_dveh_elementarnih[vrsta] = izberi_logaritem_z_nakljucno_osnovo(
-                    osnove=[sympy.E]
+                    rng, osnove=[sympy.E]
                 )
             elif vrsta.value == "kotna":
-                vrsti_dveh_elementarnih[vrsta] = izberi_nakljucno_kotno_funkcijo()
+                vrsti_dveh_elementarnih[vrsta] = izberi_nakljucno_kotno_funkcijo(rng)
             elif vrsta.value == "krozna":
-                vrsti_dveh_elementarnih[vrsta] = izberi_nakljucno_krozno_funkcijo()
+                vrsti_dveh_elementarnih[vrsta] = izberi_nakljucno_krozno_funkcijo(rng)
 
         zunanja_funkcija = vrsti_dveh_elementarnih[prva_elementarna]
         notranja_funkcija = vrsti_dveh_elementarnih[druga_elementarna]
         kompozitum_funkcij = zunanja_funkcija.subs(x, notranja_funkcija)
-        odvod_kompozituma = kompozitum_funkcij.diff(x)
+        odvod_kompozituma = memo.diff(kompozitum_funkcij, x)
         return {
-            "kompozitum_funkcij": sympy.latex(kompozitum_funkcij, ln_notation=True),
-            "odvod_kompozituma": sympy.latex(odvod_kompozituma, ln_notation=True),
+            "kompozitum_funkcij": memo.latex(kompozitum_funkcij, ln_notation=True),
+            "odvod_kompozituma": memo.latex(odvod_kompozituma, ln_notation=True),
         }
 
 
@@ -224,6 +274,7 @@ class OdvodSestavljene(Problem):
 
     default_instruction = r"Določi odvod funkcije $f(x)=@funkcija$."
     default_solution = r"$f'(x)=@odvod$"
+    generation_cost = 20
 
     class Meta:
         verbose_name = "Odvodi / odvajanje sestavljene funkcije"
@@ -243,48 +294,52 @@ class OdvodSestavljene(Problem):
         lambda a, b: a / b,
     ]
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
-        prva_elementarna = random.choice(self.funkcije)
-        druga_elementarna = random.choice(self.funkcije)
-        operator = random.choice(self.operatorji)
+        prva_elementarna = rng.choice(self.funkcije)
+        druga_elementarna = rng.choice(self.funkcije)
+        operator = rng.choice(self.operatorji)
 
         vrsti_dveh_elementarnih = {prva_elementarna: None, druga_elementarna: None}
         for vrsta in vrsti_dveh_elementarnih:
             match vrsta.value:
                 case "polinom":
                     vrsti_dveh_elementarnih[vrsta] = generiraj_polinom(
-                        min_stopnja=1, max_stopnja=2
+                        rng, min_stopnja=1, max_stopnja=2
                     )
                 case "racionalna":
                     vrsti_dveh_elementarnih[vrsta] = generiraj_racionalno(
-                        max_stopnja_stevca=2, max_stopnja_imenovalca=2
+                        rng, max_stopnja_stevca=2, max_stopnja_imenovalca=2
                     )
                 case "eksponentna":
-                    vrsti_dveh_elementarnih[vrsta] = generiraj_eksponentno()
+                    vrsti_dveh_elementarnih[vrsta] = generiraj_eksponentno(rng)
                 case "logaritem":
                     vrsti_dveh_elementarnih[
                         vrsta
-                    ] = izberi_logaritem_z_nakljucno_osnovo(osnove=[sympy.E])
+                    ] = izberi_logaritem_z_nakljucno_osnovo(rng, osnove=[sympy.E])
                 case "kotna":
-                    vrsti_dveh_elementarnih[vrsta] = izberi_nakljucno_kotno_funkcijo()
+                    vrsti_dveh_elementarnih[vrsta] = izberi_nakljucno_kotno_funkcijo(
+                        rng
+                    )
                 case "krozna":
-                    vrsti_dveh_elementarnih[vrsta] = izberi_nakljucno_krozno_funkcijo()
+                    vrsti_dveh_elementarnih[vrsta] = izberi_nakljucno_krozno_funkcijo(
+                        rng
+                    )
 
         zunanja_funkcija = vrsti_dveh_elementarnih[prva_elementarna]
         notranja_funkcija = vrsti_dveh_elementarnih[druga_elementarna]
 
         zunanja_funkcija = zunanja_funkcija.subs(
-            x, random.choice([-3, -2, -1, 2, 3, 4, 5]) * x
+            x, rng.choice([-3, -2, -1, 2, 3, 4, 5]) * x
         )
         if zunanja_funkcija == notranja_funkcija:
             raise GeneratedDataIncorrect
 
         funkcija = operator(zunanja_funkcija, notranja_funkcija)
-        odvod = sympy.simplify(sympy.simplify(funkcija).diff(x))
+        odvod = memo.simplify(memo.diff(memo.simplify(funkcija), x))
         return {
-            "funkcija": sympy.latex(funkcija, ln_notation=True),
-            "odvod": sympy.latex(odvod, ln_notation=True),
+            "funkcija": memo.latex(funkcija, ln_notation=True),
+            "odvod": memo.latex(odvod, ln_notation=True),
         }
 
 
@@ -307,49 +362,50 @@ class Tangenta(Problem):
         VrstaElementarneFunkcije.KOTNA,
     ]
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
-        izbrana = random.choice(self.funkcije)
+        izbrana = rng.choice(self.funkcije)
 
         match izbrana.value:
             case "polinom":
-                funkcija = generiraj_polinom()
-                x0 = random.randint(-2, 2)
+                funkcija = generiraj_polinom(rng)
+                x0 = rng.randint(-2, 2)
             case "racionalna":
-                stopnja_stevca = random.randint(1, 2)
+                stopnja_stevca = rng.randint(1, 2)
                 stopnja_imenovalca = 2 - stopnja_stevca
                 funkcija = generiraj_racionalno(
+                    rng,
                     min_stopnja_stevca=stopnja_stevca,
                     max_stopnja_stevca=stopnja_stevca,
                     min_stopnja_imenovalca=stopnja_imenovalca,
                     max_stopnja_imenovalca=stopnja_imenovalca,
                 )
-                x0 = random.randint(-2, 2)
+                x0 = rng.randint(-2, 2)
             case "eksponentna":
-                osnova = random.choice([sympy.E, 2, 3, 5])
-                funkcija = generiraj_eksponentno(osnove=[osnova])
-                x0 = random.choice([sympy.log(n, osnova) for n in [1, 2, 3]])
+                osnova = rng.choice([sympy.E, 2, 3, 5])
+                funkcija = generiraj_eksponentno(rng, osnove=[osnova])
+                x0 = rng.choice([sympy.log(n, osnova) for n in [1, 2, 3]])
 
             case "logaritem":
-                funkcija = izberi_logaritem_z_nakljucno_osnovo(osnove=[sympy.E])
-                x0 = sympy.E ** (random.randint(-1, 2))
+                funkcija = izberi_logaritem_z_nakljucno_osnovo(rng, osnove=[sympy.E])
+                x0 = sympy.E ** (rng.randint(-1, 2))
             case "kotna":
-                funkcija = izberi_nakljucno_kotno_funkcijo()
-                x0 = random.choice([sympy.pi / x for x in [6, 3, 4, 2]])
+                funkcija = izberi_nakljucno_kotno_funkcijo(rng)
+                x0 = rng.choice([sympy.pi / x for x in [6, 3, 4, 2]])
             case "krozna":
                 arcus_kosinus = sympy.acos(x)
                 arcus_sinus = sympy.asin(x)
-                x0 = random.choice([0, 1 / 2, sympy.sqrt(2) / 2, sympy.sqrt(3) / 2, 1])
-                funkcija = random.choice([arcus_kosinus, arcus_sinus])
-        odvod = sympy.simplify(funkcija).diff(x)
+                x0 = rng.choice([0, 1 / 2, sympy.sqrt(2) / 2, sympy.sqrt(3) / 2, 1])
+                funkcija = rng.choice([arcus_kosinus, arcus_sinus])
+        odvod = memo.diff(memo.simplify(funkcija), x)
         y0 = funkcija.subs(x, x0)
         k = odvod.subs(x, x0)
         zacetna_vrednost = y0 - k * x0
         tangenta = k * x + zacetna_vrednost
         return {
-            "funkcija": sympy.latex(funkcija),
-            "abscisa": sympy.latex(x0),
-            "tangenta": sympy.latex(tangenta),
+            "funkcija": memo.latex(funkcija),
+            "abscisa": memo.latex(x0),
+            "tangenta": memo.latex(tangenta),
         }
 
 
@@ -364,36 +420,36 @@ class KotMedGrafomaElementarnihFunkcij(Problem):
     class Meta:
         verbose_name = "Odvodi / računanje kota med elementarnimi funkcijami"
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x", real=True)
-        izbor = random.choice(["kvadratna", "eksponentna", "logaritem"])
+        izbor = rng.choice(["kvadratna", "eksponentna", "logaritem"])
         match izbor:
             case "eksponentna":
-                osnova = random.choice([sympy.E, 2, 3, 5])
+                osnova = rng.choice([sympy.E, 2, 3, 5])
                 eksponentna = osnova**x
-                a = random.randint(1, 2)
-                eksponent1 = sympy.Poly([a, random.randint(-3, 3)], x).as_expr()
-                eksponent2 = sympy.Poly([-a, random.randint(-3, 3)], x).as_expr()
+                a = rng.randint(1, 2)
+                eksponent1 = sympy.Poly([a, rng.randint(-3, 3)], x).as_expr()
+                eksponent2 = sympy.Poly([-a, rng.randint(-3, 3)], x).as_expr()
                 funkcija1 = eksponentna.subs(x, eksponent1)
                 funkcija2 = eksponentna.subs(x, eksponent2)
                 presek = sympy.solve((eksponent1 - eksponent2), x)
                 # Poenostavljen presek, ker sympy ne zna izračunati vseh eksponentnih enačb
             case "logaritem":
                 naravni_logaritem = sympy.ln(x)
-                a = random.randint(1, 2)
+                a = rng.randint(1, 2)
                 funkcija1 = naravni_logaritem.subs(
-                    x, sympy.Poly([a, random.randint(-3, 3)], x).as_expr()
+                    x, sympy.Poly([a, rng.randint(-3, 3)], x).as_expr()
                 )
                 funkcija2 = naravni_logaritem.subs(
-                    x, sympy.Poly([-a, random.randint(-3, 3)], x).as_expr()
+                    x, sympy.Poly([-a, rng.randint(-3, 3)], x).as_expr()
                 )
                 presek = sympy.solve((funkcija1 - funkcija2), x)
             case "kvadratna":
-                x0 = random.choice([-2, -1, 1, 2])
-                y0 = random.randint(-2, 2)
-                a = random.randint(1, 2)
-                c1 = random.randint(-4, -1)
-                c2 = random.randint(0, 4)
+                x0 = rng.choice([-2, -1, 1, 2])
+                y0 = rng.randint(-2, 2)
+                a = rng.randint(1, 2)
+                c1 = rng.randint(-4, -1)
+                c2 = rng.randint(0, 4)
                 b1 = (y0 - a * x0**2 - c1) // x0
                 b2 = (y0 - a * x0**2 - c2) // x0
                 funkcija1 = sympy.Poly([a, b1, c1], x).as_expr()
@@ -401,14 +457,12 @@ class KotMedGrafomaElementarnihFunkcij(Problem):
                 presek = sympy.solve((funkcija1 - funkcija2), x)
         if len(presek) != 1:
             raise GeneratedDataIncorrect
-        k1 = funkcija1.diff().subs(x, *presek)
-        k2 = funkcija2.diff().subs(x, *presek)
-        kot = sympy.N(sympy.deg(kot_med_premicama(k1, k2)))
-        stopinje = kot // 1
-        minute = round(kot % 1 * 60)
+        k1 = memo.diff(funkcija1).subs(x, *presek)
+        k2 = memo.diff(funkcija2).subs(x, *presek)
+        stopinje, minute = kot_med_premicama_v_stopinjah(k1, k2)
         return {
-            "funkcija1": sympy.latex(funkcija1),
-            "funkcija2": sympy.latex(funkcija2),
-            "stopinje": sympy.latex(stopinje),
-            "minute": sympy.latex(minute),
+            "funkcija1": memo.latex(funkcija1),
+            "funkcija2": memo.latex(funkcija2),
+            "stopinje": str(stopinje),
+            "minute": str(minute),
         }
@@ -1,5 +1,3 @@
-import random
-
 import sympy
 
 from .meta import GeneratedDataIncorrect, Problem
@@ -21,31 +19,31 @@ def seznam_tretjin(od=-10, do=10):
     return [sympy.Rational(x, 3) for x in range(3 * od, 3 * (do + 1)) if x != 0]
 
 
-def generiraj_nicelno_obliko_kvadratne(od=-5, do=5):
+def generiraj_nicelno_obliko_kvadratne(rng, od=-5, do=5):
     """
     Vrne naključno kvadratno funkcijo v ničelni obliki.
     >>> nicelna_oblika(od=-2)
     (2, -2, 3/2, 2*(x - 3/2)*(x + 2))
     """
 
-    a = random.choice(seznam_polovic(-4, 4) + seznam_tretjin(-4, 4))
-    x1 = random.choice(seznam_polovic(od, do) + seznam_tretjin(od, do))
-    x2 = random.choice(seznam_polovic(od, do) + seznam_tretjin(od, do))
+    a = rng.choice(seznam_polovic(-4, 4) + seznam_tretjin(-4, 4))
+    x1 = rng.choice(seznam_polovic(od, do) + seznam_tretjin(od, do))
+    x2 = rng.choice(seznam_polovic(od, do) + seznam_tretjin(od, do))
     x = sympy.symbols("x")
     # nicelna = a * (x - x1) * (x - x2)
     nicelna = sympy.Mul(a, x - x1, x - x2, evaluate=False)
     return (a, x1, x2, nicelna)
 
 
-def generiraj_splosno_obliko_kvadratne():
+def generiraj_splosno_obliko_kvadratne(rng):
     """
     Vrne naključno kvadratno funkcijo v splošni obliki.
     """
 
     x = sympy.symbols("x")
-    a = random.choice(seznam_polovic(-4, 4) + seznam_tretjin(-4, 4))
-    b = random.choice(seznam_polovic(-4, 4) + seznam_tretjin(-4, 4))
-    c = random.choice(seznam_polovic(-4, 4) + seznam_tretjin(-4, 4))
+    a = rng.choice(seznam_polovic(-4, 4) + seznam_tretjin(-4, 4))
+    b = rng.choice(seznam_polovic(-4, 4) + seznam_tretjin(-4, 4))
+    c = rng.choice(seznam_polovic(-4, 4) + seznam_tretjin(-4, 4))
     splosna_oblika_kvadratne = a * x**2 + b * x + c
     return (a, b, c, splosna_oblika_kvadratne)
 
@@ -94,13 +92,13 @@ class IzracunNicelVPrimeruDvojneNicle(Problem):
     class Meta:
         verbose_name = "Polinomi / iskanje ničel v primeru dvojne ničle"
 
-    def generate(self):
+    def generate(self, rng):
         x = sympy.symbols("x")
-        dvojna_nicla = random.choice(
+        dvojna_nicla = rng.choice(
             [-5, -4, -3, -2, -1, 2, 3, 4, 5]
         )  # Nočemo da je dvojna ničla, 0 ali 1 ker prelahko
 
-        [a, b, c, splosna] = generiraj_splosno_obliko_kvadratne()
+        [a, b, c, splosna] = generiraj_splosno_obliko_kvadratne(rng)
         [tretja_nicla, cetrta_nicla] = izracunaj_nicle_splosne_kvadratne(a, b, c)
 
         if not (tretja_nicla != dvojna_nicla and cetrta_nicla != dvojna_nicla):
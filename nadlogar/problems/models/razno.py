@@ -1,5 +1,3 @@
-import random
-
 from django.db import models
 
 from .meta import Problem
@@ -23,7 +21,7 @@ class ProstoBesedilo(Problem):
     class Meta:
         verbose_name = "Razno / prosto besedilo"
 
-    def generate(self):
+    def generate(self, rng):
         return {
             "navodilo": self.navodilo,
             "resitev": self.resitev,
@@ -57,10 +55,10 @@ class KrajsanjeUlomkov(Problem):
     class Meta:
         verbose_name = "??? / krajšanje ulomkov"
 
-    def generate(self):
-        stevec = random.randint(1, self.najvecji_stevec)
-        imenovalec = random.randint(1, self.najvecji_imenovalec)
-        faktor = random.randint(1, self.najvecji_faktor)
+    def generate(self, rng):
+        stevec = rng.randint(1, self.najvecji_stevec)
+        imenovalec = rng.randint(1, self.najvecji_imenovalec)
+        faktor = rng.randint(1, self.najvecji_faktor)
         return {
             "okrajsan_stevec": stevec,
             "okrajsan_imenovalec": imenovalec,
@@ -89,8 +87,8 @@ class IskanjeNicelPolinoma(Problem):
     class Meta:
         verbose_name = "??? / iskanje ničel polinoma"
 
-    def generate(self):
-        nicla = random.randint(1, self.velikost_nicle)
+    def generate(self, rng):
+        nicla = rng.randint(1, self.velikost_nicle)
         if self.stevilo_nicel % 2 == 0:
             nicle = {nicla, -nicla}
         else:
@@ -1,8 +1,8 @@
-import random
-
 import sympy
 from django.db import models
 
+from .. import memo
+from ..polynomials import Polynomial
 from .meta import Problem
 
 
@@ -28,20 +28,20 @@ class RazstaviVieta(Problem):
     class Meta:
         verbose_name = "Razstavljanje / Vietovo pravilo"
 
-    def generate(self):
-        x1 = random.randint(-self.maksimalna_vrednost, self.maksimalna_vrednost)
-        x2 = random.randint(-self.maksimalna_vrednost, self.maksimalna_vrednost)
-        a = (
-            random.choice([1, -1]) * random.randint(2, 4)
-            if self.vodilni_koeficient
-            else 1
-        )
+    def generate(self, rng):
+        x1 = rng.randint(-self.maksimalna_vrednost, self.maksimalna_vrednost)
+        x2 = rng.randint(-self.maksimalna_vrednost, self.maksimalna_vrednost)
+        a = rng.choice([1, -1]) * rng.randint(2, 4) if self.vodilni_koeficient else 1
 
         x = sympy.symbols("x")
-        razstavljen = sympy.Mul(a, (x - x1), (x - x2), evaluate=False).simplify()
-        izraz = razstavljen.expand()
+        razstavljen = memo.simplify(sympy.Mul(a, (x - x1), (x - x2), evaluate=False))
+        # Razstavljeno obliko določi sympy, saj simplify nekatere izraze zapiše drugače,
+        # zmnožek pa izračunamo sami.
+        izraz = Polynomial.from_terms(
+            [(a, {"x": 2}), (-a * (x1 + x2), {"x": 1}), (a * x1 * x2, {})]
+        )
 
-        return {"izraz": sympy.latex(izraz), "razstavljen": sympy.latex(razstavljen)}
+        return {"izraz": izraz.latex(), "razstavljen": memo.latex(razstavljen)}
 
 
 class RazstaviRazliko(Problem):
@@ -49,6 +49,7 @@ class RazstaviRazliko(Problem):
 
     default_instruction = "Razstavi izraz $@izraz$"
     default_solution = "$@razstavljen$"
+    generation_cost = 5
 
     najmanjsa_potenca = models.PositiveSmallIntegerField(
         "najmanjša potenca",
@@ -72,35 +73,35 @@ class RazstaviRazliko(Problem):
     class Meta:
         verbose_name = "Razstavljanje / razlika potenc"
 
-    def generate(self):
+    def generate(self, rng):
         if self.najmanjsa_potenca > self.najvecja_potenca:
             self.najmanjsa_potenca, self.najvecja_potenca = (
                 self.najvecja_potenca,
                 self.najmanjsa_potenca,
             )
 
-        potenca = random.randint(self.najmanjsa_potenca, self.najvecja_potenca)
+        potenca = rng.randint(self.najmanjsa_potenca, self.najvecja_potenca)
         if potenca == 2:
             do = 10
         else:
             do = 5
         simboli = ["a", "b", "c", "x", "y", "z", "v", "t"]
-        izbran_simbol = random.choice(simboli)
+        izbran_simbol = rng.choice(simboli)
         x = sympy.symbols(izbran_simbol)
         simboli.remove(izbran_simbol)
         if not self.linearna_kombinacija:
             a = 1
-            b = random.choice([x for x in range(-do, do) if x != 0])
+            b = rng.choice([x for x in range(-do, do) if x != 0])
             y = 1
             m = 1
             n = 1
         else:
-            a = random.randint(1, do)
-            b = random.choice([x for x in range(-do, do) if x != 0])
-            n = random.randint(1, 3)
-            m = random.randint(1, 3)
-            y = sympy.symbols(random.choice(simboli))
+            a = rng.randint(1, do)
+            b = rng.choice([x for x in range(-do, do) if x != 0])
+            n = rng.randint(1, 3)
+            m = rng.randint(1, 3)
+            y = sympy.symbols(rng.choice(simboli))
         izraz = (a * x**n) ** potenca - (b * y**m) ** potenca
-        razstavljen = sympy.factor(izraz)
+        razstavljen = memo.factor(izraz)
 
-        return {"izraz": sympy.latex(izraz), "razstavljen": sympy.latex(razstavljen)}
+        return {"izraz": memo.latex(izraz), "razstavljen": memo.latex(razstavljen)}
@@ -1,18 +1,74 @@
-import random
+import math
+from fractions import Fraction
 
-import sympy
 from django.db import models
 
+from ..polynomials import Polynomial, number_latex, sqrt_latex
 from .meta import GeneratedDataIncorrect, Problem
 
 
-def razdalja_med_tockama(x1, y1, x2, y2):
+def tocka_latex(x, y):
     """
-    Izračuna razdaljo med dvema točkama.
+    Vrne LaTeX zapis točke s podanima zapisoma koordinat, kot ga zapiše sympy.
     """
+    return rf"\left( {x}, \  {y}\right)"
 
-    razdalja = sympy.Point(x1, y1).distance(sympy.Point(x2, y2))
-    return razdalja
+
+def kvadrat_latex(spremenljivka, premik, imenovalec=1):
+    """
+    Vrne LaTeX zapis izraza ((spremenljivka - premik) / imenovalec)^2, kot ga zapiše
+    sympy.
+    """
+    if premik == 0:
+        if imenovalec == 1:
+            return f"{spremenljivka}^{{2}}"
+        return rf"\frac{{{spremenljivka}^{{2}}}}{{{imenovalec**2}}}"
+    # Sympy ulomek razdeli na oba člena v oklepaju.
+    clen = Polynomial.from_terms(
+        [
+            (Fraction(1, imenovalec), {spremenljivka: 1}),
+            (Fraction(-premik, imenovalec), {}),
+        ]
+    )
+    return clen.power_latex(2)
+
+
+def vsota_kvadratov_latex(p, q, a=1, b=1):
+    """
+    Vrne LaTeX zapis izraza ((x - p) / a)^2 + ((y - q) / b)^2, kot ga zapiše sympy.
+    """
+    kvadrat_x = kvadrat_latex("x", p, a)
+    kvadrat_y = kvadrat_latex("y", q, b)
+    # Sympy zapiše potenco spremenljivke pred potenco premaknjene spremenljivke.
+    if p != 0 and q == 0:
+        return f"{kvadrat_y} + {kvadrat_x}"
+    return f"{kvadrat_x} + {kvadrat_y}"
+
+
+def vsota_s_korenom_latex(celo, predznak, radikand):
+    """
+    Vrne LaTeX zapis števila celo + predznak * sqrt(radikand), kot ga zapiše sympy.
+    >>> vsota_s_korenom_latex(3, 1, 5)
+    '\\sqrt{5} + 3'
+    """
+    koren = math.isqrt(radikand)
+    if koren * koren == radikand:
+        return str(celo + predznak * koren)
+    koren = sqrt_latex(radikand)
+    if celo == 0:
+        return koren if predznak > 0 else f"- {koren}"
+    # Sympy člene vsote uredi naraščajoče po vrednosti, razen če je pozitivnemu
+    # celemu številu prištet negativen večkratnik korena.
+    if celo > 0 and predznak < 0:
+        koren_prvi = False
+    elif predznak > 0:
+        koren_prvi = celo > 0 and celo * celo > radikand
+    else:
+        koren_prvi = celo * celo < radikand
+    if koren_prvi:
+        zacetek = koren if predznak > 0 else f"- {koren}"
+        return f"{zacetek} {'+' if celo > 0 else '-'} {abs(celo)}"
+    return f"{celo} {'+' if predznak > 0 else '-'} {koren}"
 
 
 class PreseciscaKroznic(Problem):
@@ -24,35 +80,39 @@ class PreseciscaKroznic(Problem):
     default_solution = r"Sekata se v $@presek$."
     # "
 
+    generation_cost = 5
+
     class Meta:
         verbose_name = "Stožnice / iskanje presečišča dveh krožnic"
 
-    def generate(self):
-        p1 = random.randint(-5, 5)
-        q1 = random.randint(-5, 5)
-        p2 = random.randint(-5, 5)
-        q2 = random.randint(-5, 5)
-        x0 = random.randint(-5, 5)
-        y0 = random.randint(-5, 5)
+    def generate(self, rng):
+        p1 = rng.randint(-5, 5)
+        q1 = rng.randint(-5, 5)
+        p2 = rng.randint(-5, 5)
+        q2 = rng.randint(-5, 5)
+        x0 = rng.randint(-5, 5)
+        y0 = rng.randint(-5, 5)
         if (p1, q1) == (p2, q2):
             raise GeneratedDataIncorrect
-        r1 = razdalja_med_tockama(x0, y0, p1, q1)
-        r2 = razdalja_med_tockama(x0, y0, p2, q2)
-        kroznica1 = sympy.Circle(sympy.Point(p1, q1), r1)
-        kroznica2 = sympy.Circle(sympy.Point(p2, q2), r2)
-        presek_kroznic = kroznica1.intersection(kroznica2)
-        tocke_preseka = [(A.x, A.y) for A in presek_kroznic]
-        if (x0, y0) not in tocke_preseka:
+        kvadrat_r1 = (x0 - p1) ** 2 + (y0 - q1) ** 2
+        kvadrat_r2 = (x0 - p2) ** 2 + (y0 - q2) ** 2
+        if kvadrat_r1 == 0 or kvadrat_r2 == 0:
+            # Točka (x0, y0) je središče ene od krožnic, ki se izrodi v točko.
             raise GeneratedDataIncorrect
-        latex_zapis_tock = ""
-        for id, tocka in enumerate(tocke_preseka):
-            latex_zapis_tock += f"T_{id + 1} = {sympy.latex(tocka)}, "
-        latex_zapis_tock = latex_zapis_tock[:-2]
-        izpis_kroznica1 = sympy.Eq(kroznica1.equation() + r1**2, r1**2)
-        izpis_kroznica2 = sympy.Eq(kroznica2.equation() + r2**2, r2**2)
+        # Obe krožnici gresta skozi (x0, y0), drugo presečišče pa je zrcalna slika
+        # te točke čez premico skozi središči.
+        smer_x, smer_y = p2 - p1, q2 - q1
+        t = Fraction((x0 - p1) * smer_x + (y0 - q1) * smer_y, smer_x**2 + smer_y**2)
+        x1 = 2 * (p1 + t * smer_x) - x0
+        y1 = 2 * (q1 + t * smer_y) - y0
+        tocke_preseka = sorted({(Fraction(x0), Fraction(y0)), (x1, y1)})
+        latex_zapis_tock = ", ".join(
+            f"T_{id + 1} = {tocka_latex(number_latex(x), number_latex(y))}"
+            for id, (x, y) in enumerate(tocke_preseka)
+        )
         return {
-            "kroznica1": sympy.latex(izpis_kroznica1),
-            "kroznica2": sympy.latex(izpis_kroznica2),
+            "kroznica1": f"{vsota_kvadratov_latex(p1, q1)} = {kvadrat_r1}",
+            "kroznica2": f"{vsota_kvadratov_latex(p2, q2)} = {kvadrat_r2}",
             "presek": latex_zapis_tock,
         }
 
@@ -76,30 +136,36 @@ class TemeGorisceEnacba(Problem):
         default=False,
     )
 
-    def generate(self):
+    def generate(self, rng):
         if self.premaknjena:
-            sredisce_elipse = sympy.Point(random.randint(-5, 5), random.randint(-5, 5))
+            p, q = rng.randint(-5, 5), rng.randint(-5, 5)
         else:
-            sredisce_elipse = sympy.Point(0, 0)
-        vodoravna_polos = random.randint(1, 5)
-        navpicna_polos = random.randint(1, 5)
+            p, q = 0, 0
+        vodoravna_polos = rng.randint(1, 5)
+        navpicna_polos = rng.randint(1, 5)
         if vodoravna_polos == navpicna_polos:
             raise GeneratedDataIncorrect
-        teme = random.choice(
+        teme = rng.choice(
             [
-                sredisce_elipse.translate(x=vodoravna_polos),
-                sredisce_elipse.translate(x=-vodoravna_polos),
-                sredisce_elipse.translate(y=navpicna_polos),
-                sredisce_elipse.translate(y=-navpicna_polos),
+                (p + vodoravna_polos, q),
+                (p - vodoravna_polos, q),
+                (p, q + navpicna_polos),
+                (p, q - navpicna_polos),
             ]
         )
-        elipsa = sympy.Ellipse(sredisce_elipse, vodoravna_polos, navpicna_polos)
-        gorisce = random.choice(elipsa.foci)
+        # Gorišči ležita na veliki osi, na razdalji sqrt(a^2 - b^2) od središča.
+        radikand = abs(vodoravna_polos**2 - navpicna_polos**2)
+        predznak = rng.choice([-1, 1])
+        if vodoravna_polos > navpicna_polos:
+            gorisce = (vsota_s_korenom_latex(p, predznak, radikand), q)
+        else:
+            gorisce = (p, vsota_s_korenom_latex(q, predznak, radikand))
+        elipsa = vsota_kvadratov_latex(p, q, vodoravna_polos, navpicna_polos)
         return {
-            "teme": sympy.latex((teme.x, teme.y)),
-            "gorisce": sympy.latex((gorisce.x, gorisce.y)),
-            "sredisce": sympy.latex((sredisce_elipse.x, sredisce_elipse.y)),
-            "elipsa": sympy.latex(sympy.Eq(elipsa.equation() + 1, 1)),
+            "teme": tocka_latex(*teme),
+            "gorisce": tocka_latex(*gorisce),
+            "sredisce": tocka_latex(p, q),
+            "elipsa": f"{elipsa} = 1",
         }
 
 
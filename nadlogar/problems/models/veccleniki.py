@@ -1,8 +1,7 @@
-import random
-
 import sympy
 from django.db import models
 
+from ..polynomials import Polynomial
 from .meta import Problem
 
 
@@ -34,29 +33,27 @@ class PotencaDvoclenika(Problem):
     class Meta:
         verbose_name = "Veččleniki / potenciranje dvočlenika"
 
-    def generate(self):
-        potenca = random.randint(self.najmanjsa_potenca, self.najvecja_potenca)
+    def generate(self, rng):
+        potenca = rng.randint(self.najmanjsa_potenca, self.najvecja_potenca)
         simboli = ["a", "b", "c", "x", "y", "z", "v", "t"]
-        izbran_simbol = random.choice(simboli)
-        x = sympy.symbols(izbran_simbol)
-        simboli.remove(izbran_simbol)
+        x = rng.choice(simboli)
+        simboli.remove(x)
         if not self.linearna_kombinacija:
             a = 1
-            b = random.choice([x for x in range(-5, 5) if x != 0])
+            b = rng.choice([x for x in range(-5, 5) if x != 0])
             n = 1
-            y = 1
-            m = 1
+            y = {}
         else:
-            a = random.randint(1, 5)
-            b = random.choice([x for x in range(-5, 5) if x != 0])
-            n = random.randint(2, 5)
-            m = random.randint(1, 5)
-            y = sympy.symbols(random.choice(simboli))
+            a = rng.randint(1, 5)
+            b = rng.choice([x for x in range(-5, 5) if x != 0])
+            n = rng.randint(2, 5)
+            m = rng.randint(1, 5)
+            y = {rng.choice(simboli): m}
 
-        izraz = sympy.Pow(a * x**n + b * y**m, potenca, evaluate=False)
+        dvoclenik = Polynomial.from_terms([(a, {x: n}), (b, y)])
         return {
-            "izraz": sympy.latex(izraz),
-            "resitev": sympy.latex(sympy.expand(izraz)),
+            "izraz": dvoclenik.power_latex(potenca),
+            "resitev": (dvoclenik**potenca).latex(),
         }
 
 
@@ -88,22 +85,23 @@ class PotencaTroclenika(Problem):
     class Meta:
         verbose_name = "Veččleniki / potenciranje tročlenika"
 
-    def generate(self):
-        potenca = random.randint(self.najmanjsa_potenca, self.najvecja_potenca)
-        simboli = [sympy.symbols(x) for x in ["a", "b", "c", "x", "y", "z", "v", "t"]]
-        x, y, z = random.sample(simboli, 3)
-        a = random.randint(1, 4)
-        b = random.choice([x for x in range(-4, 4) if x != 0])
-        c = random.choice([x for x in range(-4, 4) if x != 0])
+    def generate(self, rng):
+        potenca = rng.randint(self.najmanjsa_potenca, self.najvecja_potenca)
+        simboli = ["a", "b", "c", "x", "y", "z", "v", "t"]
+        x, y, z = rng.sample(simboli, 3)
+        a = rng.randint(1, 4)
+        b = rng.choice([x for x in range(-4, 4) if x != 0])
+        c = rng.choice([x for x in range(-4, 4) if x != 0])
+        clen_z = {z: 1}
         if not self.linearna_kombinacija:
             a = 1
             b = 1
-            z = 1
+            clen_z = {}
 
-        izraz = sympy.Pow(a * x + b * y + c * z, potenca, evaluate=False)
+        troclenik = Polynomial.from_terms([(a, {x: 1}), (b, {y: 1}), (c, clen_z)])
         return {
-            "izraz": sympy.latex(izraz),
-            "resitev": sympy.latex(sympy.expand(izraz)),
+            "izraz": troclenik.power_latex(potenca),
+            "resitev": (troclenik**potenca).latex(),
         }
 
 
@@ -145,29 +143,38 @@ class PotencaVecclenika(Problem):
     class Meta:
         verbose_name = "Veččleniki / potenciranje veččlenika"
 
-    def generate(self):
-        potenca = random.randint(self.najmanjsa_potenca, self.najvecja_potenca)
-        cleni = random.randint(self.najmanj_clenov, self.najvec_clenov)
+    def generate(self, rng):
+        potenca = rng.randint(self.najmanjsa_potenca, self.najvecja_potenca)
+        cleni = rng.randint(self.najmanj_clenov, self.najvec_clenov)
         simboli = [
-            sympy.symbols(chr(x)) for x in random.sample(range(97, 123), cleni)
+            chr(x) for x in rng.sample(range(97, 123), cleni)
         ]  # izberemo naključne znake abecede
         if potenca == 2:
             do = 10
         else:
             do = 5
 
-        koeficienti = random.choices([x for x in range(-do, do) if x != 0], k=cleni)
+        koeficienti = rng.choices([x for x in range(-do, do) if x != 0], k=cleni)
         if not self.linearna_kombinacija:
             potence = [1 for _ in range(cleni)]
         else:
-            potence = random.choices(range(1, 4), k=cleni)
-
-        vrednosti = zip(koeficienti, simboli, potence)
-        izraz = sympy.Pow(
-            sum(k * s**p for k, s, p in vrednosti), potenca, evaluate=False
-        )
-
+            potence = rng.choices(range(1, 4), k=cleni)
+
+        vrednosti = list(zip(koeficienti, simboli, potence))
+        if cleni < 2:
+            # Potence enočlenikov sympy zapiše drugače, zato jih prepustimo njemu.
+            izraz = sympy.Pow(
+                sum(k * sympy.symbols(s) ** p for k, s, p in vrednosti),
+                potenca,
+                evaluate=False,
+            )
+            return {
+                "izraz": sympy.latex(izraz),
+                "resitev": sympy.latex(sympy.expand(izraz)),
+            }
+
+        vecclenik = Polynomial.from_terms([(k, {s: p}) for k, s, p in vrednosti])
         return {
-            "izraz": sympy.latex(izraz),
-            "resitev": sympy.latex(sympy.expand(izraz)),
+            "izraz": vecclenik.power_latex(potenca),
+            "resitev": (vecclenik**potenca).latex(),
         }
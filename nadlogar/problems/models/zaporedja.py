@@ -1,5 +1,3 @@
-import random
-
 import sympy
 from django.db import models
 
@@ -51,12 +49,12 @@ class SplosniClenZaporedja(Problem):
     class Meta:
         verbose_name = "Zaporedja / splošni člen zaporedja"
 
-    def generate(self):
+    def generate(self, rng):
         n = sympy.symbols("n")
-        a = random.choice([x for x in range(-5, 5) if x != 0])
-        b = random.choice([x for x in range(-3, 3) if x != 0])
-        c = random.choice([x for x in range(1, 3) if x != 0])
-        d = random.choice([x for x in range(1, 3) if x != 0])
+        a = rng.choice([x for x in range(-5, 5) if x != 0])
+        b = rng.choice([x for x in range(-3, 3) if x != 0])
+        c = rng.choice([x for x in range(1, 3) if x != 0])
+        d = rng.choice([x for x in range(1, 3) if x != 0])
         predpisi = [
             a + (n - 1) * b,
             a * b ** (n - 1),
@@ -74,7 +72,7 @@ class SplosniClenZaporedja(Problem):
                 n**3 - a,
                 (-1) ** n * a * b ** (n - 1),
             ]
-        predpis = random.choice(predpisi)
+        predpis = rng.choice(predpisi)
         cleni = []
         for x in range(1, 6):
             cleni.append(predpis.subs(n, x))
@@ -101,16 +99,16 @@ class PrviCleniAritmeticnega(Problem):
         default=False,
     )
 
-    def generate(self):
+    def generate(self, rng):
         if not self.racionalne_vrednosti:
-            a1 = random.choice([x for x in range(-12, 12) if x != 0])
-            d = random.choice([x for x in range(-5, 5) if x != 0])
+            a1 = rng.choice([x for x in range(-12, 12) if x != 0])
+            d = rng.choice([x for x in range(-5, 5) if x != 0])
         else:
-            a1 = random.choice(
+            a1 = rng.choice(
                 [sympy.Rational(1, x) for x in range(-6, 6) if x != 0]
                 + [sympy.Rational(2, x) for x in range(-6, 6) if x != 0]
             )
-            d = random.choice([sympy.Rational(1, x) for x in range(-6, 6) if x != 0])
+            d = rng.choice([sympy.Rational(1, x) for x in range(-6, 6) if x != 0])
         cleni = [a1]
         for N in range(2, 6):
             cleni.append(clen_aritmeticnega(a1, d, N))
@@ -146,14 +144,14 @@ class SplosniClenAritmeticnegaZaporedja(Problem):
         default=10,
     )
 
-    def generate(self):
+    def generate(self, rng):
         seznam_polovick = [
             sympy.Rational(x, 2) for x in range(2 * self.od, 2 * self.do + 1) if x != 0
         ]
-        a1 = random.choice(seznam_polovick)
-        d = random.choice(seznam_polovick)
-        n1 = random.randint(2, 10)
-        n2 = random.randint(n1 + 1, 15)
+        a1 = rng.choice(seznam_polovick)
+        d = rng.choice(seznam_polovick)
+        n1 = rng.randint(2, 10)
+        n2 = rng.randint(n1 + 1, 15)
         an1 = clen_aritmeticnega(a1, d, n1)
         an2 = clen_aritmeticnega(a1, d, n2)
 
@@ -177,16 +175,16 @@ class SplosniClenAritmeticnegaEnacbi(Problem):
     class Meta:
         verbose_name = "Zaporedja / enačbi aritmetičnega"
 
-    def generate(self):
-        a1 = random.choice(
+    def generate(self, rng):
+        a1 = rng.choice(
             [x for x in range(-8, 8) if x != 0]
             + [-sympy.Rational(1, 2), sympy.Rational(1, 2)]
         )
-        d = random.choice(
+        d = rng.choice(
             [x for x in range(-3, 3) if x != 0]
             + [-sympy.Rational(1, 2), sympy.Rational(1, 2)]
         )
-        n1, n2, n3, n4 = random.sample(list(range(2, 20)), 4)
+        n1, n2, n3, n4 = rng.sample(list(range(2, 20)), 4)
         vrednost1 = clen_aritmeticnega(a1, d, n1) + clen_aritmeticnega(a1, d, n2)
         operatorji = {
             "+": lambda a, b: a + b,
@@ -194,7 +192,7 @@ class SplosniClenAritmeticnegaEnacbi(Problem):
             "\\cdot": lambda a, b: a * b,
         }
 
-        operator = random.choice(list(operatorji.keys()))
+        operator = rng.choice(list(operatorji.keys()))
         vrednost2 = operatorji[operator](
             clen_aritmeticnega(a1, d, n3), clen_aritmeticnega(a1, d, n4)
         )
@@ -0,0 +1,177 @@
+import functools
+import math
+
+# Many generators only need arithmetic of polynomials with integer or fractional
+# coefficients in a few variables, for which sympy is orders of magnitude slower than
+# necessary. This module provides such polynomials together with a LaTeX printer whose
+# output is the same as the output of sympy.latex for the corresponding expressions.
+
+
+@functools.cache
+def _compositions(total, parts):
+    """Returns all tuples of parts nonnegative integers with the given sum."""
+    if parts == 0:
+        return [()] if total == 0 else []
+    if parts == 1:
+        return [(total,)]
+    return [
+        (first,) + rest
+        for first in range(total, -1, -1)
+        for rest in _compositions(total - first, parts - 1)
+    ]
+
+
+def _multinomial(powers):
+    coefficient = math.factorial(sum(powers))
+    for power in powers:
+        coefficient //= math.factorial(power)
+    return coefficient
+
+
+class Polynomial:
+    """A polynomial with integer or fractions.Fraction coefficients in named variables.
+
+    Variables are ordered alphabetically, and the polynomial maps monomials, given by
+    tuples of exponents of the variables, to their nonzero coefficients. Variables
+    are printed by their names, so they should be single letters.
+    """
+
+    def __init__(self, variables, coefficients):
+        self.variables = tuple(variables)
+        self.coefficients = {
+            monomial: coefficient
+            for monomial, coefficient in coefficients.items()
+            if coefficient
+        }
+
+    @classmethod
+    def from_terms(cls, terms):
+        """Returns the sum of terms, given as pairs of coefficients and dictionaries
+        that map variables to their exponents.
+
+        >>> Polynomial.from_terms([(3, {"x": 2}), (-2, {"y": 1})]).latex()
+        '3 x^{2} - 2 y'
+        """
+        variables = sorted({variable for _, powers in terms for variable in powers})
+        coefficients = {}
+        for coefficient, powers in terms:
+            monomial = tuple(powers.get(variable, 0) for variable in variables)
+            coefficients[monomial] = coefficients.get(monomial, 0) + coefficient
+        return cls(variables, coefficients)
+
+    def __pow__(self, exponent):
+        """Expands the power by the multinomial theorem.
+
+        >>> (Polynomial.from_terms([(1, {"a": 1}), (-1, {"b": 1})]) ** 2).latex()
+        'a^{2} - 2 a b + b^{2}'
+        """
+        terms = list(self.coefficients.items())
+        coefficients = {}
+        for powers in _compositions(exponent, len(terms)):
+            coefficient = _multinomial(powers)
+            monomial = [0] * len(self.variables)
+            for (term_monomial, term_coefficient), power in zip(terms, powers):
+                coefficient *= term_coefficient**power
+                for i, term_exponent in enumerate(term_monomial):
+                    monomial[i] += term_exponent * power
+            monomial = tuple(monomial)
+            coefficients[monomial] = coefficients.get(monomial, 0) + coefficient
+        return Polynomial(self.variables, coefficients)
+
+    def _ordered_terms(self):
+        # Like sympy, we order the terms lexicographically by their monomials.
+        terms = sorted(self.coefficients.items(), reverse=True)
+        if len(terms) == 2:
+            (_, first_coefficient), (last_monomial, last_coefficient) = terms
+            # Sympy prints a positive constant before a term with a negative
+            # coefficient, as in 3 - 2 x.
+            if (
+                not any(last_monomial)
+                and last_coefficient > 0
+                and first_coefficient < 0
+            ):
+                terms.reverse()
+        return terms
+
+    def _monomial_latex(self, monomial, coefficient):
+        """Returns the LaTeX code of a monomial with a positive coefficient."""
+        factors = [
+            variable if exponent == 1 else f"{variable}^{{{exponent}}}"
+            for variable, exponent in zip(self.variables, monomial)
+            if exponent
+        ]
+        if coefficient.numerator != 1 or not factors:
+            factors.insert(0, str(coefficient.numerator))
+        tex = " ".join(factors)
+        if coefficient.denominator != 1:
+            tex = rf"\frac{{{tex}}}{{{coefficient.denominator}}}"
+        return tex
+
+    def constant(self):
+        """Returns the value of a constant polynomial or None if it is not constant."""
+        if any(any(monomial) for monomial in self.coefficients):
+            return None
+        return sum(self.coefficients.values())
+
+    def latex(self):
+        """Returns the LaTeX code of the polynomial as printed by sympy.latex."""
+        terms = self._ordered_terms()
+        if not terms:
+            return "0"
+        tex = ""
+        for i, (monomial, coefficient) in enumerate(terms):
+            if i > 0:
+                tex += " - " if coefficient < 0 else " + "
+            elif coefficient < 0:
+                # Sympy prints negative integers without a space after the sign.
+                integer = not any(monomial) and coefficient.denominator == 1
+                tex += "-" if integer else "- "
+            tex += self._monomial_latex(monomial, abs(coefficient))
+        return tex
+
+    def power_latex(self, exponent):
+        """Returns the LaTeX code of an unexpanded power of the polynomial, which
+        should have at least two terms."""
+        return rf"\left({self.latex()}\right)^{{{exponent}}}"
+
+
+def _as_polynomial(value):
+    if isinstance(value, Polynomial):
+        return value
+    return Polynomial((), {(): value})
+
+
+def number_latex(number):
+    """Returns the LaTeX code of an integer or a fraction as printed by sympy.latex."""
+    return _as_polynomial(number).latex()
+
+
+def sqrt_latex(n):
+    """Returns the LaTeX code of the square root of a positive integer as printed by
+    sympy.latex(sympy.sqrt(n)).
+
+    >>> sqrt_latex(18)
+    '3 \\\\sqrt{2}'
+    """
+    outside, inside = 1, n
+    for divisor in range(2, math.isqrt(n) + 1):
+        while inside % (divisor * divisor) == 0:
+            inside //= divisor * divisor
+            outside *= divisor
+    if inside == 1:
+        return str(outside)
+    elif outside == 1:
+        return rf"\sqrt{{{inside}}}"
+    else:
+        return rf"{outside} \sqrt{{{inside}}}"
+
+
+def equation_latex(left, right):
+    """Returns the LaTeX code of the equation between two polynomials or numbers as
+    printed by sympy.latex(sympy.Eq(left, right))."""
+    left, right = _as_polynomial(left), _as_polynomial(right)
+    left_constant, right_constant = left.constant(), right.constant()
+    if left_constant is not None and right_constant is not None:
+        # Sympy evaluates equations between numbers.
+        return r"\text{True}" if left_constant == right_constant else r"\text{False}"
+    return f"{left.latex()} = {right.latex()}"
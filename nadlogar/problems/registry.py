@@ -0,0 +1,82 @@
+import threading
+
+from django.contrib.contenttypes.models import ContentType
+
+from .forms import problem_form_class
+from .models import Problem
+
+# Metadata of problem kinds depends only on their classes, so instead of recomputing it
+# on every request, we collect it once per process when the app is ready. Content types
+# are the exception, as they are stored in the database, which may not exist yet when
+# the app is loaded (for example, before the first migration). We thus look up the
+# content types of all kinds with a single query the first time one is needed.
+
+
+class ProblemKind:
+    """Metadata of a problem kind, given by a subclass of Problem."""
+
+    def __init__(self, generator):
+        self.generator = generator
+        # Verbose names have the form "group / description".
+        self.group, self.description = generator._meta.verbose_name.split(" / ")
+        self.default_instruction = generator.default_instruction
+        self.default_solution = generator.default_solution
+        self.form_class = problem_form_class(self)
+
+    def __repr__(self):
+        return f"ProblemKind({self.generator.__name__})"
+
+    @property
+    def content_type_id(self):
+        _load_content_types()
+        return self._content_type_id
+
+
+_kinds = []
+_kinds_by_content_type_id = {}
+_content_types_lock = threading.Lock()
+
+
+def register_problem_kinds():
+    """Collects the metadata of all problem kinds in the order of their definition."""
+    _kinds[:] = [ProblemKind(generator) for generator in Problem.__subclasses__()]
+    _kinds_by_content_type_id.clear()
+
+
+def _load_content_types():
+    with _content_types_lock:
+        if _kinds_by_content_type_id or not _kinds:
+            return
+        content_types = ContentType.objects.get_for_models(
+            *(kind.generator for kind in _kinds)
+        )
+        for kind in _kinds:
+            kind._content_type_id = content_types[kind.generator].id
+            _kinds_by_content_type_id[kind._content_type_id] = kind
+
+
+def clear_content_types():
+    """Forgets the content types, so that they are looked up again when needed.
+
+    Like the cache of ContentType.objects, this is needed when the content types in
+    the database change, for example when their creation is rolled back in tests.
+    """
+    with _content_types_lock:
+        _kinds_by_content_type_id.clear()
+
+
+def problem_kinds():
+    """Returns a list of all problem kinds."""
+    return _kinds
+
+
+def problem_kind(content_type_id):
+    """Returns the problem kind with the given content type id or None."""
+    _load_content_types()
+    return _kinds_by_content_type_id.get(content_type_id)
+
+
+def content_type_ids():
+    """Returns the content type ids of all problem kinds."""
+    _load_content_types()
+    return _kinds_by_content_type_id.keys()
@@ -0,0 +1,85 @@
+import collections
+import functools
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# This module collects statistics of generating subproblems for each problem kind, so
+# that we can tell whether generating a document is slow because of many rejected
+# attempts or because of single slow ones. Besides keeping the counters in memory,
+# we pass the metrics of each subproblem to the function given by the
+# PROBLEM_METRICS_HOOK setting, which can forward them to a monitoring system.
+
+
+class GeneratorStatistics:
+    """Counters of generated subproblems of a single problem kind."""
+
+    def __init__(self):
+        self.samples = 0
+        self.attempts = 0
+        self.attempt_time = 0.0
+        self.total_time = 0.0
+        self.timeouts = 0
+
+    def as_dict(self):
+        return {
+            "samples": self.samples,
+            "attempts": self.attempts,
+            "attempt_time": self.attempt_time,
+            "total_time": self.total_time,
+            "timeouts": self.timeouts,
+            "attempts_per_sample": self.attempts / max(self.samples, 1),
+            "time_per_attempt": self.attempt_time / max(self.attempts, 1),
+        }
+
+
+_statistics = collections.defaultdict(GeneratorStatistics)
+_statistics_lock = threading.Lock()
+
+
+@functools.cache
+def _import_hook(path):
+    return import_string(path)
+
+
+def record_sample(kind, attempts, attempt_time, total_time):
+    """Records the metrics of generating a single subproblem of the given kind.
+
+    The attempt time is the time spent in the generator, while the total time also
+    includes checking the generated data.
+    """
+    with _statistics_lock:
+        statistics = _statistics[kind]
+        statistics.samples += 1
+        statistics.attempts += attempts
+        statistics.attempt_time += attempt_time
+        statistics.total_time += total_time
+    if settings.PROBLEM_METRICS_HOOK is not None:
+        hook = _import_hook(settings.PROBLEM_METRICS_HOOK)
+        hook(
+            kind,
+            {
+                "attempts": attempts,
+                "attempt_time": attempt_time,
+                "total_time": total_time,
+            },
+        )
+
+
+def record_timeout(kind):
+    """Records that generating a problem of the given kind exceeded the time limit."""
+    with _statistics_lock:
+        _statistics[kind].timeouts += 1
+
+
+def generator_statistics():
+    """Returns the statistics of all problem kinds generated by this process."""
+    with _statistics_lock:
+        return {kind: statistics.as_dict() for kind, statistics in _statistics.items()}
+
+
+def reset_statistics():
+    """Forgets the statistics collected so far."""
+    with _statistics_lock:
+        _statistics.clear()
@@ -1,7 +1,49 @@
+import io
+import json
+import os
+import random
+import tempfile
+from fractions import Fraction
+from unittest import mock
+
+import sympy
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
 from django.db.models.fields import NOT_PROVIDED
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from model_bakery import baker
+from students.models import Student
 
-from .models import Problem
+from . import memo
+from .gallery import problem_gallery
+from .gaussian_rationals import GaussianRational
+from .models import (
+    DeliteljVeckratnik,
+    ElementiMnozice,
+    GenerationTimeout,
+    GeneratorExhausted,
+    KotMedGrafomaElementarnihFunkcij,
+    KotMedPremicama,
+    KrajsanjeUlomkov,
+    OdvodSestavljene,
+    PotencnaMnozica,
+    Presecisce,
+    Problem,
+    limit_content_type_choices,
+)
+from .models.kompleksna import (
+    vsota_clenov_latex,
+    vsota_produktov_latex,
+    vsota_ulomkov_latex,
+    zmnozek_latex,
+)
+from .models.odvodi import kot_med_premicama_v_stopinjah
+from .models.stoznice import vsota_kvadratov_latex, vsota_s_korenom_latex
+from .polynomials import Polynomial, equation_latex, number_latex, sqrt_latex
+from .registry import clear_content_types, problem_kind, problem_kinds
+from .telemetry import generator_statistics, reset_statistics
 
 
 class GeneratorTest(TestCase):
@@ -40,3 +82,494 @@ class GeneratorTest(TestCase):
             # We use example_data instead of generate because generate
             # can fail to produce a valid example on the first attempt.
             generator().example_data()
+
+    def test_izcrpanje(self):
+        """Generators that run out of distinct data fail instead of looping forever."""
+        problem = PotencnaMnozica(number_of_subproblems=20)
+        with self.assertRaises(GeneratorExhausted) as context:
+            problem._generate_data("seed")
+        # There are only 14 distinct power sets and all are found.
+        self.assertEqual(len(context.exception.data), 14)
+        self.assertEqual(len(problem.example_data()), 14)
+
+    def test_global_random_state(self):
+        """Generators draw from their own random number generator.
+
+        Generating data must neither depend on nor modify the state of the global
+        random module, so that generators can run concurrently."""
+        for generator in Problem.__subclasses__():
+            random.seed(0)
+            state = random.getstate()
+            data = generator()._generate_data("seed")
+            self.assertEqual(random.getstate(), state, generator.__name__)
+            random.seed(1)
+            self.assertEqual(
+                generator()._generate_data("seed"), data, generator.__name__
+            )
+
+
+class DataCacheTest(TestCase):
+    def setUp(self):
+        # Problems of different tests may get the same id, so we clear the cache.
+        caches["problems"].clear()
+
+    def test_predpomnilnik(self):
+        """Generated data is reused until the parameters of the problem change."""
+        problem = baker.make("IskanjeNicelPolinoma", number_of_subproblems=3)
+        student = Student(0, "Ana")
+        with override_settings(PROBLEM_CACHE=None):
+            text = problem.student_text(student)
+        with mock.patch.object(
+            type(problem), "_generate_data", wraps=problem._generate_data
+        ) as generate_data:
+            self.assertEqual(problem.student_text(student), text)
+            self.assertEqual(problem.student_text(student), text)
+            self.assertEqual(generate_data.call_count, 1)
+            problem.stevilo_nicel += 1
+            problem.student_text(student)
+            self.assertEqual(generate_data.call_count, 2)
+
+    def test_skupen_vnos(self):
+        """The data for all students of a problem is cached in a single entry."""
+        problem = baker.make("KrajsanjeUlomkov")
+        students = [Student(i, "Ana") for i in range(3)]
+        texts = [problem.student_text(student) for student in students]
+        cached_data = caches["problems"].get(problem._data_cache_key())
+        self.assertEqual(len(cached_data), 3)
+        self.assertEqual(texts, [problem.render(data) for data in cached_data.values()])
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class GalleryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_predpomnilnik(self):
+        """Example texts are generated only once and then read from the cache."""
+        call_command("warm_problem_gallery", stdout=io.StringIO())
+        with mock.patch.object(Problem, "_generate_data") as generate_data:
+            grouped_problems = problem_gallery()
+            generate_data.assert_not_called()
+        self.assertEqual(grouped_problems[0][0], "Razno")
+        self.assertEqual(grouped_problems, problem_gallery(refresh=True))
+
+
+class BenchmarkTest(TestCase):
+    def test_bench_generators(self):
+        """The benchmark reports latencies and compares them to a baseline."""
+        output = io.StringIO()
+        call_command("bench_generators", "KrajsanjeUlomkov", seeds=5, stdout=output)
+        results = json.loads(output.getvalue())["results"]
+        self.assertEqual(list(results), ["KrajsanjeUlomkov"])
+        self.assertLessEqual(
+            results["KrajsanjeUlomkov"]["p50"], results["KrajsanjeUlomkov"]["p99"]
+        )
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as baseline:
+            results["KrajsanjeUlomkov"]["p50"] /= 1000
+            json.dump({"results": results}, baseline)
+            baseline.flush()
+            with self.assertRaises(CommandError):
+                call_command(
+                    "bench_generators",
+                    "KrajsanjeUlomkov",
+                    seeds=5,
+                    compare=baseline.name,
+                    stdout=io.StringIO(),
+                )
+
+    def test_banke(self):
+        """For kinds with sample banks, retries are counted from the draws."""
+        output = io.StringIO()
+        call_command("bench_generators", "ElementiMnozice", seeds=5, stdout=output)
+        result = json.loads(output.getvalue())["results"]["ElementiMnozice"]
+        self.assertGreaterEqual(result["retries_per_sample"], 0)
+        self.assertGreaterEqual(
+            result["retries_per_sample"], result["rejected_per_sample"]
+        )
+
+
+class SampleBankTest(TestCase):
+    def test_enak_izbor(self):
+        """Samples from banks are the same as data generated from scratch."""
+        for problem in [
+            ElementiMnozice(number_of_subproblems=3),
+            ElementiMnozice(number_of_subproblems=3, linearna_kombinacija=False),
+            PotencnaMnozica(number_of_subproblems=3),
+        ]:
+            with override_settings(PROBLEM_BANK_DIR=None):
+                data = [problem._generate_data(seed) for seed in range(20)]
+            with tempfile.TemporaryDirectory() as bank_dir:
+                with override_settings(PROBLEM_BANK_DIR=bank_dir):
+                    problem._build_sample_bank()
+                    # Once the bank is built, sympy is no longer needed.
+                    with mock.patch("sympy.latex") as latex:
+                        self.assertEqual(
+                            [problem._generate_data(seed) for seed in range(20)], data
+                        )
+                        latex.assert_not_called()
+
+    def test_brez_banke(self):
+        """Data is generated from scratch until the bank is built by the command."""
+        problem = baker.make("ElementiMnozice")
+        with tempfile.TemporaryDirectory() as bank_dir:
+            with override_settings(PROBLEM_BANK_DIR=bank_dir):
+                self.assertIsNone(problem._sample_bank())
+                problem._generate_data("seed")
+                self.assertEqual(os.listdir(bank_dir), [])
+                call_command("build_sample_banks", stdout=io.StringIO())
+                self.assertIsNotNone(problem._sample_bank())
+
+
+class FeasibilityTest(TestCase):
+    def test_ocena_zahtevnosti(self):
+        """Validating parameters estimates the cost of generating the problem."""
+        problem = DeliteljVeckratnik(number_of_subproblems=2)
+        problem.clean()
+        self.assertGreater(problem.estimated_cost, 0)
+
+    def test_neizvedljivi_parametri(self):
+        """Parameters with which the generator never succeeds are refused."""
+        for parameters in [
+            {"minimalna_vrednost": 500, "maksimalna_vrednost": 20},
+            {
+                "minimalna_vrednost": 31,
+                "maksimalna_vrednost": 37,
+                "maksimalni_prafaktor": 2,
+            },
+        ]:
+            with self.assertRaises(ValidationError):
+                DeliteljVeckratnik(**parameters).clean()
+
+    def test_redki_uspehi(self):
+        """Parameters with which the generator rarely succeeds are not refused."""
+        problem = Presecisce()
+        problem.clean()
+        self.assertGreater(problem.estimated_cost, 0)
+
+    def test_casovna_omejitev_preverjanja(self):
+        """Probing stops once it takes the given time, even if nothing succeeded."""
+        problem = Presecisce()
+        with override_settings(PROBLEM_PROBE_TIME=0):
+            self.assertEqual(problem.probe_generator()[0], 1)
+
+    @override_settings(PROBLEM_COST_BUDGET=0)
+    def test_prevelika_zahtevnost(self):
+        """Parameters with which generating takes too long are refused."""
+        with self.assertRaises(ValidationError):
+            DeliteljVeckratnik().clean()
+
+
+recorded_metrics = []
+
+
+def record_metrics(kind, metrics):
+    recorded_metrics.append((kind, metrics))
+
+
+class TelemetryTest(TestCase):
+    def setUp(self):
+        reset_statistics()
+        recorded_metrics.clear()
+
+    def test_statistika(self):
+        """Statistics count attempts of all subproblems of each kind."""
+        problem = KrajsanjeUlomkov(number_of_subproblems=3)
+        problem._generate_data("seed")
+        statistics = generator_statistics()["KrajsanjeUlomkov"]
+        self.assertEqual(statistics["samples"], 3)
+        self.assertGreaterEqual(statistics["attempts"], 3)
+        self.assertLessEqual(statistics["attempt_time"], statistics["total_time"])
+
+    @override_settings(PROBLEM_METRICS_HOOK="problems.tests.record_metrics")
+    def test_metrics_hook(self):
+        """The metrics hook is called once for each generated subproblem."""
+        KrajsanjeUlomkov(number_of_subproblems=2)._generate_data("seed")
+        self.assertEqual(
+            [kind for kind, _ in recorded_metrics], ["KrajsanjeUlomkov"] * 2
+        )
+        self.assertEqual(
+            sum(metrics["attempts"] for _, metrics in recorded_metrics),
+            generator_statistics()["KrajsanjeUlomkov"]["attempts"],
+        )
+
+    @override_settings(PROBLEM_GENERATION_TIMEOUT=0)
+    def test_casovna_omejitev(self):
+        """Generating is aborted between attempts once the time limit is exceeded."""
+        problem = KrajsanjeUlomkov(number_of_subproblems=2)
+        with self.assertRaises(GenerationTimeout) as context:
+            problem._generate_data("seed")
+        self.assertIs(context.exception.problem, problem)
+        statistics = generator_statistics()["KrajsanjeUlomkov"]
+        self.assertEqual((statistics["samples"], statistics["timeouts"]), (0, 1))
+
+    @override_settings(PROBLEM_SLOW_ATTEMPT_TIME=0)
+    def test_pocasna_semena(self):
+        """Slow attempts are logged with their seed and parameters."""
+        problem = KrajsanjeUlomkov(number_of_subproblems=2)
+        with self.assertLogs("problems.models.meta", "WARNING") as logs:
+            problem._generate_data("seed")
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("1-seed", logs.output[1])
+        self.assertIn(problem._parameters_json(), logs.output[1])
+        with override_settings(PROBLEM_SLOW_ATTEMPT_TIME=None):
+            with self.assertNoLogs("problems.models.meta", "WARNING"):
+                problem._generate_data("seed")
+
+
+class MemoTest(TestCase):
+    def setUp(self):
+        memo.clear_memos()
+
+    def test_zadetki(self):
+        """Repeated operations on equal expressions are looked up."""
+        x = sympy.symbols("x")
+        self.assertEqual(memo.latex(x**2 + 1), sympy.latex(x**2 + 1))
+        self.assertEqual(memo.latex(1 + x**2), sympy.latex(x**2 + 1))
+        self.assertEqual(memo.latex(x**2 + 1, ln_notation=True), "x^{2} + 1")
+        statistics = memo.memo_statistics()["latex"]
+        self.assertEqual((statistics["hits"], statistics["misses"]), (1, 2))
+        self.assertEqual(statistics["hit_rate"], 1 / 3)
+
+    def test_decimalna_stevila(self):
+        """Expressions with floats are not memoized, as sympy finds 2.0 == 2."""
+        x = sympy.symbols("x")
+        self.assertEqual(memo.latex(sympy.Integer(2) * x), "2 x")
+        self.assertEqual(memo.latex(sympy.Float(2) * x), "2.0 x")
+        self.assertEqual(memo.latex(sympy.Float(2)), "2.0")
+        self.assertEqual(memo.memo_statistics()["latex"]["misses"], 1)
+
+    @override_settings(PROBLEM_MEMO_SIZE=2)
+    def test_omejena_velikost(self):
+        """The least recently used results are evicted first."""
+        x = sympy.symbols("x")
+        memo.diff(x**2, x)
+        memo.diff(x**3, x)
+        memo.diff(x**2, x)
+        memo.diff(x**4, x)
+        self.assertEqual(len(memo.diff), 2)
+        memo.diff(x**2, x)
+        memo.diff(x**3, x)
+        self.assertEqual(memo.diff.hits, 2)
+
+    def test_enaki_podatki(self):
+        """Memoized results do not change the generated data."""
+        problem = OdvodSestavljene()
+        data = problem._generate_data("seed")
+        self.assertEqual(problem._generate_data("seed"), data)
+        self.assertGreater(memo.memo_statistics()["simplify"]["hit_rate"], 0)
+
+
+class PolynomialTest(TestCase):
+    def test_enako_kot_sympy(self):
+        """Expanded powers are printed the same as by sympy."""
+        rng = random.Random("polinomi")
+        for _ in range(50):
+            terms = [
+                (
+                    rng.choice([-3, -2, -1, 1, 2, 3]),
+                    {rng.choice("abxy"): rng.randint(0, 3)},
+                )
+                for _ in range(rng.randint(2, 3))
+            ]
+            polynomial = Polynomial.from_terms(terms)
+            expression = sum(
+                coefficient
+                * sympy.Mul(*(sympy.Symbol(v) ** e for v, e in powers.items()))
+                for coefficient, powers in terms
+            )
+            exponent = rng.randint(0, 5)
+            self.assertEqual(polynomial.latex(), sympy.latex(expression))
+            self.assertEqual(
+                (polynomial**exponent).latex(),
+                sympy.latex(sympy.expand(expression**exponent)),
+            )
+
+    def test_vrstni_red(self):
+        """Like sympy, a positive constant is printed before a negative term."""
+        polynomial = Polynomial.from_terms([(-3, {"x": 2}), (3, {})])
+        self.assertEqual(polynomial.latex(), "3 - 3 x^{2}")
+
+    def test_ulomki(self):
+        """Fractional coefficients and equations are printed the same as by sympy."""
+        x, y = sympy.symbols("x y")
+        for a, b, c in [(2, -3, 1), (-1, 3, -4), (-5, -2, 3), (1, 1, -6)]:
+            polynomial = Polynomial.from_terms(
+                [(Fraction(a, b), {"x": 1}), (Fraction(c, b), {"y": 1}), (a, {})]
+            )
+            expression = sympy.Rational(a, b) * x + sympy.Rational(c, b) * y + a
+            self.assertEqual(polynomial.latex(), sympy.latex(expression))
+            self.assertEqual(
+                equation_latex(polynomial, Fraction(c, a)),
+                sympy.latex(sympy.Eq(expression, sympy.Rational(c, a))),
+            )
+            self.assertEqual(
+                number_latex(Fraction(a, b)), sympy.latex(sympy.Rational(a, b))
+            )
+        self.assertEqual(equation_latex(Polynomial.from_terms([]), 0), r"\text{True}")
+
+    def test_koreni(self):
+        """Square roots are printed the same as by sympy."""
+        for n in range(1, 100):
+            self.assertEqual(sqrt_latex(n), sympy.latex(sympy.sqrt(n)))
+
+
+class GaussianRationalTest(TestCase):
+    def test_enako_kot_sympy(self):
+        """Results of arithmetic are exact and printed the same as by sympy."""
+        rng = random.Random("kompleksna")
+        for _ in range(50):
+            a, b, c, d = (rng.choice([-5, -2, -1, 1, 3, 4]) for _ in range(4))
+            z, w = GaussianRational(a, b), GaussianRational(c, d)
+            sz, sw = a + b * sympy.I, c + d * sympy.I
+            for result, expected in [
+                (z + w, sz + sw),
+                (z - 2 * w, sz - 2 * sw),
+                (z * w.conjugate(), sz * sympy.conjugate(sw)),
+                (z / w, sz / sw),
+                (z**3, sz**3),
+                (z.norm(), abs(sz) ** 2),
+            ]:
+                self.assertEqual(
+                    GaussianRational._coerce(result).latex(),
+                    sympy.latex(sympy.expand_complex(expected)),
+                )
+
+    def test_deljenje(self):
+        """Division and negative powers give exact inverses."""
+        z = GaussianRational(Fraction(1, 2), -3)
+        self.assertEqual(z / z, 1)
+        self.assertEqual(z * (1 / z), GaussianRational(1))
+        self.assertEqual(GaussianRational(0, 1) ** -1, GaussianRational(0, -1))
+
+
+class KompleksnaTest(TestCase):
+    def test_enako_kot_sympy(self):
+        """Expressions of complex numbers are printed the same as by sympy."""
+        rng = random.Random("kompleksna")
+        stevila = [
+            GaussianRational(a, b) for a in range(-5, 6) for b in range(-5, 6) if a * b
+        ]
+        ulomki = [Fraction(1), Fraction(-1), Fraction(3, 2), Fraction(-4, 3)]
+        for _ in range(200):
+            z, w, u, v = rng.sample(stevila, 4)
+            koeficienti = rng.choices(ulomki, k=3)
+            self.assertEqual(
+                vsota_clenov_latex(koeficienti, [z, w, u]),
+                sympy.latex(
+                    sympy.Add(
+                        *(
+                            sympy.Mul(k, s, evaluate=False)
+                            for k, s in zip(koeficienti, [z, w, u])
+                        ),
+                        evaluate=False,
+                    )
+                ),
+            )
+            self.assertEqual(
+                vsota_ulomkov_latex([(z, w), (u, v)]),
+                sympy.latex(
+                    sympy.Add(
+                        sympy.Mul(z, sympy.Pow(w, -1, evaluate=False), evaluate=False),
+                        sympy.Mul(u, sympy.Pow(v, -1, evaluate=False), evaluate=False),
+                        evaluate=False,
+                    )
+                ),
+            )
+            self.assertEqual(
+                zmnozek_latex([z, w]), sympy.latex(sympy.Mul(z, w, evaluate=False))
+            )
+
+    def test_poenostavitev_kot_sympy(self):
+        """Sums of products are simplified the same as by sympy."""
+        rng = random.Random("produkti")
+        stevila = [
+            GaussianRational(a, b) for a in range(-5, 6) for b in range(-5, 6) if a * b
+        ]
+        primeri = [
+            [(GaussianRational(-4, -1), GaussianRational(4, 1))],
+            [(GaussianRational(1, 1), GaussianRational(-1, -1))],
+            [
+                (GaussianRational(-4, -1), GaussianRational(1, 1)),
+                (GaussianRational(-2, -2), GaussianRational(1, -1)),
+            ],
+        ]
+        for _ in range(20):
+            z, w, u = rng.sample(stevila, 3)
+            primeri += [[(z, w)], [(z, w), (u, w.conjugate())]]
+        for produkti in primeri:
+            izraz = sympy.Add(*(sympy.Mul(z, w) for z, w in produkti))
+            self.assertEqual(
+                vsota_produktov_latex(produkti),
+                sympy.latex(sympy.simplify(izraz)),
+            )
+
+
+class StozniceTest(TestCase):
+    def test_enako_kot_sympy(self):
+        """Sums of squares and radicals are printed the same as by sympy."""
+        x, y = sympy.symbols("x y")
+        for p, q, a, b in [(0, 0, 2, 1), (-5, 0, 1, 2), (0, 3, 3, 1), (2, -4, 4, 3)]:
+            self.assertEqual(
+                vsota_kvadratov_latex(p, q, a, b),
+                sympy.latex(((x - p) / a) ** 2 + ((y - q) / b) ** 2),
+            )
+        for celo in range(-5, 6):
+            for radikand in [3, 9, 12, 21]:
+                for predznak in [-1, 1]:
+                    self.assertEqual(
+                        vsota_s_korenom_latex(celo, predznak, radikand),
+                        sympy.latex(celo + predznak * sympy.sqrt(radikand)),
+                    )
+
+
+@override_settings(PROBLEM_FAST_PATH_CHECK_INTERVAL=1)
+class FastPathTest(TestCase):
+    def test_koti(self):
+        """Angles computed in floating point are the same as computed by sympy."""
+        with self.assertNoLogs("problems.models.odvodi", "ERROR"):
+            for generator in [KotMedPremicama, KotMedGrafomaElementarnihFunkcij]:
+                generator()._generate_data("fast-path")
+            self.assertEqual(
+                kot_med_premicama_v_stopinjah(-2, sympy.Rational(1, 2)), (90, 0)
+            )
+        with mock.patch.object(sympy, "N", side_effect=lambda kot: kot + 1):
+            with self.assertLogs("problems.models.odvodi", "ERROR"):
+                self.assertEqual(kot_med_premicama_v_stopinjah(1, 6), (35, 32))
+
+    @override_settings(PROBLEM_FAST_PATH_CHECK_INTERVAL=3)
+    def test_vzorcenje(self):
+        """Only every so many results are checked."""
+        with mock.patch.object(sympy, "N", wraps=sympy.N) as n:
+            for _ in range(9):
+                kot_med_premicama_v_stopinjah(1, 6)
+        self.assertEqual(n.call_count, 3)
+
+
+class RegistryTest(TestCase):
+    def setUp(self):
+        ContentType.objects.clear_cache()
+        clear_content_types()
+
+    def test_vrste(self):
+        """The registry describes all problem kinds, each with a single form class."""
+        kinds = problem_kinds()
+        self.assertEqual([kind.generator for kind in kinds], Problem.__subclasses__())
+        content_types = ContentType.objects.get_for_models(*Problem.__subclasses__())
+        with self.assertNumQueries(0):
+            for kind in kinds:
+                self.assertIs(problem_kind(kind.content_type_id), kind)
+                self.assertEqual(kind.content_type_id, content_types[kind.generator].id)
+            self.assertEqual(
+                set(limit_content_type_choices()["id__in"]),
+                {content_type.id for content_type in content_types.values()},
+            )
+        kind = problem_kind(content_types[KrajsanjeUlomkov].id)
+        self.assertEqual((kind.group, kind.description), ("???", "krajšanje ulomkov"))
+        form = kind.form_class({"number_of_subproblems": 0})
+        self.assertIsInstance(form.instance, KrajsanjeUlomkov)
+        self.assertFalse(form.is_valid())
+        self.assertIsNone(
+            problem_kind(ContentType.objects.get_for_model(ContentType).id)
+        )
@@ -1,11 +1,12 @@
 from django.contrib.auth.decorators import login_required
-from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import PermissionDenied
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 from documents.views import _get_document_if_allowed
 
-from .forms import problem_form
-from .models import Problem, problem_content_types
+from .gallery import problem_gallery
+from .models import Problem
+from .registry import problem_kind
 
 
 def _get_problem_if_allowed(request, group_id: int, document_id: int, problem_id):
@@ -27,26 +28,8 @@ def _get_problem_if_allowed(request, group_id: int, document_id: int, problem_id
 @login_required
 def choose_problem(request, group_id: int, document_id: int):
     """Displays a page where the user can choose a problem type."""
-    problem_groups = {}
-    for generator, content_type in problem_content_types().items():
-        group, description = generator._meta.verbose_name.split(" / ")
-        # We create an instance of the generator class to get the example text.
-        Generator = content_type.model_class()
-        example_problem = Generator()
-        example_text = example_problem.example_text()
-        problem_groups.setdefault(group, []).append(
-            (
-                content_type.id,
-                example_text,
-                description,
-            )
-        )
-    # We use the "???" group as a hack for any problems we do not want to display.
-    if "???" in problem_groups:
-        del problem_groups["???"]
-    special_problems = problem_groups.pop("Razno")
-    grouped_problems = [("Razno", special_problems)] + sorted(problem_groups.items())
     document = _get_document_if_allowed(request, group_id, document_id)
+    grouped_problems = problem_gallery()
     return render(
         request,
         "problems/choose_problem.html",
@@ -57,14 +40,15 @@ def choose_problem(request, group_id: int, document_id: int):
 @login_required
 def create_problem(request, group_id: int, document_id: int, content_type_id: int):
     """Displays a page where the user can create a problem."""
-    content_type = get_object_or_404(ContentType, id=content_type_id)
+    kind = problem_kind(content_type_id)
+    if kind is None:
+        raise Http404("Ta vrsta problema ne obstaja.")
     document = _get_document_if_allowed(request, group_id, document_id)
     # We create an instance of the generator class to get the example text.
-    Generator = content_type.model_class()
-    example_problem = Generator()
+    example_problem = kind.generator()
     example_data = example_problem.example_data()
     default_text = example_problem.render(example_data, default_text=True)
-    form = problem_form(content_type, request.POST or None)
+    form = kind.form_class(request.POST or None)
     if form.is_valid():
         problem: Problem = form.save(commit=False)
         problem.document = document
@@ -76,7 +60,8 @@ def create_problem(request, group_id: int, document_id: int, content_type_id: in
         {
             "document": document,
             "form": form,
-            "example_datum": example_data[0],
+            # If the generator is exhausted, there may be no example data at all.
+            "example_datum": example_data[0] if example_data else {},
             "default_text": default_text,
         },
     )
@@ -88,7 +73,8 @@ def edit_problem(request, group_id: int, document_id: int, problem_id: int):
     problem = _get_problem_if_allowed(
         request, group_id, document_id, problem_id
     ).downcast()
-    form = problem_form(problem.content_type, request.POST or None, instance=problem)
+    kind = problem_kind(problem.content_type_id)
+    form = kind.form_class(request.POST or None, instance=problem)
     if form.is_valid():
         problem: Problem = form.save()
         return redirect(problem.document.get_absolute_url())
@@ -104,7 +90,8 @@ def edit_problem(request, group_id: int, document_id: int, problem_id: int):
         {
             "problem": problem,
             "form": form,
-            "example_datum": example_data[0],
+            # If the generator is exhausted, there may be no example data at all.
+            "example_datum": example_data[0] if example_data else {},
             "default_text": default_text,
         },
     )
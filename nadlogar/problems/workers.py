@@ -0,0 +1,57 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# This module is imported by worker processes before Django is set up, so it must not
+# import any models at the top level.
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    # Worker processes are started afresh, so we set up Django and import all problem
+    # kinds (and with them sympy) once, before they receive the first task.
+    import django
+
+    django.setup()
+    import problems.models  # noqa: F401
+
+
+def student_data(problem, student):
+    """Generates the problem data for a given student in a worker process."""
+    from utils.memory import clear_sympy_cache_periodically
+
+    data = problem._student_data(student)
+    clear_sympy_cache_periodically()
+    return data
+
+
+def get_problem_pool(workers):
+    """Returns a pool of worker processes that is shared by all requests."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # We do not fork, as the server process may be running other threads.
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def discard_problem_pool(pool):
+    """Stops the given pool, so that the next request starts a new one.
+
+    This is needed once a worker of the pool has died, as the pool is then broken.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
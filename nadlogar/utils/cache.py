@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+# The estimated total sizes of cache directories and the times when they were last
+# scanned, shared by all caches in this process.
+_directory_sizes = {}
+_directory_sizes_lock = threading.Lock()
+
+
+def _allocated_size(stat):
+    """Returns the disk space taken by a file, which is a whole number of blocks."""
+    # Some platforms do not report the number of allocated blocks, and some
+    # filesystems allocate them only once the file is written to the disk.
+    return max(stat.st_size, 512 * getattr(stat, "st_blocks", 0))
+
+
+class FileCache:
+    """A content-addressed on-disk cache of binary files.
+
+    Entries are stored as files in the given directory, named by the hash of their
+    key. Each entry is written to a temporary file first and then atomically moved
+    into place, so concurrent readers and writers never see a partially written
+    entry. The modification time of an entry marks its last use, and whenever the
+    total size of the cache exceeds max_size, the least recently used entries are
+    removed.
+
+    To avoid scanning the directory on every write, we keep an estimate of its size
+    that we increase with each written entry. The directory is scanned only when the
+    estimate exceeds max_size or when scan_interval seconds have passed since the last
+    scan, as other processes write into the same directory.
+    """
+
+    scan_interval = 60.0
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    @staticmethod
+    def key(*parts):
+        """Returns a hash of the given strings that can be used as a cache key."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode())
+            # We separate the parts so that ("ab", "c") and ("a", "bc") differ.
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key, suffix):
+        """Returns the contents of an entry or None if it is not in the cache."""
+        path = self._path(key, suffix)
+        try:
+            with open(path, "rb") as entry:
+                contents = entry.read()
+            # We mark the entry as recently used.
+            os.utime(path)
+        except FileNotFoundError:
+            # The entry was never stored or has been evicted in the meantime.
+            return None
+        return contents
+
+    def set(self, key, suffix, contents):
+        """Stores an entry and evicts old entries if the cache is too large."""
+        os.makedirs(self.directory, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".")
+        try:
+            with os.fdopen(file_descriptor, "wb") as temp_file:
+                temp_file.write(contents)
+                temp_file.flush()
+                size = _allocated_size(os.fstat(file_descriptor))
+            os.replace(temp_path, self._path(key, suffix))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        with _directory_sizes_lock:
+            estimate = _directory_sizes.get(self.directory)
+            if estimate is not None:
+                total_size, scan_time = estimate
+                total_size += size
+                if (
+                    total_size <= self.max_size
+                    and time.monotonic() - scan_time < self.scan_interval
+                ):
+                    _directory_sizes[self.directory] = (total_size, scan_time)
+                    return
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the cache is small enough."""
+        entries = []
+        total_size = 0
+        with os.scandir(self.directory) as directory_entries:
+            for directory_entry in directory_entries:
+                # We skip temporary files that are still being written.
+                if directory_entry.name.startswith("."):
+                    continue
+                try:
+                    stat = directory_entry.stat()
+                except FileNotFoundError:
+                    continue
+                size = _allocated_size(stat)
+                entries.append((stat.st_mtime, size, directory_entry.path))
+                total_size += size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # Another worker has already evicted the entry.
+                pass
+            total_size -= size
+        with _directory_sizes_lock:
+            _directory_sizes[self.directory] = (total_size, time.monotonic())
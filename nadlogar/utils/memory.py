@@ -0,0 +1,107 @@
+import functools
+import itertools
+import logging
+import os
+
+from django.conf import settings
+from sympy.core.cache import CACHE, clear_cache
+
+# Sympy caches the results of many of its functions in a separate LRU cache for each
+# function. Long-running processes that generate thousands of expressions fill all of
+# these caches, so we clear them periodically and report how the memory of each
+# process changes while generating documents.
+
+logger = logging.getLogger(__name__)
+
+_calls = itertools.count(1)
+
+
+def resident_memory():
+    """Returns the resident set size of this process in bytes.
+
+    The size is read from /proc, so we return None on systems that do not have it.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except OSError:
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def sympy_cache_size():
+    """Returns the number of results stored in the caches of all sympy functions."""
+    return sum(
+        function.cache_info().currsize
+        for function in CACHE
+        if hasattr(function, "cache_info")
+    )
+
+
+def clear_sympy_cache_periodically():
+    """Clears the sympy cache once every SYMPY_CACHE_CLEAR_INTERVAL calls."""
+    interval = settings.SYMPY_CACHE_CLEAR_INTERVAL
+    if interval and next(_calls) % interval == 0:
+        memory, cache_size = resident_memory(), sympy_cache_size()
+        clear_cache()
+        logger.info(
+            "Cleared %d sympy cache entries in process %d "
+            "with %s bytes of resident memory.",
+            cache_size,
+            os.getpid(),
+            memory,
+        )
+
+
+def _followed_by(content, callback):
+    try:
+        yield from content
+    finally:
+        callback()
+
+
+def reports_memory_usage(view):
+    """Logs the memory and the sympy cache size of the process around the view.
+
+    Streaming responses produce their content only after the view returns, so for
+    them, we log once the content has been consumed or the response closed.
+    """
+
+    @functools.wraps(view)
+    def wrapped_view(request, *args, **kwargs):
+        memory, cache_size = resident_memory(), sympy_cache_size()
+
+        def log_usage():
+            logger.info(
+                "%s in process %d: resident memory %s -> %s bytes, "
+                "sympy cache %d -> %d entries.",
+                view.__name__,
+                os.getpid(),
+                memory,
+                resident_memory(),
+                cache_size,
+                sympy_cache_size(),
+            )
+
+        response = view(request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = _followed_by(
+                response.streaming_content, log_usage
+            )
+        else:
+            log_usage()
+        return response
+
+    return wrapped_view
+
+
+class SympyCacheMiddleware:
+    """Periodically clears the sympy cache after a response is produced."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        clear_sympy_cache_periodically()
+        return response